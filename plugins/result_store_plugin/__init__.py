@@ -1 +1,2 @@
 ALL_PLUGIN_RESULT_STORES = {}
+ALL_PLUGIN_RESULT_SERIALIZERS = {}
@@ -0,0 +1,60 @@
+"""add impression daily rollup
+
+Revision ID: 3b1f6c9d2e47
+Revises: a1b2c3d4e5f6
+Create Date: 2026-10-18 04:10:12.281734
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "3b1f6c9d2e47"
+down_revision = "a1b2c3d4e5f6"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "impression_daily_rollup",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("item_id", sa.Integer(), nullable=False),
+        sa.Column(
+            "item_type",
+            sa.Enum("DATA_DOC", "DATA_TABLE", name="impressionitemtype"),
+            nullable=False,
+        ),
+        sa.Column("date", sa.Date(), nullable=False),
+        sa.Column("viewers_count", sa.Integer(), nullable=False),
+        sa.Column("views_count", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint(
+            "item_type", "item_id", "date", name="unique_impression_daily_rollup"
+        ),
+    )
+    op.create_index(
+        op.f("ix_impression_daily_rollup_date"),
+        "impression_daily_rollup",
+        ["date"],
+        unique=False,
+    )
+
+    # Backfill the rollups of the existing impressions
+    op.execute(
+        """
+        INSERT INTO impression_daily_rollup
+            (item_type, item_id, date, viewers_count, views_count)
+        SELECT item_type, item_id, DATE(created_at), COUNT(DISTINCT uid), COUNT(*)
+        FROM impression
+        GROUP BY item_type, item_id, DATE(created_at)
+        """
+    )
+
+
+def downgrade():
+    op.drop_index(
+        op.f("ix_impression_daily_rollup_date"), table_name="impression_daily_rollup"
+    )
+    op.drop_table("impression_daily_rollup")
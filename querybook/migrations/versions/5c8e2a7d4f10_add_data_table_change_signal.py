@@ -0,0 +1,26 @@
+"""add data table change signal
+
+Revision ID: 5c8e2a7d4f10
+Revises: 3b1f6c9d2e47
+Create Date: 2026-10-18 06:02:41.518230
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "5c8e2a7d4f10"
+down_revision = "3b1f6c9d2e47"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        "data_table", sa.Column("change_signal", sa.String(length=255), nullable=True)
+    )
+
+
+def downgrade():
+    op.drop_column("data_table", "change_signal")
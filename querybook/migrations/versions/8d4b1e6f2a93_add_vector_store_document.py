@@ -0,0 +1,40 @@
+"""add vector store document
+
+Revision ID: 8d4b1e6f2a93
+Revises: 5c8e2a7d4f10
+Create Date: 2026-10-18 05:02:13.472910
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "8d4b1e6f2a93"
+down_revision = "5c8e2a7d4f10"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "vector_store_document",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("doc_id", sa.String(length=191), nullable=False),
+        sa.Column("fingerprint", sa.String(length=64), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        op.f("ix_vector_store_document_doc_id"),
+        "vector_store_document",
+        ["doc_id"],
+        unique=True,
+    )
+
+
+def downgrade():
+    op.drop_index(
+        op.f("ix_vector_store_document_doc_id"), table_name="vector_store_document"
+    )
+    op.drop_table("vector_store_document")
@@ -21,7 +21,7 @@ from flask_login import current_user
 from lib.event_logger import event_logger
 from lib.stats_logger import API_REQUESTS, stats_logger
 from lib.logger import get_logger
-from logic.impression import create_impression
+from tasks.flush_impressions import buffer_impression
 from werkzeug.exceptions import Forbidden, NotFound
 
 LOG = get_logger(__file__)
@@ -138,7 +138,7 @@ def with_impression(
                 # since we only do impression for GET and we should have GET something
                 if result is not None and item_id_name in kwargs:
                     item_id = kwargs[item_id_name]
-                    create_impression(item_id, item_type, current_user.id)
+                    buffer_impression(item_id, item_type, current_user.id)
             except Exception as e:
                 LOG.error(e, exc_info=True)
             finally:
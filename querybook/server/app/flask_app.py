@@ -92,6 +92,14 @@ def make_celery(app):
             "visibility_timeout": 180000  # 2 days + 2 hours
         },
     )
+    if QuerybookSettings.QUERY_EXECUTION_QUEUE:
+        # Queries are run by the query workers that consume this queue,
+        # see prod_query_worker in querybook/scripts/runservice
+        celery.conf.task_routes = {
+            "tasks.run_query.run_query_task": {
+                "queue": QuerybookSettings.QUERY_EXECUTION_QUEUE
+            }
+        }
 
     TaskBase = celery.Task
 
@@ -1,6 +1,7 @@
 from io import BytesIO
 from os import SEEK_END
 from datetime import datetime
+from typing import Generator, List
 from urllib.parse import quote
 
 import requests
@@ -130,6 +131,8 @@ class GoogleDownloadClient(ChunkReader):
                 "{}/{} does not exist".format(bucket_name, blob_name)
             )
 
+        self._blob = blob
+
         # Start the transport process
         self._transport = AuthorizedSession(credentials=client._credentials)
         self._stream = BytesIO()
@@ -156,6 +159,34 @@ class GoogleDownloadClient(ChunkReader):
 
         return content.decode("utf-8")
 
+    def open_binary_stream(self):
+        return self._blob.open("rb")
+
+
+def delete_blobs(bucket_name: str, blob_names: List[str]) -> int:
+    """Delete the blobs, blobs that do not exist are skipped
+
+    Returns:
+        int -- The number of deleted blobs
+    """
+    from google.cloud import storage
+
+    cred = get_google_credentials()
+    client = storage.Client(project=cred.project_id, credentials=cred)
+    missing_blobs = []
+    client.bucket(bucket_name).delete_blobs(blob_names, on_error=missing_blobs.append)
+    return len(blob_names) - len(missing_blobs)
+
+
+def list_blob_names(bucket_name: str, prefix: str) -> Generator[str, None, None]:
+    """List the names of the blobs that start with the prefix"""
+    from google.cloud import storage
+
+    cred = get_google_credentials()
+    client = storage.Client(project=cred.project_id, credentials=cred)
+    for blob in client.list_blobs(bucket_name, prefix=prefix):
+        yield blob.name
+
 
 class GoogleKeySigner(object):
     def __init__(self, bucket_name):
@@ -1,6 +1,10 @@
+from collections import deque
+import os
 import random
+import threading
 import time
-from typing import List
+from typing import Dict, List, Tuple
+from thrift.Thrift import TException
 from thrift.transport.TTransport import TTransportException
 from socket import error as SocketError
 
@@ -17,6 +21,98 @@ _LOG = get_logger(__file__)
 _DEFAULT_RETRY_INTERVAL_SECONDS = 5
 _DEFAULT_NUM_RETRIES = 6
 
+# Max number of connections to each metastore server per process
+_DEFAULT_POOL_SIZE = 10
+# Max seconds to wait for a connection when all of them are in use
+_POOL_TIMEOUT_SECONDS = 60
+# Idle connections are checked before being used again after this many seconds
+_HEALTH_CHECK_INTERVAL_SECONDS = 60
+
+
+class HMSConnectionPool:
+    """A bounded pool of open connections to a single metastore server.
+    Each operation checks out its own connection, so that greenlets or
+    threads sharing a HiveMetastoreClient do not share a thrift socket.
+    """
+
+    def __init__(self, host, port, max_size=_DEFAULT_POOL_SIZE):
+        self._host = host
+        self._port = port
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._lock = threading.Lock()
+        # (client, time it was returned to the pool)
+        self._idle_clients = deque()
+
+    def get_client(self):
+        if not self._slots.acquire(timeout=_POOL_TIMEOUT_SECONDS):
+            raise TimeoutError(
+                f"No connection to hive metastore {self._host}:{self._port} available"
+            )
+        try:
+            while True:
+                with self._lock:
+                    if not self._idle_clients:
+                        break
+                    client, idle_since = self._idle_clients.pop()
+                if time.time() - idle_since < _HEALTH_CHECK_INTERVAL_SECONDS:
+                    return client
+                if self._is_healthy(client):
+                    return client
+                _close_client(client)
+
+            client = hmsclient.HMSClient(host=self._host, port=self._port)
+            client.open()
+            return client
+        except Exception:
+            self._slots.release()
+            raise
+
+    def put_client(self, client, reusable=True):
+        """Return a client given by get_client. Clients that may be in a
+        bad state, e.g. after a connection error, should not be reused
+        """
+        if reusable:
+            with self._lock:
+                self._idle_clients.append((client, time.time()))
+        else:
+            _close_client(client)
+        self._slots.release()
+
+    @staticmethod
+    def _is_healthy(client) -> bool:
+        try:
+            client.getStatus()
+            return True
+        except Exception:
+            return False
+
+
+_connection_pools: Dict[Tuple[str, int], HMSConnectionPool] = {}
+_connection_pools_pid = None
+_connection_pools_lock = threading.Lock()
+
+
+def get_connection_pool(host, port) -> HMSConnectionPool:
+    global _connection_pools, _connection_pools_pid
+
+    with _connection_pools_lock:
+        # Connections of the parent process cannot be used after a fork
+        if _connection_pools_pid != os.getpid():
+            _connection_pools = {}
+            _connection_pools_pid = os.getpid()
+
+        pool = _connection_pools.get((host, port))
+        if pool is None:
+            pool = _connection_pools[(host, port)] = HMSConnectionPool(host, port)
+        return pool
+
+
+def _close_client(client):
+    try:
+        client.close()
+    except Exception:
+        pass
+
 
 class HiveMetastoreClient:
     def __init__(
@@ -26,8 +122,8 @@ class HiveMetastoreClient:
         retry_interval_seconds=_DEFAULT_RETRY_INTERVAL_SECONDS,
         num_retries=_DEFAULT_NUM_RETRIES,
     ):
-        self._ro_host_addrs = hmss_ro_addrs
-        self._rw_host_addrs = hmss_rw_addrs
+        self._ro_host_addrs = list(hmss_ro_addrs)
+        self._rw_host_addrs = list(hmss_rw_addrs)
 
         # Randomize order of hosts for load balancing
         random.shuffle(self._ro_host_addrs)
@@ -35,15 +131,9 @@ class HiveMetastoreClient:
 
         self._next_ro_index = 0
         self._next_rw_index = 0
-        self._read_client = None
-        self._write_client = None
         self._num_retries = num_retries
         self._retry_interval_seconds = retry_interval_seconds
 
-    def __del__(self):
-        self._close_client(self._read_client)
-        self._close_client(self._write_client)
-
     # Connection utils:
     @staticmethod
     def _get_host_port_from_addr(addr):
@@ -68,56 +158,36 @@ class HiveMetastoreClient:
         return self._rw_host_addrs[self._next_rw_index]
 
     def _move_to_next_ro_index(self):
-        self._close_client(self._read_client)
-        self._read_client = None
         self._next_ro_index = (self._next_ro_index + 1) % len(self._ro_host_addrs)
 
     def _move_to_next_rw_index(self):
-        self._close_client(self._write_client)
-        self._write_client = None
         self._next_rw_index = (self._next_rw_index + 1) % len(self._rw_host_addrs)
 
-    @staticmethod
-    def _create_client(host, port):
-        client = hmsclient.HMSClient(host=host, port=port)
-        client.open()
-        return client
-
-    def _close_client(self, client):
-        if client is not None:
-            client.close()
-
-    def _try_to_connect_write(self):
-        if self._write_client:
-            return
-        host, port = self._get_host_port_from_addr(self._get_current_rw_hostport())
-        self._write_client = self._create_client(host, port)
-
-    def _try_to_connect_read(self):
-        if self._read_client:
-            return
-        host, port = self._get_host_port_from_addr(self._get_current_ro_hostport())
-        self._read_client = self._create_client(host, port)
-
     def _perform_op(
         self,
-        function_to_connect,
         function_to_run,
         function_for_node_info,
         function_to_move_to_next_hostport,
         log_error=True,
     ):
-        output = None
         for i in range(self._num_retries):
+            pool = get_connection_pool(
+                *self._get_host_port_from_addr(function_for_node_info())
+            )
+            client = None
             try:
-                function_to_connect()
-                output = function_to_run()
+                client = pool.get_client()
+                output = function_to_run(client)
+                pool.put_client(client)
+                return output
             except (
                 TTransportException,
                 MetaException,
                 InvalidObjectException,
                 SocketError,
             ) as ex:
+                if client is not None:
+                    pool.put_client(client, reusable=False)
                 _LOG.warning(
                     "Failed to connect to hive metastore at %s"
                     % function_for_node_info()
@@ -138,7 +208,10 @@ class HiveMetastoreClient:
                     )
                     time.sleep(self._retry_interval_seconds)
             except Exception as ex:
-                # It did succeed in connecting, but got some other exception
+                # It did succeed in connecting, but got some other exception.
+                # The connection is still usable if the metastore raised it.
+                if client is not None:
+                    pool.put_client(client, reusable=isinstance(ex, TException))
                 if log_error:
                     _LOG.error(
                         "Got an error when querying metastore at {}:".format(
@@ -147,11 +220,9 @@ class HiveMetastoreClient:
                     )
                     _LOG.error(ex, exc_info=True)
                 raise ex
-        return output
 
     def _perform_read_op(self, function_to_run, log_error=True):
         return self._perform_op(
-            function_to_connect=self._try_to_connect_read,
             function_to_run=function_to_run,
             function_for_node_info=self._get_current_ro_hostport,
             function_to_move_to_next_hostport=self._move_to_next_ro_index,
@@ -160,7 +231,6 @@ class HiveMetastoreClient:
 
     def _perform_write_op(self, function_to_run, log_error=True):
         return self._perform_op(
-            function_to_connect=self._try_to_connect_write,
             function_to_run=function_to_run,
             function_for_node_info=self._get_current_rw_hostport,
             function_to_move_to_next_hostport=self._move_to_next_rw_index,
@@ -173,7 +243,7 @@ class HiveMetastoreClient:
 
         """
         _LOG.info("Get all databases from hive metastore")
-        return self._perform_read_op(lambda: self._read_client.get_all_databases())
+        return self._perform_read_op(lambda client: client.get_all_databases())
 
     def get_database(self, db_name: str):
         """Get database/schema info
@@ -185,7 +255,7 @@ class HiveMetastoreClient:
             DataBase: Object with the following type: https://github.com/apache/hive/blob/master/standalone-metastore/metastore-common/src/main/thrift/hive_metastore.thrift#L404
         """
         _LOG.info("Get db info %s", db_name)
-        return self._perform_read_op(lambda: self._read_client.get_database(db_name))
+        return self._perform_read_op(lambda client: client.get_database(db_name))
 
     def get_all_tables(self, db_name):
         """
@@ -196,7 +266,7 @@ class HiveMetastoreClient:
 
         """
         _LOG.info("Get all tables from db %s", db_name)
-        return self._perform_read_op(lambda: self._read_client.get_all_tables(db_name))
+        return self._perform_read_op(lambda client: client.get_all_tables(db_name))
 
     def get_table(self, db_name, tb_name):
         """
@@ -219,8 +289,21 @@ class HiveMetastoreClient:
         Returns:
             hive_metastore.ttypes.Table object
         """
+        return self._perform_read_op(lambda client: client.get_table(db_name, tb_name))
+
+    def get_tables(self, db_name: str, tb_names: List[str]):
+        """
+        Same as get_table for many tables of the database with a single call
+
+        Args:
+            db_name: The name of the database
+            tb_names: The names of the tables, tables that do not exist are skipped
+
+        Returns:
+            List of hive_metastore.ttypes.Table objects
+        """
         return self._perform_read_op(
-            lambda: self._read_client.get_table(db_name, tb_name)
+            lambda client: client.get_table_objects_by_name(db_name, tb_names)
         )
 
     def _get_table_partition_keys(self, db_name: str, tb_name: str) -> List[str]:
@@ -251,7 +334,7 @@ class HiveMetastoreClient:
         Returns: List[str] The partitions of db_name.tb_name in the format ['dt=2016-03-14/hr=00', 'dt=2016-03-14/hr=01', ...]
         """
         partitions = self._perform_read_op(
-            lambda: self._read_client.get_partitions_by_filter(
+            lambda client: client.get_partitions_by_filter(
                 db_name, tb_name, filter_clause, -1
             )
         )
@@ -278,7 +361,7 @@ class HiveMetastoreClient:
         if filter_clause:
             return self.get_filtered_partitions(db_name, tb_name, filter_clause)
         return self._perform_read_op(
-            lambda: self._read_client.get_partition_names(db_name, tb_name, -1)
+            lambda client: client.get_partition_names(db_name, tb_name, -1)
         )
 
 
@@ -1,50 +1,113 @@
-from typing import Dict, TextIO
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+import time
+from typing import BinaryIO, Dict, Generator, List, TextIO, Union
 import boto3
 import botocore
 from botocore.client import Config
 
 
 from env import QuerybookSettings
+from lib.logger import get_logger
 from lib.utils.utf8 import split_by_last_invalid_utf8_char
 
 from .common import ChunkReader, FileDoesNotExist
 
+LOG = get_logger(__file__)
+
+# Max number of keys of a DeleteObjects request
+S3_MAX_DELETE_KEYS = 1000
+MAX_LOGGED_DELETE_ERRORS = 10
+
 
 class MultiPartUploader(object):
-    def __init__(self, bucket_name, key):
+    """Uploads the written data as parts of a S3 multipart upload.
+    Up to max_concurrency parts are uploaded in the background so the
+    caller does not wait on S3 for every part, writing blocks once that
+    many parts are in flight. If writing fails the upload is aborted, callers
+    that fail before complete must call abort so the parts are not kept.
+    """
+
+    def __init__(
+        self,
+        bucket_name,
+        key,
+        max_concurrency=QuerybookSettings.STORE_UPLOAD_CONCURRENCY,
+        max_part_retries=3,
+    ):
         self._bucket_name = bucket_name
         self._key = key
         self._s3 = boto3.client("s3")
         self._mpu = self._s3.create_multipart_upload(Bucket=bucket_name, Key=key)
-        self._parts = []
         self._part_number = 1
 
+        self._max_concurrency = max(max_concurrency, 1)
+        self._max_part_retries = max_part_retries
+        self._executor = ThreadPoolExecutor(max_workers=self._max_concurrency)
+        # Futures of each part in order of their part numbers
+        self._part_futures: List[Future] = []
+        self._in_flight_futures: List[Future] = []
+
         self.chunk = []
         self.chunk_datasize = 0
         self.is_first_upload = True
+        self._is_aborted = False
 
     def _upload_part(self, body):
         if self._part_number > QuerybookSettings.STORE_MAX_UPLOAD_CHUNK_NUM:
             return
 
-        part = self._s3.upload_part(
-            Bucket=self._bucket_name,
-            Key=self._key,
-            PartNumber=self._part_number,
-            UploadId=self._mpu["UploadId"],
-            Body=body,
-        )
-
-        self._parts.append(
-            {"PartNumber": self._part_number, "ETag": part["ETag"].replace('"', "")}
+        self._wait_for_in_flight_parts(self._max_concurrency - 1)
+        future = self._executor.submit(
+            self._upload_part_with_retry, self._part_number, body
         )
+        self._part_futures.append(future)
+        self._in_flight_futures.append(future)
         self._part_number += 1
 
-    def write(self, string: str) -> bool:
+    def _upload_part_with_retry(self, part_number: int, body: bytes) -> Dict:
+        for attempt in range(self._max_part_retries + 1):
+            try:
+                part = self._s3.upload_part(
+                    Bucket=self._bucket_name,
+                    Key=self._key,
+                    PartNumber=part_number,
+                    UploadId=self._mpu["UploadId"],
+                    Body=body,
+                )
+                return {
+                    "PartNumber": part_number,
+                    "ETag": part["ETag"].replace('"', ""),
+                }
+            except (botocore.exceptions.BotoCoreError, botocore.exceptions.ClientError):
+                if attempt == self._max_part_retries:
+                    raise
+                LOG.warning(
+                    f"Failed to upload part {part_number} of {self._key}, retrying"
+                )
+                time.sleep(2**attempt)
+
+    def _wait_for_in_flight_parts(self, max_in_flight: int):
+        """Block until at most max_in_flight parts are being uploaded,
+        raises the error of any part that failed after its retries
+        """
+        while True:
+            in_flight = []
+            for future in self._in_flight_futures:
+                if not future.done():
+                    in_flight.append(future)
+                elif future.exception() is not None:
+                    raise future.exception()
+            self._in_flight_futures = in_flight
+
+            if len(in_flight) <= max_in_flight:
+                break
+            wait(in_flight, return_when=FIRST_COMPLETED)
+
+    def write(self, string: Union[str, bytes]) -> bool:
         """Write a string to upload
 
         Arguments:
-            string {str} -- the string to upload
+            string {Union[str, bytes]} -- the string (or bytes) to upload
 
         Returns:
             bool -- Whether or not the upload is successful
@@ -52,10 +115,17 @@ class MultiPartUploader(object):
         if self._part_number > QuerybookSettings.STORE_MAX_UPLOAD_CHUNK_NUM:
             return False
 
+        if isinstance(string, str):
+            string = string.encode("utf-8")
+
         self.chunk.append(string)
         self.chunk_datasize += len(string)
         if self.chunk_datasize > QuerybookSettings.STORE_MIN_UPLOAD_CHUNK_SIZE:
-            self._upload_part("".join(self.chunk))
+            try:
+                self._upload_part(b"".join(self.chunk))
+            except Exception:
+                self.abort()
+                raise
             self.chunk = []
             self.chunk_datasize = 0
         return True
@@ -64,15 +134,83 @@ class MultiPartUploader(object):
         self.write(string + "\n")
 
     def complete(self):
-        if len(self.chunk) > 0:
-            self._upload_part("".join(self.chunk))
+        try:
+            if len(self.chunk) > 0:
+                self._upload_part(b"".join(self.chunk))
+            self._wait_for_in_flight_parts(0)
+            parts = [future.result() for future in self._part_futures]
+        except Exception:
+            self.abort()
+            raise
+        finally:
+            self._executor.shutdown(wait=False)
+
         self._s3.complete_multipart_upload(
             Bucket=self._bucket_name,
             Key=self._key,
             UploadId=self._mpu["UploadId"],
-            MultipartUpload={"Parts": self._parts},
+            MultipartUpload={"Parts": parts},
         )
 
+    def abort(self):
+        """Stop uploading and delete the parts that were uploaded"""
+        if self._is_aborted:
+            return
+        self._is_aborted = True
+
+        # Parts still being uploaded would be kept if they finish after the abort
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        self._s3.abort_multipart_upload(
+            Bucket=self._bucket_name,
+            Key=self._key,
+            UploadId=self._mpu["UploadId"],
+        )
+
+
+def delete_keys(bucket_name: str, keys: List[str]) -> int:
+    """Delete the keys with DeleteObjects requests of up to
+       S3_MAX_DELETE_KEYS keys each. Keys that do not exist count as deleted.
+
+    Arguments:
+        bucket_name {str} -- The bucket of the keys
+        keys {List[str]} -- The keys to delete
+
+    Returns:
+        int -- The number of deleted keys
+    """
+    s3 = boto3.client("s3")
+    deleted_count = 0
+    for i in range(0, len(keys), S3_MAX_DELETE_KEYS):
+        batch = keys[i : i + S3_MAX_DELETE_KEYS]
+        response = s3.delete_objects(
+            Bucket=bucket_name,
+            # Quiet mode only returns the keys that failed
+            Delete={"Objects": [{"Key": key} for key in batch], "Quiet": True},
+        )
+        errors = response.get("Errors", [])
+        for error in errors[:MAX_LOGGED_DELETE_ERRORS]:
+            LOG.error(f"Failed to delete {error.get('Key')}: {error.get('Message')}")
+        deleted_count += len(batch) - len(errors)
+    return deleted_count
+
+
+def list_keys(bucket_name: str, prefix: str) -> Generator[str, None, None]:
+    """List the keys that start with the prefix, a page of up to
+       1000 keys is requested at a time
+
+    Arguments:
+        bucket_name {str} -- The bucket of the keys
+        prefix {str} -- The prefix of the keys
+
+    Returns:
+        Generator[str, None, None] -- The keys
+    """
+    s3 = boto3.client("s3")
+    paginator = s3.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=bucket_name, Prefix=prefix):
+        for s3_object in page.get("Contents", []):
+            yield s3_object["Key"]
+
 
 class S3KeySigner(object):
     def __init__(self, bucket_name):
@@ -130,6 +268,14 @@ class S3FileReader(ChunkReader):
             else:
                 raise e
 
+    @property
+    def body(self) -> BinaryIO:
+        return self._body
+
+    def open_body(self, offset: int) -> BinaryIO:
+        """Open a new stream of the object from the byte offset with a ranged get"""
+        return self._object.get(Range=f"bytes={offset}-")["Body"]
+
     def read(self):
         raw = self._left_over_bytes + self._body.read(self._read_size)
         valid_raw, self._left_over_bytes = split_by_last_invalid_utf8_char(raw)
@@ -32,3 +32,10 @@ DEFAULT_TABLE_SEARCH_LIMIT = 10
 DEFAULT_QUERY_SEARCH_LIMIT = 10
 # how many tables to select for text-to-sql
 DEFAULT_TABLE_SELECT_LIMIT = 3
+
+# how many summaries are generated at the same time when ingesting the vector index
+DEFAULT_VECTOR_INGEST_CONCURRENCY = 4
+# how many times a summary is retried when the llm provider is rate limiting
+DEFAULT_VECTOR_INGEST_MAX_RETRIES = 5
+# how many documents are embedded and written to the vector store at once
+DEFAULT_VECTOR_STORE_WRITE_BATCH_SIZE = 100
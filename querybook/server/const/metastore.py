@@ -90,6 +90,10 @@ class DataTable(NamedTuple):
     # table warnings
     warnings: list[tuple[DataTableWarningSeverity, str]] = None
 
+    # Value that changes whenever the table changes, e.g. its last modified time.
+    # Must be the same as returned by get_table_change_signals of the loader
+    change_signal: str = None
+
 
 class DataColumn(NamedTuple):
     name: str
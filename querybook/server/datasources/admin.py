@@ -10,6 +10,7 @@ from lib.engine_status_checker import (
     ALL_ENGINE_STATUS_CHECKERS,
     get_engine_checker_class,
 )
+from lib.metastore import invalidate_metastore_loader
 from lib.metastore.all_loaders import ALL_METASTORE_LOADERS
 from lib.table_upload.exporter.exporter_factory import ALL_TABLE_UPLOAD_EXPORTER_BY_NAME
 from lib.query_executor.all_executors import (
@@ -313,6 +314,7 @@ def update_metastore(
             ),
             session=session,
         )
+        invalidate_metastore_loader(id)
         metastore_dict = metastore.to_dict_admin()
         return metastore_dict
 
@@ -354,6 +356,7 @@ def delete_metastore(
     id,
 ):
     logic.delete_query_metastore_by_id(id)
+    invalidate_metastore_loader(id)
 
 
 @register(
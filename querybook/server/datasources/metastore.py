@@ -14,13 +14,12 @@ from app.flask_app import cache, limiter
 from const.datasources import RESOURCE_NOT_FOUND_STATUS_CODE
 from const.impression import ImpressionItemType
 from const.metastore import DataTableWarningSeverity, MetadataType
-from const.time import seconds_in_a_day
 from flask_login import current_user
 from lib.lineage.utils import lineage
 from lib.metastore import get_metastore_loader
 from lib.metastore.utils import DataTableFinder
 from lib.query_analysis.samples import make_samples_query
-from lib.utils import mysql_cache
+from lib.utils import tiered_cache
 from logic import admin as admin_logic
 from logic import metastore as logic
 from models.metastore import DataTableStatistics, DataTableWarning
@@ -359,10 +358,8 @@ def get_table_samples(table_id, environment_id):
         with DBSession() as session:
             verify_environment_permission([environment_id])
             verify_data_table_permission(table_id, session=session)
-            return mysql_cache.get_key(
-                f"table_samples_{table_id}_{current_user.id}",
-                expires_after=seconds_in_a_day,
-                session=session,
+            return tiered_cache.get_key(
+                f"table_samples_{table_id}_{current_user.id}", durable=True
             )
     except LookupError:
         return None
@@ -1,5 +1,6 @@
 from datetime import datetime
 from typing import Dict, Optional
+import zlib
 
 from flask import abort, Response, redirect, request
 from flask_login import current_user
@@ -383,24 +384,65 @@ def download_statement_execution_result(statement_execution_id):
             download_url = reader.get_download_url(custom_name=download_file_name)
             response = redirect(download_url)
         else:
-            # We read the raw file and download it for the user
+            # We stream the file to the user in chunks
             reader.start()
-            raw = reader.read_raw()
-            response = Response(raw)
-            response.headers["Content-Type"] = "text/csv"
-            response.headers["Content-Disposition"] = (
-                f'attachment; filename="{download_file_name}"'
-            )
+            response = _get_result_download_response(reader, download_file_name)
         return response
 
 
+def _get_result_download_response(
+    reader: GenericReader, download_file_name: str
+) -> Response:
+    headers = {
+        "Content-Type": "text/csv",
+        "Content-Disposition": f'attachment; filename="{download_file_name}"',
+    }
+    status = 200
+    size = reader.get_download_size()
+    start, end = 0, size
+    if size is not None:
+        headers["Accept-Ranges"] = "bytes"
+        # Multiple ranges are not supported, the whole file is sent instead
+        if request.range is not None and len(request.range.ranges) == 1:
+            byte_range = request.range.range_for_length(size)
+            if byte_range is None:
+                return Response(
+                    status=416, headers={"Content-Range": f"bytes */{size}"}
+                )
+            start, end = byte_range
+            status = 206
+            headers["Content-Range"] = request.range.to_content_range_header(size)
+
+    chunks = reader.get_download_iter(start, end)
+    if status == 200 and "gzip" in request.accept_encodings:
+        chunks = _gzip_chunks(chunks)
+        headers["Content-Encoding"] = "gzip"
+        headers["Vary"] = "Accept-Encoding"
+    elif end is not None:
+        headers["Content-Length"] = str(end - start)
+
+    return Response(chunks, status=status, headers=headers, direct_passthrough=True)
+
+
+def _gzip_chunks(chunks):
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
 @register(
     "/statement_execution/<int:statement_execution_id>/result/",
     methods=["GET"],
     require_auth=True,
 )
 def get_statement_execution_result(
-    statement_execution_id: int, limit: int = None, from_env: str = None
+    statement_execution_id: int,
+    limit: int = None,
+    from_env: str = None,
+    offset: int = 0,
 ):
     # TODO: make this customizable
     limit = (
@@ -412,6 +454,7 @@ def get_statement_execution_result(
         limit <= QUERY_RESULT_LIMIT_CONFIG["query_result_size_options"][-1],
         message="Too many rows requested",
     )
+    api_assert(offset >= 0, message="Invalid row offset")
 
     with DBSession() as session:
         try:
@@ -435,7 +478,11 @@ def get_statement_execution_result(
             )
 
             with GenericReader(statement_execution.result_path) as reader:
-                result = reader.read_csv(number_of_lines=limit + 1)  # 1 row for column
+                result = list(
+                    reader.get_csv_iter_from_row(
+                        offset, number_of_lines=limit + 1  # 1 row for column
+                    )
+                )
                 return result
         except FileDoesNotExist as e:
             abort(RESOURCE_NOT_FOUND_STATUS_CODE, str(e))
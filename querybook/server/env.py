@@ -62,14 +62,26 @@ class QuerybookSettings(object):
 
     # Celery
     REDIS_URL = get_env_config("REDIS_URL", optional=False)
+    QUERY_EXECUTION_QUEUE = get_env_config("QUERY_EXECUTION_QUEUE")
 
     # Search
     ELASTICSEARCH_HOST = get_env_config("ELASTICSEARCH_HOST", optional=False)
     ELASTICSEARCH_CONNECTION_TYPE = get_env_config("ELASTICSEARCH_CONNECTION_TYPE")
+    ES_BULK_CHUNK_SIZE = int(get_env_config("ES_BULK_CHUNK_SIZE") or 500)
+    ES_BULK_MAX_CHUNK_BYTES = int(get_env_config("ES_BULK_MAX_CHUNK_BYTES") or 10485760)
+    ES_BULK_THREAD_COUNT = int(get_env_config("ES_BULK_THREAD_COUNT") or 4)
 
     # Lineage
     DATA_LINEAGE_BACKEND = get_env_config("DATA_LINEAGE_BACKEND")
 
+    # Query Analysis
+    QUERY_ANALYSIS_BACKEND = get_env_config("QUERY_ANALYSIS_BACKEND") or "sqlparse"
+
+    # Metastore
+    METASTORE_LOAD_NUM_PROCESSES = int(
+        get_env_config("METASTORE_LOAD_NUM_PROCESSES") or 0
+    )
+
     # Database
     DATABASE_CONN = get_env_config("DATABASE_CONN", optional=False)
     DATABASE_POOL_SIZE = int(get_env_config("DATABASE_POOL_SIZE"))
@@ -132,11 +144,14 @@ class QuerybookSettings(object):
 
     # Result Store
     RESULT_STORE_TYPE = get_env_config("RESULT_STORE_TYPE")
+    RESULT_STORE_FORMAT = get_env_config("RESULT_STORE_FORMAT") or "csv"
+    RESULT_PREFETCH_QUEUE_SIZE = int(get_env_config("RESULT_PREFETCH_QUEUE_SIZE") or 2)
 
     STORE_BUCKET_NAME = get_env_config("STORE_BUCKET_NAME")
     STORE_PATH_PREFIX = get_env_config("STORE_PATH_PREFIX")
     STORE_MIN_UPLOAD_CHUNK_SIZE = int(get_env_config("STORE_MIN_UPLOAD_CHUNK_SIZE"))
     STORE_MAX_UPLOAD_CHUNK_NUM = int(get_env_config("STORE_MAX_UPLOAD_CHUNK_NUM"))
+    STORE_UPLOAD_CONCURRENCY = int(get_env_config("STORE_UPLOAD_CONCURRENCY") or 4)
     STORE_MAX_READ_SIZE = int(get_env_config("STORE_MAX_READ_SIZE"))
     STORE_READ_SIZE = int(get_env_config("STORE_READ_SIZE"))
     S3_BUCKET_S3V4_ENABLED = get_env_config("S3_BUCKET_S3V4_ENABLED") == "true"
@@ -1,17 +1,27 @@
 from abc import ABCMeta, abstractclassmethod
 from typing import Dict, List
 from typing_extensions import TypedDict
-from datetime import datetime
+import time
+
+from redis.exceptions import RedisError
 
 from app.db import with_session
 from const.query_execution import QueryEngineStatus
-from lib.utils.mysql_cache import get_raw_key, set_key
-from lib.utils.utils import DATETIME_TO_UTC
+from lib.logger import get_logger
+from lib.utils.tiered_cache import acquire_lock, get_raw_key, set_key
 from lib.query_executor.base_executor import QueryExecutorBaseClass
 from lib.query_executor.all_executors import get_executor_class
 from logic.admin import get_query_engine_by_id
 from tasks.poll_engine_status import poll_engine_status
 
+LOG = get_logger(__file__)
+
+# Seconds a web process reuses the status it read from the cache
+LOCAL_CACHE_EXPIRY = 5
+# The cached status can be shown while stale, until it is
+# this many times older than SERVER_RESULT_EXPIRY
+STALE_RESULT_EXPIRY_MULTIPLIER = 10
+
 
 class EngineStatus(TypedDict):
     status: QueryEngineStatus
@@ -100,7 +110,11 @@ class BaseEngineStatusChecker(metaclass=ABCMeta):
         """This function runs in celery and set the cache"""
         result = cls.perform_check_with_engine_id(engine_id)
         key = cls.generate_server_check_cache_key(engine_id)
-        set_key(key, result)
+        set_key(
+            key,
+            result,
+            expires_after=cls.SERVER_RESULT_EXPIRY() * STALE_RESULT_EXPIRY_MULTIPLIER,
+        )
 
     @classmethod
     def get_server_status(cls, engine_id) -> EngineStatus:
@@ -112,23 +126,33 @@ class BaseEngineStatusChecker(metaclass=ABCMeta):
 
         cache_updated_at = None
         try:
-            raw_cache = get_raw_key(key)
-            if raw_cache is not None:
-                result = raw_cache["value"]
-                cache_updated_at = raw_cache["updated_at"]
+            raw_cache = get_raw_key(key, local_expires_after=LOCAL_CACHE_EXPIRY)
+            result = raw_cache["value"]
+            cache_updated_at = raw_cache["updated_at"]
         except LookupError:
             pass  # Unable to get key
 
         if (
             cache_updated_at is None
-            or DATETIME_TO_UTC(datetime.utcnow()) - cache_updated_at
-            > cls.SERVER_RESULT_EXPIRY()
-        ):
-
-            # Result was expired, getting a new one
+            or time.time() - cache_updated_at > cls.SERVER_RESULT_EXPIRY()
+        ) and cls._acquire_check_lock(key):
+            # Result was expired, getting a new one. The lock makes sure
+            # only one request queues the check until it expires
             poll_engine_status.delay(cls.NAME(), engine_id)
         return result
 
+    @classmethod
+    def _acquire_check_lock(cls, key: str) -> bool:
+        try:
+            return (
+                acquire_lock(key, expires_after=cls.SERVER_RESULT_EXPIRY()) is not None
+            )
+        except RedisError:
+            # Without the lock every request would queue a check,
+            # and the checked status could not be cached anyway
+            LOG.warning(f"Failed to acquire the lock of {key}", exc_info=True)
+            return False
+
     @classmethod
     def generate_server_check_cache_key(cls, engine_id):
         return f"ENGINE_STATUS_CHECK:{engine_id}"
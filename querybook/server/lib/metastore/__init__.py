@@ -1,8 +1,20 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Callable, Dict, Tuple
+
 from app.db import with_session
 
 from logic.admin import get_query_metastore_by_id
 from lib.metastore.base_metastore_loader import BaseMetastoreLoader
 
+# Shareable loaders are kept by each process so that their metastore
+# connections are reused, they are recreated when the config changes
+_loaders: Dict[int, Tuple[str, BaseMetastoreLoader]] = {}
+_loaders_pid = None
+_loaders_lock = threading.Lock()
+
 
 def get_metastore_loader_class_by_name(name: str) -> BaseMetastoreLoader:
     from lib.metastore.all_loaders import ALL_METASTORE_LOADERS
@@ -13,13 +25,55 @@ def get_metastore_loader_class_by_name(name: str) -> BaseMetastoreLoader:
     raise ValueError(f"Unknown loader name {name}")
 
 
+def _get_metastore_config_version(metastore_dict: Dict) -> str:
+    return hashlib.md5(
+        json.dumps(
+            [
+                metastore_dict["loader"],
+                metastore_dict["metastore_params"],
+                metastore_dict["acl_control"],
+            ],
+            sort_keys=True,
+        ).encode("utf-8")
+    ).hexdigest()
+
+
 @with_session
 def get_metastore_loader(metastore_id: int, session=None) -> BaseMetastoreLoader:
+    global _loaders, _loaders_pid
+
     metastore = get_query_metastore_by_id(id=metastore_id, session=session)
     metastore_dict = metastore.to_dict_admin()
-    return get_metastore_loader_class_by_name(metastore_dict["loader"])(metastore_dict)
+    loader_class = get_metastore_loader_class_by_name(metastore_dict["loader"])
+    if not loader_class.shareable:
+        return loader_class(metastore_dict)
+
+    version = _get_metastore_config_version(metastore_dict)
+    with _loaders_lock:
+        # Loaders of the parent process are not reused after a fork
+        if _loaders_pid != os.getpid():
+            _loaders = {}
+            _loaders_pid = os.getpid()
+
+        loader_version, loader = _loaders.get(metastore_id, (None, None))
+        if loader_version != version:
+            loader = loader_class(metastore_dict)
+            _loaders[metastore_id] = (version, loader)
+        return loader
+
+
+def invalidate_metastore_loader(metastore_id: int):
+    """Drop the loader kept by this process, other processes
+    recreate theirs once they see the new metastore config
+    """
+    with _loaders_lock:
+        _loaders.pop(metastore_id, None)
 
 
-def load_metastore(metastore_id: int):
+def load_metastore(
+    metastore_id: int,
+    full_load: bool = False,
+    progress_callback: Callable[[int, int], None] = None,
+):
     loader = get_metastore_loader(metastore_id)
-    loader.load()
+    return loader.load(full_load=full_load, progress_callback=progress_callback)
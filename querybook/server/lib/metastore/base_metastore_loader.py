@@ -1,11 +1,14 @@
 import math
 import traceback
 from abc import ABCMeta, abstractclassmethod, abstractmethod
-from typing import Dict, List, Optional, Tuple
+from itertools import groupby
+from typing import Callable, Dict, List, Optional, Tuple
 
+import billiard
 import gevent
 from app.db import DBSession, with_session
 from const.data_element import DataElementTuple, DataElementAssociationTuple
+from const.elasticsearch import ElasticsearchItem
 from const.metastore import (
     DataColumn,
     DataOwnerType,
@@ -13,13 +16,16 @@ from const.metastore import (
     MetadataType,
     MetastoreLoaderConfig,
 )
+from env import QuerybookSettings
 from lib.form import AllFormField
 from lib.logger import get_logger
 from lib.utils import json
 from lib.utils.utils import with_exception
 from logic.data_element import create_column_data_element_association
-from logic.elasticsearch import delete_es_table_by_id, update_table_by_id
+from logic.elasticsearch import update_table_by_id
 from logic.metastore import (
+    bulk_create_tables,
+    bulk_delete_tables,
     create_column,
     create_schema,
     create_table,
@@ -33,19 +39,29 @@ from logic.metastore import (
     get_schema_by_name,
     get_table_by_schema_id,
     get_table_by_schema_id_and_name,
+    get_table_change_signals_by_schema_id,
     iterate_data_schema,
 )
 from logic.tag import create_column_tags, create_table_tags
+from tasks.sync_elasticsearch import mark_elasticsearch_items_dirty
 
 from .utils import MetastoreTableACLChecker
 
 LOG = get_logger(__name__)
 
+# Number of tables of a schema that are fetched from
+# the metastore and then written together by load()
+TABLE_SYNC_BATCH_SIZE = 100
+
 
 class BaseMetastoreLoader(metaclass=ABCMeta):
     loader_config: MetastoreLoaderConfig = MetastoreLoaderConfig({})
+    # Set to True if the loader can be used by many greenlets or threads at the
+    # same time, so that get_metastore_loader keeps one loader per process
+    shareable: bool = False
 
     def __init__(self, metastore_dict: Dict):
+        self.metastore_dict = metastore_dict
         self.metastore_id = metastore_dict["id"]
         self.acl_checker = MetastoreTableACLChecker(metastore_dict["acl_control"])
 
@@ -277,8 +293,26 @@ class BaseMetastoreLoader(metaclass=ABCMeta):
         schema_names = self.get_all_schema_names()
         return schema_name in schema_names
 
-    def load(self):
+    def load(
+        self,
+        full_load: bool = False,
+        progress_callback: Callable[[int, int], None] = None,
+    ) -> Dict[str, int]:
+        """Sync all the schemas and tables of the metastore. Unless full_load
+        is set, tables whose change signal is the same as the one stored
+        by the last sync are not fetched again.
+
+        Keyword Arguments:
+            full_load {bool} -- Fetch every table even if it did not change (default: {False})
+            progress_callback {Callable[[int, int], None]} -- Called with the number of
+                                                              tables synced so far and the
+                                                              number of tables to sync
+
+        Returns:
+            Dict[str, int] -- Number of tables scanned, skipped and changed
+        """
         schema_tables = []
+        num_scanned = 0
         schema_names = set(self._get_all_filtered_schema_names())
 
         with DBSession() as session:
@@ -294,10 +328,53 @@ class BaseMetastoreLoader(metaclass=ABCMeta):
                     session=session,
                 ).id
                 delete_table_not_in_metastore(schema_id, table_names, session=session)
+
+                num_scanned += len(table_names)
+                if not full_load:
+                    table_names = self._get_changed_table_names(
+                        schema_id, schema_name, table_names, session=session
+                    )
                 schema_tables += [
                     (schema_id, schema_name, table_name) for table_name in table_names
                 ]
-        self._create_tables_batched(schema_tables)
+        table_ids = self._create_tables_batched(schema_tables, progress_callback)
+
+        stats = {
+            "scanned": num_scanned,
+            "skipped": num_scanned - len(schema_tables),
+            "changed": len(schema_tables),
+            "failed": len(schema_tables) - len(table_ids),
+        }
+        LOG.info(f"Loaded metastore {self.metastore_id}: {stats}")
+        return stats
+
+    @with_session
+    def _get_changed_table_names(
+        self, schema_id: int, schema_name: str, table_names: List[str], session=None
+    ) -> List[str]:
+        """Get the tables whose change signal differs from the stored one,
+        or all of them if the loader does not provide change signals
+        """
+        if not table_names:
+            return table_names
+
+        try:
+            change_signals = self.get_table_change_signals(schema_name, table_names)
+        except Exception:
+            LOG.error(traceback.format_exc())
+            change_signals = None
+        if change_signals is None:
+            return table_names
+
+        db_change_signals = get_table_change_signals_by_schema_id(
+            schema_id, session=session
+        )
+        return [
+            table_name
+            for table_name in table_names
+            if change_signals.get(table_name) is None
+            or change_signals[table_name] != db_change_signals.get(table_name)
+        ]
 
     def get_latest_partition(
         self, schema_name: str, table_name: str, conditions: Dict[str, str] = None
@@ -306,12 +383,34 @@ class BaseMetastoreLoader(metaclass=ABCMeta):
         latest_partition = partitions[-1] if partitions and len(partitions) else None
         return latest_partition
 
-    def _create_tables_batched(self, schema_tables):
-        """Create greenlets for create table batches
+    def _create_tables_batched(
+        self,
+        schema_tables: List[Tuple[int, str, str]],
+        progress_callback: Callable[[int, int], None] = None,
+    ) -> List[int]:
+        """Create greenlets for create table batches, or sync the tables in
+        worker processes if the loader is configured with num_processes
 
         Arguments:
             schema_tables {List[schema_id, schema_name, table_name]} -- List of configs to load table
+
+        Returns:
+            List[int] -- Ids of the created or updated tables
         """
+        progress = LoadProgress(len(schema_tables), progress_callback)
+        num_processes = self._get_parallelization_setting().get("num_processes", 0)
+        if num_processes > 1 and len(schema_tables) > TABLE_SYNC_BATCH_SIZE:
+            return self._create_tables_in_processes(
+                schema_tables, num_processes, progress
+            )
+
+        return self._create_tables_in_greenlets(schema_tables, progress)
+
+    def _create_tables_in_greenlets(
+        self,
+        schema_tables: List[Tuple[int, str, str]],
+        progress: "LoadProgress",
+    ) -> List[int]:
         batch_size = self._get_batch_size(len(schema_tables))
         greenlets = []
         thread_num = 0
@@ -322,17 +421,279 @@ class BaseMetastoreLoader(metaclass=ABCMeta):
             thread_num += 1
 
             if len(table_batch):
-                greenlets.append(gevent.spawn(self._create_tables, table_batch))
+                greenlets.append(
+                    gevent.spawn(self._create_tables, table_batch, progress)
+                )
             else:
                 break
         gevent.joinall(greenlets)
+        return [
+            table_id for greenlet in greenlets for table_id in (greenlet.value or [])
+        ]
+
+    def _create_tables_in_processes(
+        self,
+        schema_tables: List[Tuple[int, str, str]],
+        num_processes: int,
+        progress: "LoadProgress",
+    ) -> List[int]:
+        """Shard the tables across forked worker processes. Each process
+        creates its own loader, and so its own metastore client, while the
+        database connections of this process are discarded by the pid check
+        of the engine. The table ids returned by the workers are merged here.
+
+        The processes are started with billiard since, unlike multiprocessing,
+        it can fork from the daemonic processes of prefork celery workers.
+        If they cannot be started, the tables are synced by greenlets.
+        """
+        try:
+            pool = billiard.get_context("fork").Pool(
+                processes=num_processes,
+                initializer=_init_loader_process,
+                initargs=(type(self), self.metastore_dict),
+            )
+        except Exception:
+            LOG.error(
+                "Failed to start the loader processes, syncing with greenlets\n"
+                + traceback.format_exc()
+            )
+            return self._create_tables_in_greenlets(schema_tables, progress)
 
-    def _create_tables(self, schema_tables):
+        table_ids = []
+        try:
+            for num_tables, process_table_ids in pool.imap_unordered(
+                _create_tables_in_loader_process, _group_schema_tables(schema_tables)
+            ):
+                table_ids.extend(process_table_ids)
+                progress.add(num_tables)
+            pool.close()
+        except Exception:
+            pool.terminate()
+            raise
+        finally:
+            pool.join()
+        return table_ids
+
+    def _create_tables(
+        self,
+        schema_tables: List[Tuple[int, str, str]],
+        progress: "LoadProgress" = None,
+    ) -> List[int]:
+        table_ids = []
         with DBSession() as session:
-            for schema_id, schema_name, table in schema_tables:
-                self._create_table_table(
-                    schema_id, schema_name, table, from_batch=True, session=session
+            for schema_id, schema_name, table_names in _group_schema_tables(
+                schema_tables
+            ):
+                table_ids += self._create_tables_in_schema(
+                    schema_id, schema_name, table_names, session=session
                 )
+                if progress:
+                    progress.add(len(table_names))
+        return table_ids
+
+    @with_session
+    def _create_tables_in_schema(
+        self, schema_id: int, schema_name: str, table_names: List[str], session=None
+    ) -> List[int]:
+        """Fetch the tables from the metastore and create or update them in bulk.
+        If the bulk update fails, the tables are created one by one so that
+        a bad table does not fail the others.
+
+        Returns:
+            List[int] -- Ids of the created or updated tables
+        """
+        tables = []
+        for table_name in table_names:
+            try:
+                table, columns = self.get_table_and_columns(schema_name, table_name)
+            except Exception:
+                LOG.error(traceback.format_exc())
+                continue
+            if table:
+                tables.append((table, columns))
+
+        if not tables:
+            return []
+
+        try:
+            return self._bulk_create_table_table(schema_id, tables, session=session)
+        except Exception:
+            session.rollback()
+            LOG.error(traceback.format_exc())
+
+        table_ids = []
+        for table, columns in tables:
+            table_id = self._create_table_table(
+                schema_id,
+                schema_name,
+                table.name,
+                table,
+                columns,
+                from_batch=True,
+                session=session,
+            )
+            if table_id is not None:
+                table_ids.append(table_id)
+        return table_ids
+
+    @with_session
+    def _bulk_create_table_table(
+        self,
+        schema_id: int,
+        tables: List[Tuple[DataTable, List[DataColumn]]],
+        session=None,
+    ) -> List[int]:
+        """Same as _create_table_table for many tables of a schema. The tables
+        and columns are diffed against the database by bulk_create_tables, and
+        only the tables that changed are synced to elasticsearch.
+        """
+        table_ids_by_name, column_ids_by_table_id, changed_table_ids = (
+            bulk_create_tables(
+                schema_id,
+                [
+                    {
+                        "table": self._get_table_fields(table, columns),
+                        "information": self._get_table_information_fields(table),
+                        "columns": [
+                            self._get_column_fields(column) for column in columns
+                        ],
+                    }
+                    for table, columns in tables
+                ],
+                commit=False,
+                session=session,
+            )
+        )
+
+        table_ids = []
+        for table, columns in tables:
+            table_id = table_ids_by_name[table.name]
+            column_ids = column_ids_by_table_id.get(table_id, {})
+            self._create_table_metadata(
+                table_id,
+                table,
+                [(column_ids[column.name], column) for column in columns],
+                session=session,
+            )
+            table_ids.append(table_id)
+        session.commit()
+
+        if self.loader_config.can_load_external_metadata(
+            MetadataType.TAG
+        ) or self.loader_config.can_load_external_metadata(MetadataType.DATA_ELEMENT):
+            # Tags and data elements are recreated, so any of them may have changed
+            changed_table_ids = table_ids
+        mark_elasticsearch_items_dirty(
+            ElasticsearchItem.tables.value, changed_table_ids
+        )
+        return table_ids
+
+    def _get_table_fields(self, table: DataTable, columns: List[DataColumn]) -> Dict:
+        """Get the create_table arguments of the table"""
+        return {
+            "name": table.name,
+            "type": table.type,
+            "owner": table.owner,
+            "table_created_at": table.table_created_at,
+            "table_updated_by": table.table_updated_by,
+            "table_updated_at": table.table_updated_at,
+            "data_size_bytes": table.data_size_bytes,
+            "location": table.location,
+            "column_count": len(columns),
+            "golden": table.golden,
+            "boost_score": table.boost_score,
+            "change_signal": table.change_signal,
+        }
+
+    def _get_table_information_fields(self, table: DataTable) -> Dict:
+        """Get the create_table_information arguments of the table"""
+        return {
+            "description": table.description,
+            "latest_partitions": json.dumps(
+                table.latest_partitions or (table.partitions or [])[-10:]
+            ),
+            "earliest_partitions": json.dumps(
+                table.earliest_partitions or (table.partitions or [])[:10]
+            ),
+            "hive_metastore_description": table.raw_description,
+            "partition_keys": table.partition_keys,
+            "custom_properties": table.custom_properties,
+            "table_links": table.table_links,
+        }
+
+    def _get_column_fields(self, column: DataColumn) -> Dict:
+        """Get the create_column arguments of the column"""
+        return {
+            "name": column.name,
+            "type": column.type,
+            "comment": column.comment,
+            "description": column.description,
+        }
+
+    @with_session
+    def _create_table_metadata(
+        self,
+        table_id: int,
+        table: DataTable,
+        columns: List[Tuple[int, DataColumn]],
+        session=None,
+    ):
+        """Create the warnings of the table, and the tags, owners and data
+        elements of the table and its columns if the metastore syncs them
+
+        Arguments:
+            table_id {int} -- Id of the table
+            table {DataTable} -- The table from the metastore
+            columns {List[Tuple[int, DataColumn]]} -- Ids of the columns and the columns from the metastore
+        """
+        if table.warnings is not None:
+            create_table_warnings(
+                table_id=table_id,
+                warnings=table.warnings,
+                commit=False,
+                session=session,
+            )
+
+        for column_id, column in columns:
+            # create tags only if the metastore is configured to sync tags
+            if self.loader_config.can_load_external_metadata(MetadataType.TAG):
+                create_column_tags(
+                    column_id=column_id,
+                    tags=column.tags,
+                    commit=False,
+                    session=session,
+                )
+
+            # create data element associations only if the metastore is configured to sync data elements
+            if self.loader_config.can_load_external_metadata(MetadataType.DATA_ELEMENT):
+                data_element_association = (
+                    self._populate_column_data_element_association(column.data_element)
+                )
+                create_column_data_element_association(
+                    metastore_id=self.metastore_id,
+                    column_id=column_id,
+                    data_element_association=data_element_association,
+                    commit=False,
+                    session=session,
+                )
+
+        # create tags only if the metastore is configured to sync tags
+        if self.loader_config.can_load_external_metadata(MetadataType.TAG):
+            create_table_tags(
+                table_id=table_id,
+                tags=table.tags,
+                commit=False,
+                session=session,
+            )
+
+        # load owners if the metastore is configured to sync table owners
+        if self.loader_config.can_load_external_metadata(MetadataType.OWNER):
+            create_table_ownerships(
+                table_id=table_id,
+                owners=table.owners,
+                commit=False,
+                session=session,
+            )
 
     @with_session
     def _create_table_table(
@@ -361,43 +722,16 @@ class BaseMetastoreLoader(metaclass=ABCMeta):
 
         try:
             table_id = create_table(
-                name=table.name,
-                type=table.type,
-                owner=table.owner,
-                table_created_at=table.table_created_at,
-                table_updated_by=table.table_updated_by,
-                table_updated_at=table.table_updated_at,
-                data_size_bytes=table.data_size_bytes,
-                location=table.location,
-                column_count=len(columns),
                 schema_id=schema_id,
-                golden=table.golden,
-                boost_score=table.boost_score,
                 commit=False,
                 session=session,
+                **self._get_table_fields(table, columns),
             ).id
             create_table_information(
                 data_table_id=table_id,
-                description=table.description,
-                latest_partitions=json.dumps(
-                    table.latest_partitions or (table.partitions or [])[-10:]
-                ),
-                earliest_partitions=json.dumps(
-                    table.earliest_partitions or (table.partitions or [])[:10]
-                ),
-                hive_metastore_description=table.raw_description,
-                partition_keys=table.partition_keys,
-                custom_properties=table.custom_properties,
-                table_links=table.table_links,
                 session=session,
+                **self._get_table_information_fields(table),
             )
-            if table.warnings is not None:
-                create_table_warnings(
-                    table_id=table_id,
-                    warnings=table.warnings,
-                    commit=False,
-                    session=session,
-                )
 
             delete_column_not_in_metastore(
                 table_id,
@@ -406,60 +740,18 @@ class BaseMetastoreLoader(metaclass=ABCMeta):
                 session=session,
             )
 
-            for column in columns:
-                column_id = create_column(
-                    name=column.name,
-                    type=column.type,
-                    comment=column.comment,
-                    description=column.description,
+            column_ids = [
+                create_column(
                     table_id=table_id,
                     commit=False,
                     session=session,
+                    **self._get_column_fields(column),
                 ).id
-
-                # create tags only if the metastore is configured to sync tags
-                if self.loader_config.can_load_external_metadata(MetadataType.TAG):
-                    create_column_tags(
-                        column_id=column_id,
-                        tags=column.tags,
-                        commit=False,
-                        session=session,
-                    )
-
-                # create data element associations only if the metastore is configured to sync data elements
-                if self.loader_config.can_load_external_metadata(
-                    MetadataType.DATA_ELEMENT
-                ):
-                    data_element_association = (
-                        self._populate_column_data_element_association(
-                            column.data_element
-                        )
-                    )
-                    create_column_data_element_association(
-                        metastore_id=self.metastore_id,
-                        column_id=column_id,
-                        data_element_association=data_element_association,
-                        commit=False,
-                        session=session,
-                    )
-
-            # create tags only if the metastore is configured to sync tags
-            if self.loader_config.can_load_external_metadata(MetadataType.TAG):
-                create_table_tags(
-                    table_id=table_id,
-                    tags=table.tags,
-                    commit=False,
-                    session=session,
-                )
-
-            # load owners if the metastore is configured to sync table owners
-            if self.loader_config.can_load_external_metadata(MetadataType.OWNER):
-                create_table_ownerships(
-                    table_id=table_id,
-                    owners=table.owners,
-                    commit=False,
-                    session=session,
-                )
+                for column in columns
+            ]
+            self._create_table_metadata(
+                table_id, table, list(zip(column_ids, columns)), session=session
+            )
             session.commit()
             update_table_by_id(
                 table_id,
@@ -526,6 +818,25 @@ class BaseMetastoreLoader(metaclass=ABCMeta):
         """
         return None
 
+    def get_table_change_signals(
+        self, schema_name: str, table_names: List[str]
+    ) -> Optional[Dict[str, str]]:
+        """Override this to let load() skip the tables that did not change.
+        The change signal of a table is any value that changes whenever the
+        table does, such as its last modified time. It should be much cheaper
+        to get than get_table_and_columns, and get_table_and_columns must set
+        the same value as the change_signal of the DataTable.
+        Returns None by default, in which case every table is loaded.
+
+        Arguments:
+            schema_name {str}
+            table_names {List[str]} -- Tables of the schema to get the signals of
+
+        Returns:
+            Optional[Dict[str, str]] -- {table name: change signal}, tables without a signal are loaded
+        """
+        return None
+
     @abstractmethod
     def get_all_schema_names(self) -> List[str]:
         """Override this to get a list of all schema names
@@ -589,10 +900,19 @@ class BaseMetastoreLoader(metaclass=ABCMeta):
            For example, if you have num_threads at 2 and min_batch_size at 100.
            Then only 1 thread would be used unless you process more than 100 tables.
 
+           If num_processes is greater than 1, the tables are synced by that
+           many processes instead, which helps when parsing the tables and
+           writing them is bound by CPU rather than by the metastore. This is
+           supported by both the prefork and gevent celery worker pools.
+
         Returns:
-            dict: 'num_threads' | 'min_batch_size' -> int
+            dict: 'num_threads' | 'min_batch_size' | 'num_processes' -> int
         """
-        return {"num_threads": 10, "min_batch_size": 50}
+        return {
+            "num_threads": 10,
+            "min_batch_size": 50,
+            "num_processes": QuerybookSettings.METASTORE_LOAD_NUM_PROCESSES,
+        }
 
     @classmethod
     def serialize_loader_class(cls):
@@ -602,34 +922,90 @@ class BaseMetastoreLoader(metaclass=ABCMeta):
         }
 
 
+class LoadProgress(object):
+    """Count the synced tables of a load and report them to the callback"""
+
+    def __init__(self, num_tables: int, callback: Callable[[int, int], None] = None):
+        self.num_tables = num_tables
+        self.num_synced = 0
+        self._callback = callback
+
+    def add(self, num_synced: int):
+        self.num_synced += num_synced
+        if self._callback is not None:
+            try:
+                self._callback(self.num_synced, self.num_tables)
+            except Exception:
+                LOG.error(traceback.format_exc())
+
+
+def _group_schema_tables(schema_tables: List[Tuple[int, str, str]]):
+    """Group the tables by schema in chunks of at most TABLE_SYNC_BATCH_SIZE
+
+    Returns:
+        Iterator[Tuple[int, str, List[str]]] -- schema id, schema name and table names
+    """
+    for (schema_id, schema_name), group in groupby(
+        schema_tables, key=lambda schema_table: schema_table[:2]
+    ):
+        table_names = [table_name for _, _, table_name in group]
+        for i in range(0, len(table_names), TABLE_SYNC_BATCH_SIZE):
+            yield schema_id, schema_name, table_names[i : i + TABLE_SYNC_BATCH_SIZE]
+
+
+# The loader of a worker process of _create_tables_in_processes
+_process_loader: BaseMetastoreLoader = None
+
+
+def _init_loader_process(loader_class, metastore_dict: Dict):
+    global _process_loader
+    _process_loader = loader_class(metastore_dict)
+
+
+def _create_tables_in_loader_process(
+    schema_table_names: Tuple[int, str, List[str]],
+) -> Tuple[int, List[int]]:
+    """Sync a chunk of _group_schema_tables in a worker process
+
+    Returns:
+        Tuple[int, List[int]] -- The number of tables of the chunk and
+                                 the ids of the created or updated tables
+    """
+    schema_id, schema_name, table_names = schema_table_names
+    try:
+        with DBSession() as session:
+            table_ids = _process_loader._create_tables_in_schema(
+                schema_id, schema_name, table_names, session=session
+            )
+    except Exception:
+        LOG.error(traceback.format_exc())
+        table_ids = []
+    return len(table_names), table_ids
+
+
 @with_session
 def delete_schema_not_in_metastore(metastore_id, schema_names, session=None):
+    deleted_table_ids = []
     for data_schema in iterate_data_schema(metastore_id, session=session):
         LOG.info("checking schema %d" % data_schema.id)
         if data_schema.name not in schema_names:
-            # We delete table 1 by 1 since we need to delete it for elasticsearch
-            # Maybe we can optimize it to allow batch deletion
-            for table in data_schema.tables:
-                table_id = table.id
-                delete_table(table_id=table_id, commit=False, session=session)
-                delete_es_table_by_id(table_id)
+            # The tables are deleted along with the schema
+            deleted_table_ids += [table.id for table in data_schema.tables]
             delete_schema(id=data_schema.id, commit=False, session=session)
             LOG.info("deleted schema %d" % data_schema.id)
     session.commit()
+    mark_elasticsearch_items_dirty(ElasticsearchItem.tables.value, deleted_table_ids)
 
 
 @with_session
 def delete_table_not_in_metastore(schema_id, table_names, session=None):
     db_tables = get_table_by_schema_id(schema_id, session=session)
-
-    with session.no_autoflush:
-        for data_table in db_tables:
-            if data_table.name not in table_names:
-                table_id = data_table.id
-                delete_table(table_id=table_id, commit=False, session=session)
-                delete_es_table_by_id(table_id)
-                LOG.info(f"deleted table {table_id}")
-        session.commit()
+    table_ids = [
+        data_table.id for data_table in db_tables if data_table.name not in table_names
+    ]
+    if table_ids:
+        bulk_delete_tables(table_ids, session=session)
+        LOG.info(f"deleted tables {table_ids}")
 
 
 @with_session
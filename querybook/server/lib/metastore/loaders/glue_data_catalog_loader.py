@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 
 from clients.glue_client import GlueDataCatalogClient
 from const.metastore import DataColumn, DataTable
@@ -9,6 +9,9 @@ from lib.metastore.loaders.form_fileds import load_partitions_field
 
 
 class GlueDataCatalogLoader(BaseMetastoreLoader):
+    # boto3 clients are thread safe
+    shareable = True
+
     def __init__(self, metastore_dict: Dict):
         self.catalog_id = metastore_dict.get("metastore_params").get("catalog_id")
         self.region = metastore_dict.get("metastore_params").get("region")
@@ -41,6 +44,20 @@ class GlueDataCatalogLoader(BaseMetastoreLoader):
     def get_all_table_names_in_schema(self, schema_name: str) -> List[str]:
         return self.glue_client.get_all_table_names(schema_name)
 
+    def get_table_change_signals(
+        self, schema_name: str, table_names: List[str]
+    ) -> Optional[Dict[str, str]]:
+        if self.load_partitions:
+            # New partitions do not change the table
+            return None
+
+        return {
+            glue_table.get("Name"): get_glue_table_change_signal(glue_table)
+            for glue_table in self.glue_client.get_all_tables(schema_name).get(
+                "TableList"
+            )
+        }
+
     def get_table_and_columns(
         self, schema_name: str, table_name: str
     ) -> Tuple[DataTable, List[DataColumn]]:
@@ -64,6 +81,7 @@ class GlueDataCatalogLoader(BaseMetastoreLoader):
             location=glue_table.get("StorageDescriptor").get("Location"),
             partitions=partitions,
             raw_description=glue_table.get("Description"),
+            change_signal=get_glue_table_change_signal(glue_table),
         )
 
         columns = [
@@ -90,3 +108,12 @@ class GlueDataCatalogLoader(BaseMetastoreLoader):
     @staticmethod
     def _get_glue_data_catalog_client(catalog_id, region):
         return GlueDataCatalogClient(catalog_id, region)
+
+
+def get_glue_table_change_signal(glue_table: Dict) -> Optional[str]:
+    """Glue bumps the UpdateTime and VersionId of a table on every update"""
+    update_time = glue_table.get("UpdateTime")
+    version_id = glue_table.get("VersionId")
+    if update_time is None and version_id is None:
+        return None
+    return f"{update_time.timestamp() if update_time else None}:{version_id}"
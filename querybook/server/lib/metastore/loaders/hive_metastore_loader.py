@@ -1,4 +1,4 @@
-from typing import Dict, List, Tuple, Union
+from typing import Dict, List, Optional, Tuple, Union
 
 from clients.hms_client import HiveMetastoreClient
 from const.metastore import DataColumn, DataTable
@@ -8,8 +8,14 @@ from lib.metastore.base_metastore_loader import BaseMetastoreLoader
 from lib.metastore.loaders.form_fileds import load_partitions_field
 from lib.utils import json as ujson
 
+# Number of tables fetched by each get_tables call for the change signals
+CHANGE_SIGNAL_BATCH_SIZE = 100
+
 
 class HMSMetastoreLoader(BaseMetastoreLoader):
+    # Each call checks out its own connection from the pool of the client
+    shareable = True
+
     def __init__(self, metastore_dict: Dict):
         self.hmc = self._get_hmc(metastore_dict)
         # load_partitions may not be present in the JSON, if the button wasn't touched during metastore creation
@@ -44,6 +50,23 @@ class HMSMetastoreLoader(BaseMetastoreLoader):
     def get_all_table_names_in_schema(self, schema_name: str) -> List[str]:
         return self.hmc.get_all_tables(schema_name)
 
+    def get_table_change_signals(
+        self, schema_name: str, table_names: List[str]
+    ) -> Optional[Dict[str, str]]:
+        if self.load_partitions:
+            # New partitions do not change the table parameters
+            return None
+
+        change_signals = {}
+        for i in range(0, len(table_names), CHANGE_SIGNAL_BATCH_SIZE):
+            for description in self.hmc.get_tables(
+                schema_name, table_names[i : i + CHANGE_SIGNAL_BATCH_SIZE]
+            ):
+                change_signals[description.tableName] = (
+                    get_hive_metastore_table_change_signal(description)
+                )
+        return change_signals
+
     def get_table_and_columns(
         self, schema_name, table_name
     ) -> Tuple[DataTable, List[DataColumn]]:
@@ -79,6 +102,7 @@ class HMSMetastoreLoader(BaseMetastoreLoader):
             partitions=partitions,
             raw_description=ujson.pdumps(description, default=lambda o: o.__dict__),
             partition_keys=get_partition_keys(description),
+            change_signal=get_hive_metastore_table_change_signal(description),
         )
 
         columns = list(
@@ -121,6 +145,18 @@ def get_hive_metastore_table_description(hmc, db_name, table_name):
         return None
 
 
+def get_hive_metastore_table_change_signal(hive_metastore_description):
+    """Hive updates transient_lastDdlTime on every DDL and last_modified_time
+    on every ALTER TABLE, None if the table has neither of them
+    """
+    parameters = hive_metastore_description.parameters or {}
+    ddl_time = parameters.get("transient_lastDdlTime")
+    last_modified_time = parameters.get("last_modified_time")
+    if ddl_time is None and last_modified_time is None:
+        return None
+    return f"{ddl_time}:{last_modified_time}"
+
+
 def get_partition_keys(hive_metastore_description):
     try:
         if not hive_metastore_description.partitionKeys:
@@ -1,3 +1,4 @@
+import threading
 from typing import Dict, List, Tuple
 
 from clients.hms_client import HiveMetastoreClient
@@ -11,6 +12,8 @@ from lib.query_executor.clients.hive import HiveClient
 class HMSThriftMetastoreLoader(HMSMetastoreLoader):
     def __init__(self, metastore_dict: Dict):
         self._cursor = self._get_hive_cursor(metastore_dict)
+        # The cursor is shared by the callers of this loader
+        self._cursor_lock = threading.Lock()
         super(HMSThriftMetastoreLoader, self).__init__(metastore_dict)
 
     @classmethod
@@ -61,10 +64,11 @@ jdbc:hive2://&lt;host1&gt;:&lt;port1&gt;,&lt;host2&gt;:&lt;port2&gt;/dbName;sess
         )
         if table:
             query = f"desc {schema_name}.{table_name}"
-            self._cursor.run(query, run_async=False)
+            with self._cursor_lock:
+                self._cursor.run(query, run_async=False)
 
-            # First row contains only headers
-            thrift_columns = self._cursor.get()[1:]
+                # First row contains only headers
+                thrift_columns = self._cursor.get()[1:]
             seen = set()
 
             for column in thrift_columns:
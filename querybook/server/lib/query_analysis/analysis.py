@@ -0,0 +1,146 @@
+"""Parsing a query with sqlparse is slow for large queries, so the results
+needed by query execution, lineage, validation and search indexing are
+computed once per query by QueryAnalysis and memoized by get_query_analysis.
+"""
+
+import hashlib
+from itertools import chain
+from typing import Dict, List, Optional, Tuple
+
+from env import QuerybookSettings
+from lib.query_analysis import lineage as lineage_lib
+from lib.query_analysis.statements import (
+    get_sanitized_statement,
+    get_statement_ranges,
+)
+from lib.utils import tiered_cache
+
+QUERY_ANALYSIS_CACHE_KEY = "query_analysis:{}"
+QUERY_ANALYSIS_CACHE_EXPIRATION = 60 * 60
+# Queries can be large, so only a few analyses are kept in each process
+LOCAL_CACHE_MAX_SIZE = 100
+
+_local_cache = tiered_cache.LocalCache(max_size=LOCAL_CACHE_MAX_SIZE)
+
+
+class QueryAnalysisValues(object):
+    """The computed values of a query analysis, shared by
+    the analyses of the same query in this process
+    """
+
+    def __init__(self):
+        self.values = {}
+        # Fields whose values are known to be in redis
+        self.persisted_fields = set()
+
+
+class QueryAnalysis(object):
+    """The statements, tables and lineage of a query.
+    Each of them is computed the first time it is accessed,
+    the returned values are shared and should not be modified.
+    """
+
+    def __init__(
+        self,
+        query: str,
+        language: str = None,
+        persist: bool = False,
+        values: QueryAnalysisValues = None,
+    ):
+        self.query = query
+        self.language = language
+        self._persist = persist
+        self._key = _get_query_analysis_key(query, language)
+        self._values = values or QueryAnalysisValues()
+
+    def _get_value(self, field: str, compute):
+        values = self._values.values
+        if self._persist and field not in self._values.persisted_fields:
+            # Values computed without persist are stored in redis as well
+            values[field] = tiered_cache.get_or_set(
+                QUERY_ANALYSIS_CACHE_KEY.format(f"{self._key}:{field}"),
+                lambda: values[field] if field in values else compute(),
+                expires_after=QUERY_ANALYSIS_CACHE_EXPIRATION,
+            )
+            self._values.persisted_fields.add(field)
+        elif field not in values:
+            values[field] = compute()
+        return values[field]
+
+    @property
+    def statement_ranges(self) -> List[Tuple[int, int]]:
+        return [
+            tuple(statement_range)
+            for statement_range in self._get_value(
+                "statement_ranges", lambda: get_statement_ranges(self.query)
+            )
+        ]
+
+    @property
+    def statements(self) -> List[str]:
+        return [
+            get_sanitized_statement(self.query[start:end])
+            for start, end in self.statement_ranges
+        ]
+
+    @property
+    def statement_types(self) -> List[str]:
+        return self._get_value(
+            "statement_types",
+            lambda: lineage_lib.get_table_statement_type(self.query),
+        )
+
+    def _process_query(self) -> Dict:
+        table_per_statement, lineage_per_statement = lineage_lib.process_query(
+            self.query, self.language
+        )
+        return {
+            "table_per_statement": table_per_statement,
+            "lineage_per_statement": lineage_per_statement,
+        }
+
+    @property
+    def table_per_statement(self) -> List[List[str]]:
+        return self._get_value("lineage", self._process_query)["table_per_statement"]
+
+    @property
+    def lineage_per_statement(self) -> List[List[Dict]]:
+        return self._get_value("lineage", self._process_query)["lineage_per_statement"]
+
+    @property
+    def tables(self) -> List[str]:
+        return list(chain.from_iterable(self.table_per_statement))
+
+
+def _get_query_analysis_key(query: str, language: Optional[str]) -> str:
+    # The tables and lineage depend on the backend that parses the query
+    backend = QuerybookSettings.QUERY_ANALYSIS_BACKEND
+    return hashlib.sha256(f"{backend}:{language}:{query}".encode("utf-8")).hexdigest()
+
+
+def get_query_analysis(
+    query: str, language: str = None, persist: bool = False
+) -> QueryAnalysis:
+    """Get the analysis of the query, its results are shared by the
+       callers of this process that analyze the same query. The results
+       accessed through an analysis returned with persist are also cached
+       in redis, regardless of how the other callers got the analysis.
+
+    Arguments:
+        query {str} -- The SQL query
+        language {str} -- The query language, used to find the default schema
+
+    Keyword Arguments:
+        persist {bool} -- Also cache the results in redis so that they are shared
+                          with other processes, such as the celery tasks that
+                          handle the same query execution (default: {False})
+
+    Returns:
+        QueryAnalysis -- The analysis of the query
+    """
+    key = _get_query_analysis_key(query, language)
+    values = _local_cache.get(key)
+    if values is None:
+        values = QueryAnalysisValues()
+        _local_cache.set(key, values, QUERY_ANALYSIS_CACHE_EXPIRATION)
+    return QueryAnalysis(query, language, persist=persist, values=values)
@@ -1,5 +1,10 @@
-from typing import List
+from typing import List, Tuple
+from const.sqlglot import QUERYBOOK_TO_SQLGLOT_LANGUAGE_MAPPING
+from env import QuerybookSettings
 from lib.logger import get_logger
+import sqlglot
+from sqlglot import exp
+from sqlglot.errors import ParseError, TokenError
 import sqlparse
 
 
@@ -24,6 +29,12 @@ continue_table_search_key_word = set(
 LOG = get_logger(__file__)
 
 
+def get_default_schema(language=None) -> str:
+    if language == "sqlite":
+        return "main"
+    return "default"
+
+
 def process_query(query, language=None):
     """
     This function does all the necessary processing to find the lineage.
@@ -32,10 +43,16 @@ def process_query(query, language=None):
         Lineage: [{table: [lineage]}],
         Statements: [{table: 'statement' }]
     """
-    if language == "sqlite":
-        default_schema = "main"
-    else:
-        default_schema = "default"
+    if QuerybookSettings.QUERY_ANALYSIS_BACKEND == "sqlglot":
+        try:
+            return process_query_with_sqlglot(query, language)
+        except (ParseError, TokenError):
+            LOG.debug("sqlglot failed to parse the query, fallback to sqlparse")
+    return process_query_with_sqlparse(query, language)
+
+
+def process_query_with_sqlparse(query, language=None):
+    default_schema = get_default_schema(language)
 
     lineage_per_statement = []
     table_per_statement = []
@@ -54,6 +71,81 @@ def process_query(query, language=None):
     return table_per_statement, lineage_per_statement
 
 
+def process_query_with_sqlglot(query, language=None):
+    """
+    Same as process_query_with_sqlparse, but parses the query with sqlglot
+    in the dialect of the language, which also finds the tables in subqueries
+    and skips the CTEs of any level.
+    Raises:
+        ParseError/TokenError if sqlglot cannot parse the query
+    """
+    if not query.strip():
+        return [], []
+
+    default_schema = get_default_schema(language)
+    lineage_per_statement = []
+    table_per_statement = []
+
+    expressions = sqlglot.parse(
+        query, read=QUERYBOOK_TO_SQLGLOT_LANGUAGE_MAPPING.get(language)
+    )
+    for expression in expressions:
+        if isinstance(expression, exp.Use):
+            default_schema = get_sqlglot_table_name(expression.this)
+            table_list, from_list = [], []
+        else:
+            table_list, from_list = get_sqlglot_table_list(expression, default_schema)
+        table_per_statement.append(list(set(table_list + from_list)))
+        lineage_per_statement.append(compute_lineage(table_list, from_list))
+    return table_per_statement, lineage_per_statement
+
+
+def get_sqlglot_table_name(table: exp.Expression) -> str:
+    if isinstance(table, exp.Table):
+        return ".".join(part.name for part in table.parts)
+    return table.name
+
+
+def get_sqlglot_table_list(expression, default_schema) -> Tuple[List[str], List[str]]:
+    """
+    Same as get_table_list, for a statement parsed by sqlglot.
+    Returns:
+        (table_list, from_list)
+    """
+    if expression is None:
+        return [], []
+    if isinstance(expression, exp.Command):
+        # Statements that sqlglot does not support, such as SHOW or MSCK
+        statements = tokenize_by_statement(expression.sql())
+        if not statements:
+            return [], []
+        return get_table_list(statements[0], [], default_schema)
+    if isinstance(expression, (exp.Create, exp.Drop)) and (
+        str(expression.args.get("kind")).upper() not in ("TABLE", "VIEW")
+    ):
+        # e.g. CREATE DATABASE, DROP FUNCTION
+        return [], []
+
+    targets = []
+    if isinstance(expression, (exp.Insert, exp.Create, exp.Drop, exp.AlterTable)):
+        target = expression.this
+        targets.append(target.this if isinstance(target, exp.Schema) else target)
+    elif isinstance(expression, exp.TruncateTable):
+        targets.extend(expression.expressions)
+
+    placeholders = set(cte.alias for cte in expression.find_all(exp.CTE))
+    table_list, from_list = [], []
+    for table in expression.find_all(exp.Table):
+        if not table.name or (not table.db and table.name in placeholders):
+            continue
+        table_name = sanitize_table_name(get_sqlglot_table_name(table), default_schema)
+        if any(table is target for target in targets):
+            table_list.append(table_name)
+        else:
+            from_list.append(table_name)
+    return table_list, from_list
+
+
 def get_table_statement_type(query: str) -> List[str]:
     """Get the statement type for each statement in the query
        that are RELEVANT to a TABLE
@@ -1,9 +1,8 @@
 from abc import abstractmethod
-from itertools import chain
 from typing import List, Optional
 
 from lib.elasticsearch import search_table
-from lib.query_analysis.lineage import process_query
+from lib.query_analysis.analysis import get_query_analysis
 from lib.query_analysis.validation.base_query_validator import QueryValidationResult
 from lib.query_analysis.validation.decorators.base_sqlglot_validation_decorator import (
     BaseValidationDecorator,
@@ -22,8 +21,7 @@ class BaseColumnNameSuggester(BaseValidationDecorator):
 
     def _get_tables_in_query(self, query: str, engine_id: int) -> List[str]:
         engine = admin_logic.get_query_engine_by_id(engine_id)
-        tables_per_statement, _ = process_query(query, language=engine.language)
-        return list(chain.from_iterable(tables_per_statement))
+        return get_query_analysis(query, language=engine.language).tables
 
     def _search_columns_for_suggestion(self, columns: List[str], suggestion: str):
         """Return the case-sensitive column name by searching the table's columns for the suggestion text"""
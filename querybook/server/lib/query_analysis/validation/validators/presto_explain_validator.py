@@ -1,13 +1,29 @@
-from typing import List, Tuple
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+from typing import List, Optional, Tuple
 from pyhive.exc import Error as PyHiveError
+from app.db import DBSession
+from lib.query_analysis.analysis import get_query_analysis
 from lib.query_analysis.validation.base_query_validator import (
     BaseQueryValidator,
     QueryValidationResult,
     QueryValidationSeverity,
 )
-from lib.utils.execute_query import ExecuteQuery
+from lib.query_executor.all_executors import get_executor_class
+from lib.query_executor.base_client import ClientBaseClass
+from lib.query_executor.executor_factory import get_client_setting_from_engine
 from lib.query_executor.executors.presto import get_presto_error_dict
 from lib.query_analysis.statements import split_query_to_statements_with_start_location
+from lib.utils import tiered_cache
+from logic.admin import get_query_engine_by_id
+from logic.metastore import get_table_by_name
+
+# Max number of statements explained at the same time for a query
+EXPLAIN_CONCURRENCY = 5
+# The cached results also change with the metadata of the referenced tables,
+# this only covers what the metastore does not track (e.g. permissions)
+EXPLAIN_CACHE_EXPIRATION = 600
+EXPLAIN_CACHE_KEY = "presto_explain:{engine_id}:{uid}:{statement}:{tables}"
 
 
 class PrestoExplainValidator(BaseQueryValidator):
@@ -61,8 +77,69 @@ class PrestoExplainValidator(BaseQueryValidator):
             error_msg,
         )
 
-    def _run_validation_statement(self, statement: str, engine_id: int, uid: int):
-        ExecuteQuery(False, 0.1)(statement, engine_id, uid)
+    def _get_tables_version(self, statement: str, engine, session=None) -> str:
+        """The last time the metadata of the tables referenced by the statement
+        changed, so that the cached results are invalidated when they do"""
+        tables = get_query_analysis(statement, language=engine.language).tables
+        table_versions = []
+        for full_table_name in sorted(set(tables)):
+            if "." not in full_table_name:
+                continue
+            schema_name, table_name = full_table_name.split(".", 1)
+            table = (
+                get_table_by_name(
+                    schema_name, table_name, engine.metastore_id, session=session
+                )
+                if engine.metastore_id
+                else None
+            )
+            table_versions.append(
+                f"{full_table_name}@{table.updated_at.timestamp() if table else None}"
+            )
+        return ",".join(table_versions)
+
+    def _get_cache_key(self, statement: str, engine, uid: int, session=None) -> str:
+        # Results are cached per user since they depend on the user's permissions
+        return EXPLAIN_CACHE_KEY.format(
+            engine_id=engine.id,
+            uid=uid,
+            statement=hashlib.sha256(statement.encode("utf-8")).hexdigest(),
+            tables=hashlib.sha256(
+                self._get_tables_version(statement, engine, session=session).encode(
+                    "utf-8"
+                )
+            ).hexdigest(),
+        )
+
+    def _get_client(self, engine, uid: int, session=None) -> ClientBaseClass:
+        client_settings = get_client_setting_from_engine(engine, uid, session=session)
+        executor = get_executor_class(engine.language, engine.executor)
+        return executor._get_client(client_settings)
+
+    def _run_validation_statement(self, statement: str, client: ClientBaseClass):
+        cursor = client.cursor()
+        cursor.run(statement)
+        cursor.poll_until_finish(0.1)
+
+    def _get_statement_error(
+        self, statement: str, client: ClientBaseClass
+    ) -> Optional[Tuple[int, int, str]]:
+        try:
+            self._run_validation_statement(statement, client)
+        except PyHiveError as exc:
+            return self._get_semantic_error_from_exc(exc)
+        return None
+
+    def _get_cached_statement_error(
+        self, statement: str, cache_key: str, client: ClientBaseClass
+    ) -> Optional[Tuple[int, int, str]]:
+        statement_error = tiered_cache.get_or_set(
+            cache_key,
+            self._get_statement_error,
+            expires_after=EXPLAIN_CACHE_EXPIRATION,
+            args=[statement, client],
+        )
+        return tuple(statement_error) if statement_error else None
 
     def languages(self):
         return ["presto", "trino"]
@@ -74,31 +151,45 @@ class PrestoExplainValidator(BaseQueryValidator):
         engine_id: int,  # which engine they are checking against
         **kwargs,
     ) -> List[QueryValidationResult]:
-        validation_errors = []
         (
             validation_statements,
             statement_start_locations,
         ) = self._convert_query_to_explains(query)
+        if not validation_statements:
+            return []
+
+        with DBSession() as session:
+            engine = get_query_engine_by_id(engine_id, session=session)
+            cache_keys = [
+                self._get_cache_key(statement, engine, uid, session=session)
+                for statement in validation_statements
+            ]
+            # The statements are explained concurrently with the same client
+            client = self._get_client(engine, uid, session=session)
 
-        statement_idx = 0
-        while statement_idx < len(validation_statements):
-            try:
-                self._run_validation_statement(
-                    validation_statements[statement_idx], engine_id, uid
+        with ThreadPoolExecutor(
+            max_workers=min(EXPLAIN_CONCURRENCY, len(validation_statements))
+        ) as executor:
+            statement_errors = list(
+                executor.map(
+                    self._get_cached_statement_error,
+                    validation_statements,
+                    cache_keys,
+                    [client] * len(validation_statements),
                 )
-            except PyHiveError as exc:
-                presto_syntax_error = self._get_semantic_error_from_exc(exc)
-                if presto_syntax_error:
-                    error_line, error_ch, error_msg = presto_syntax_error
-                    validation_errors.append(
-                        self._map_statement_error_to_query(
-                            statement_idx,
-                            statement_start_locations,
-                            error_line,
-                            error_ch,
-                            error_msg,
-                        )
-                    )
+            )
 
-            statement_idx += 1
+        validation_errors = []
+        for statement_idx, statement_error in enumerate(statement_errors):
+            if statement_error:
+                error_line, error_ch, error_msg = statement_error
+                validation_errors.append(
+                    self._map_statement_error_to_query(
+                        statement_idx,
+                        statement_start_locations,
+                        error_line,
+                        error_ch,
+                        error_msg,
+                    )
+                )
         return validation_errors
@@ -1,10 +1,12 @@
 from abc import ABCMeta, abstractclassmethod
 import datetime
+from itertools import chain, islice
 import time
 from typing import Union, List
 
 from app.db import DBSession
 from app.flask_app import socketio
+from env import QuerybookSettings
 
 
 from const.db import description_length
@@ -17,18 +19,40 @@ from const.query_execution import (
 from lib.form import AllFormField
 from lib.logger import get_logger
 from lib.query_executor.base_client import ClientBaseClass
+from lib.query_executor.poll_policy import (
+    DEFAULT_MAX_POLL_INTERVAL,
+    DEFAULT_MIN_POLL_INTERVAL,
+    PollPolicy,
+)
+from lib.query_executor.row_prefetcher import RowPrefetcher
 from lib.query_executor.utils import (
     merge_str,
     parse_exception,
     format_if_internal_error_with_stack_trace,
 )
-from lib.result_store import GenericUploader
-from lib.utils.csv import row_to_csv
+from lib.result_store import GenericUploader, get_upload_result_format
+from lib.result_store.all_result_serializers import ALL_RESULT_SERIALIZERS
+from lib.result_store.row_index import ResultRowIndex, get_row_index_uri
+from lib.stats_logger import (
+    QUERY_EXECUTION_POLL_LATENCY,
+    QUERY_EXECUTION_POLLS,
+    RESULT_UPLOAD_FETCH_TIME,
+    RESULT_UPLOAD_WAIT_TIME,
+    RESULT_UPLOAD_WRITE_TIME,
+    stats_logger,
+)
 from logic import query_execution as qe_logic
 
 
 LOG = get_logger(__file__)
 
+# Statement updates (logs, meta info and progress) are buffered while
+# polling and written at most once per STATEMENT_UPDATE_FLUSH_INTERVAL
+# seconds, or once STATEMENT_UPDATE_FLUSH_LOG_SIZE characters of log
+# are waiting. They are always written when the statement ends.
+STATEMENT_UPDATE_FLUSH_INTERVAL = 2
+STATEMENT_UPDATE_FLUSH_LOG_SIZE = description_length
+
 
 class QueryExecutorLogger(object):
     """This class is used to export data from query executor to redis/mysql/socketio
@@ -57,6 +81,7 @@ class QueryExecutorLogger(object):
         self._meta_info = None  # statement_urls
         self._percent_complete = 0  # percent_complete
         self._statement_progress = {}
+        self._reset_pending_update()
 
         # Connect to mysql db
         with DBSession() as session:
@@ -113,6 +138,14 @@ class QueryExecutorLogger(object):
         self._log_cache = ""  # [statement_logs]
         self._meta_info = ""  # statement_urls
         self._percent_complete = None  # percent_complete
+        self._reset_pending_update()
+
+    def _reset_pending_update(self):
+        self._pending_log = ""
+        self._pending_meta_info = None
+        self._pending_percent_complete = None
+        # The first update of a statement is written right away
+        self._last_flush_time = 0
 
     def on_statement_start(self, statement_index):
         self.reset_logging_variables()
@@ -142,23 +175,53 @@ class QueryExecutorLogger(object):
         meta_info: str = None,
         percent_complete=None,
     ):
-        statement_execution_id = self.statement_execution_ids[-1]
+        if len(log):
+            self._pending_log = merge_str(self._pending_log, log)
+        if meta_info is not None:
+            self._pending_meta_info = meta_info
+        if percent_complete is not None:
+            self._pending_percent_complete = percent_complete
 
-        updated_meta_info = False
-        if meta_info is not None and self._meta_info != meta_info:
-            self._meta_info = meta_info
-            qe_logic.update_statement_execution(
-                statement_execution_id, meta_info=meta_info
-            )
-            updated_meta_info = True
+        if (
+            time.time() - self._last_flush_time >= STATEMENT_UPDATE_FLUSH_INTERVAL
+            or len(self._pending_log) >= STATEMENT_UPDATE_FLUSH_LOG_SIZE
+        ):
+            self.flush_statement_update()
+
+    def flush_statement_update(self):
+        """Write the buffered statement updates in one transaction,
+        then send them to the frontend and the celery task progress
+        """
+        log = self._pending_log
+        meta_info = self._pending_meta_info
+        percent_complete = self._pending_percent_complete
+        self._reset_pending_update()
+        self._last_flush_time = time.time()
+
+        if len(self.statement_execution_ids) == 0:
+            return
+        statement_execution_id = self.statement_execution_ids[-1]
 
+        updated_meta_info = meta_info is not None and self._meta_info != meta_info
         has_log = len(log)
-        if has_log:
-            self._stream_log(statement_execution_id, log)
-
         percent_complete_change = (
             percent_complete is not None and self._percent_complete != percent_complete
         )
+
+        if updated_meta_info or has_log:
+            with DBSession() as session:
+                if updated_meta_info:
+                    self._meta_info = meta_info
+                    qe_logic.update_statement_execution(
+                        statement_execution_id,
+                        meta_info=meta_info,
+                        commit=False,
+                        session=session,
+                    )
+                if has_log:
+                    self._stream_log(statement_execution_id, log, session=session)
+                session.commit()
+
         if percent_complete_change:
             self._percent_complete = percent_complete
 
@@ -192,6 +255,8 @@ class QueryExecutorLogger(object):
             )
 
     def on_statement_end(self, cursor):
+        self.flush_statement_update()
+
         statement_execution_id = self.statement_execution_ids[-1]
         qe_logic.update_statement_execution(
             statement_execution_id,
@@ -234,6 +299,8 @@ class QueryExecutorLogger(object):
         )
 
     def on_cancel(self):
+        self._flush_statement_update_before_end()
+
         utcnow = datetime.datetime.utcnow()
         if len(self.statement_execution_ids) > 0:
             statement_execution_id = self.statement_execution_ids[-1]
@@ -262,6 +329,8 @@ class QueryExecutorLogger(object):
         )
 
     def on_exception(self, error_type: int, error_str: str, error_extracted: str):
+        self._flush_statement_update_before_end()
+
         utcnow = datetime.datetime.utcnow()
         error_extracted = (
             error_extracted[:5000]
@@ -305,6 +374,14 @@ class QueryExecutorLogger(object):
                 room=self._query_execution_id,
             )
 
+    def _flush_statement_update_before_end(self):
+        # Failing to write the last updates should not stop
+        # the statement from being marked as cancelled or failed
+        try:
+            self.flush_statement_update()
+        except Exception as e:
+            LOG.error(f"Failed to flush statement update: {e}")
+
     def update_progress(self):
         progress = self._statement_progress | {
             "total": len(self._statement_ranges),
@@ -322,20 +399,72 @@ class QueryExecutorLogger(object):
         ):  # No need to go through queries because no information
             return None, rows_uploaded
 
-        key = "querybook_temp/%s/result.csv" % str(statement_execution_id)
+        result_format = get_upload_result_format()
+        serializer = ALL_RESULT_SERIALIZERS[result_format]()
+
+        key = "querybook_temp/%s/result.%s" % (
+            str(statement_execution_id),
+            result_format,
+        )
         uploader = GenericUploader(key)
         uploader.start()
+        try:
+            row_index = ResultRowIndex()
+
+            columns_data = serializer.serialize_columns(columns)
+            uploader.write(columns_data)
+            row_index.add_data(columns_data)
+            rows_uploaded += 1  # 1 row for the column
+
+            write_time = 0
+            with RowPrefetcher(
+                cursor, QuerybookSettings.RESULT_PREFETCH_QUEUE_SIZE
+            ) as prefetcher:
+                rows_iter = chain.from_iterable(prefetcher.get_batches_iter())
+                while True:
+                    rows = list(islice(rows_iter, serializer.batch_size))
+                    if len(rows) == 0:
+                        break
 
-        uploader.write(row_to_csv(columns))
-        rows_uploaded += 1  # 1 row for the column
+                    start = time.time()
+                    rows_data = serializer.serialize_rows(rows)
+                    did_upload = uploader.write(rows_data)
+                    if not did_upload and len(rows) > 1 and not serializer.is_binary:
+                        # The store is full, keep the rows of the batch that fit
+                        for row in rows:
+                            row_data = serializer.serialize_rows([row])
+                            if not uploader.write(row_data):
+                                break
+                            row_index.add_data(row_data, 1)
+                            rows_uploaded += 1
+                    write_time += time.time() - start
+                    if not did_upload:
+                        break
+                    row_index.add_data(rows_data, len(rows))
+                    rows_uploaded += len(rows)
+            uploader.write(serializer.end())
 
-        for row in cursor.get_rows_iter():
-            did_upload = uploader.write(row_to_csv(row))
-            if not did_upload:
-                break
-            rows_uploaded += 1
+            stats_tags = {"result_format": result_format}
+            stats_logger.timing(
+                RESULT_UPLOAD_FETCH_TIME, prefetcher.fetch_time * 1000, tags=stats_tags
+            )
+            stats_logger.timing(
+                RESULT_UPLOAD_WAIT_TIME, prefetcher.wait_time * 1000, tags=stats_tags
+            )
+            stats_logger.timing(
+                RESULT_UPLOAD_WRITE_TIME, write_time * 1000, tags=stats_tags
+            )
+        except Exception:
+            # Do not keep a partial result, such as the parts of a S3 upload
+            uploader.abort()
+            raise
         uploader.end()
 
+        row_index.header = serializer.header
+        if row_index.is_useful:
+            with GenericUploader(get_row_index_uri(key)) as index_uploader:
+                index_uploader.write(row_index.to_json())
+
         return uploader.upload_url, rows_uploaded
 
     def _upload_log(self, statement_execution_id: int):
@@ -387,7 +516,11 @@ class QueryExecutorLogger(object):
             )
 
     def _stream_log(
-        self, statement_execution_id: int, log: str, clear_cache: bool = False
+        self,
+        statement_execution_id: int,
+        log: str,
+        clear_cache: bool = False,
+        session=None,
     ):
         """
         Persists the log in DB that's over description_length
@@ -399,33 +532,43 @@ class QueryExecutorLogger(object):
 
         Keyword Arguments:
             clear_cache {bool} -- [If true, will push all _log_cache into mysql DB] (default: {False})
+            session -- [If given, the logs are added to it without committing] (default: {None})
         """
+        if session is None:
+            with DBSession() as session:
+                self._stream_log(
+                    statement_execution_id,
+                    log,
+                    clear_cache=clear_cache,
+                    session=session,
+                )
+                session.commit()
+            return
+
         merged_log = merge_str(self._log_cache, log)
         created_log = False
         chunk_size = description_length
         cache_length = 0 if clear_cache else chunk_size
 
-        with DBSession() as session:
-            while len(merged_log) > cache_length:
-                size_of_chunk = min(len(merged_log), chunk_size)
+        while len(merged_log) > cache_length:
+            size_of_chunk = min(len(merged_log), chunk_size)
 
-                log_chunk = merged_log[:size_of_chunk]
-                qe_logic.create_statement_execution_stream_log(
-                    statement_execution_id, log_chunk, commit=False, session=session
-                )
-                created_log = True
-                merged_log = merged_log[size_of_chunk:]
-
-            if not self._has_log and created_log:
-                qe_logic.update_statement_execution(
-                    statement_execution_id,
-                    has_log=True,
-                    log_path="stream://",
-                    session=session,
-                )
-                self._has_log = True
+            log_chunk = merged_log[:size_of_chunk]
+            qe_logic.create_statement_execution_stream_log(
+                statement_execution_id, log_chunk, commit=False, session=session
+            )
+            created_log = True
+            merged_log = merged_log[size_of_chunk:]
 
-            session.commit()
+        if not self._has_log and created_log:
+            qe_logic.update_statement_execution(
+                statement_execution_id,
+                has_log=True,
+                log_path="stream://",
+                commit=False,
+                session=session,
+            )
+            self._has_log = True
 
         self._log_cache = merged_log
 
@@ -528,6 +671,9 @@ class QueryExecutorBaseClass(metaclass=ABCMeta):
         self._client = None
         self._cursor = None
 
+        self._poll_policy = self._get_poll_policy()
+        self._percent_complete = None
+
         query_execution_metadata = (
             qe_logic.get_query_execution_metadata_by_execution_id(
                 self._query_execution_id
@@ -559,6 +705,7 @@ class QueryExecutorBaseClass(metaclass=ABCMeta):
         self._run_next_statement()
 
     def poll(self):
+        start_time = time.time()
         try:
             if self.status == QueryExecutionStatus.DELIVERED:
                 self.start()
@@ -579,13 +726,29 @@ class QueryExecutorBaseClass(metaclass=ABCMeta):
             error_message = f"{e}\n{stack_trace}"
             LOG.error(error_message)
             self._handle_exception(e, stack_trace)
+        finally:
+            tags = {"executor": self.EXECUTOR_NAME()}
+            stats_logger.incr(QUERY_EXECUTION_POLLS, tags=tags)
+            stats_logger.timing(
+                QUERY_EXECUTION_POLL_LATENCY,
+                (time.time() - start_time) * 1000,
+                tags=tags,
+            )
 
     def sleep(self):
-        # For the first 15 mins, we check every second
-        # Afterwards, check every 10 seconds
-        time_passed = time.time() - self._start_time  # unit in seconds
-        sleep_time = 1 if time_passed < 900 else 10
-        time.sleep(sleep_time)
+        time.sleep(self._poll_policy.next_interval())
+
+    def _get_poll_policy(self) -> PollPolicy:
+        """Override to change how often the cursor is polled,
+        by default it can be configured with the executor params"""
+        return PollPolicy(
+            min_interval=abs(
+                self._client_setting.get("min_poll_interval", DEFAULT_MIN_POLL_INTERVAL)
+            ),
+            max_interval=abs(
+                self._client_setting.get("max_poll_interval", DEFAULT_MAX_POLL_INTERVAL)
+            ),
+        )
 
     @property
     def meta_info(self):
@@ -602,6 +765,7 @@ class QueryExecutorBaseClass(metaclass=ABCMeta):
             self._cursor.cancel()
 
     def _run_next_statement(self):
+        self._poll_policy.reset()
         if self._current_query_index < len(self._statement_ranges):
             self._logger.on_statement_start(self._current_query_index)
 
@@ -654,12 +818,19 @@ class QueryExecutorBaseClass(metaclass=ABCMeta):
     def _is_statement_completed(self):
         completed = self._cursor.poll()
 
+        log = self._get_logs()
+        percent_complete = self._cursor.percent_complete
         self._logger.on_statement_update(
-            log=self._get_logs(),
-            percent_complete=self._cursor.percent_complete,
+            log=log,
+            percent_complete=percent_complete,
             meta_info=self.meta_info,
         )
 
+        # Poll more often again while the query makes progress
+        if log or percent_complete != self._percent_complete:
+            self._percent_complete = percent_complete
+            self._poll_policy.reset()
+
         return completed
 
     def _get_cursor(self):
@@ -3,8 +3,7 @@ from typing import Dict
 from app.db import with_session
 from const.query_execution import QueryExecutionStatus
 from lib.logger import get_logger
-from lib.query_analysis.statements import get_statement_ranges
-from lib.query_analysis.lineage import process_query
+from lib.query_analysis.analysis import get_query_analysis
 from logic import (
     admin as admin_logic,
     query_execution as qe_logic,
@@ -99,7 +98,7 @@ def _get_query_execution_info(query_execution_id, session=None):
         )
 
     query = query_execution.query
-    statement_ranges = get_statement_ranges(query)
+    statement_ranges = get_query_analysis(query).statement_ranges
     uid = query_execution.uid
     engine_id = query_execution.engine_id
 
@@ -112,8 +111,7 @@ def _assert_safe_query(query, engine_id, session=None):
     try:
         from lib.metastore.utils import MetastoreTableACLChecker
 
-        table_per_statement, _ = process_query(query)
-        all_tables = [table for tables in table_per_statement for table in tables]
+        all_tables = get_query_analysis(query).tables
 
         query_engine = admin_logic.get_query_engine_by_id(engine_id, session=session)
         if query_engine.metastore_id is None:
@@ -1,5 +1,23 @@
 from lib.form import FormField, StructFormField, FormFieldType, ExpandableFormField
 
+# Read by QueryExecutorBaseClass._get_poll_policy
+poll_interval_fields = (
+    (
+        "min_poll_interval",
+        FormField(
+            field_type=FormFieldType.Number,
+            helper="Sleep interval in seconds between query execution polls while the query makes progress (default: 0.5)",
+        ),
+    ),
+    (
+        "max_poll_interval",
+        FormField(
+            field_type=FormFieldType.Number,
+            helper="Max sleep interval in seconds between query execution polls, the interval backs off to it while the query makes no progress (default: 10)",
+        ),
+    ),
+)
+
 hive_executor_template = StructFormField(
     (
         "hive_resource_manager",
@@ -24,6 +42,7 @@ jdbc:hive2://&lt;host1&gt;:&lt;port1&gt;,&lt;host2&gt;:&lt;port2&gt;/dbName;sess
     ("username", FormField(regex="\\w+")),
     ("password", FormField(hidden=True)),
     ("impersonate", FormField(field_type=FormFieldType.Boolean)),
+    *poll_interval_fields,
 )
 
 presto_executor_template = StructFormField(
@@ -62,14 +81,14 @@ presto_executor_template = StructFormField(
         "initial_sleep_interval",
         FormField(
             field_type=FormFieldType.Number,
-            helper="Initial sleep interval in seconds between query execution polls (default: 1)",
+            helper="Sleep interval in seconds between query execution polls while the query makes progress (default: 0.5)",
         ),
     ),
     (
         "extended_sleep_interval",
         FormField(
             field_type=FormFieldType.Number,
-            helper="Extended sleep interval in seconds between query execution polls (default: 10)",
+            helper="Max sleep interval in seconds between query execution polls, the interval backs off to it while the query makes no progress (default: 10)",
         ),
     ),
 )
@@ -98,6 +117,7 @@ trino_executor_template = StructFormField(
 <p>See [here](https://trino.io/docs/current/installation/jdbc.html) for more details.</p>""",
         ),
     ),
+    *poll_interval_fields,
 )
 
 sqlalchemy_template = StructFormField(
@@ -1,8 +1,12 @@
-import time
 from pyhive.exc import Error
 
 from const.query_execution import QueryExecutionErrorType
 from lib.query_executor.base_executor import QueryExecutorBaseClass
+from lib.query_executor.poll_policy import (
+    DEFAULT_MAX_POLL_INTERVAL,
+    DEFAULT_MIN_POLL_INTERVAL,
+    PollPolicy,
+)
 from lib.query_executor.utils import get_parsed_syntax_error
 from lib.query_executor.clients.presto import PrestoClient
 from lib.query_executor.executor_template.templates import presto_executor_template
@@ -33,19 +37,21 @@ class PrestoQueryExecutor(QueryExecutorBaseClass):
     def EXECUTOR_TEMPLATE(cls):
         return presto_executor_template
 
-    def sleep(self):
-        """Override sleep method to use configurable interval for Presto engine"""
-        initial_sleep_interval = abs(
-            self._client_setting.get("initial_sleep_interval", 1)
+    def _get_poll_policy(self):
+        """Presto engines configure the poll interval with
+        initial_sleep_interval and extended_sleep_interval"""
+        return PollPolicy(
+            min_interval=abs(
+                self._client_setting.get(
+                    "initial_sleep_interval", DEFAULT_MIN_POLL_INTERVAL
+                )
+            ),
+            max_interval=abs(
+                self._client_setting.get(
+                    "extended_sleep_interval", DEFAULT_MAX_POLL_INTERVAL
+                )
+            ),
         )
-        extended_sleep_interval = abs(
-            self._client_setting.get("extended_sleep_interval", 10)
-        )
-        time_passed = time.time() - self._start_time  # unit in seconds
-        sleep_time = (
-            initial_sleep_interval if time_passed < 900 else extended_sleep_interval
-        )
-        time.sleep(sleep_time)
 
     def _parse_exception(self, e):
         error_type = QueryExecutionErrorType.INTERNAL.value
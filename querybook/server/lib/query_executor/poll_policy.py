@@ -0,0 +1,44 @@
+import random
+
+# Defaults in seconds, can be changed per engine with the
+# min_poll_interval and max_poll_interval executor params
+DEFAULT_MIN_POLL_INTERVAL = 0.5
+DEFAULT_MAX_POLL_INTERVAL = 10
+
+
+class PollPolicy(object):
+    """Decides how long an executor waits between polls of its cursor.
+
+    The wait starts at min_interval and grows by multiplier after every
+    poll without progress, up to max_interval. Any progress of the query
+    (new logs, percent complete or statement) resets it to min_interval,
+    so short queries finish quickly while long idle ones are polled rarely.
+    Waits are randomized by +/- jitter to spread out polls of queries that
+    started together.
+    """
+
+    def __init__(
+        self,
+        min_interval: float = DEFAULT_MIN_POLL_INTERVAL,
+        max_interval: float = DEFAULT_MAX_POLL_INTERVAL,
+        multiplier: float = 1.5,
+        jitter: float = 0.1,
+    ):
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        self.multiplier = multiplier
+        self.jitter = jitter
+        self.reset()
+
+    def reset(self):
+        self._interval = self.min_interval
+
+    def next_interval(self) -> float:
+        """Get the time to wait before the next poll and back off
+
+        Returns:
+            float -- Seconds to wait
+        """
+        interval = self._interval
+        self._interval = min(self._interval * self.multiplier, self.max_interval)
+        return interval * random.uniform(1 - self.jitter, 1 + self.jitter)
@@ -0,0 +1,102 @@
+from queue import Empty, Full, Queue
+import threading
+import time
+from typing import Any, Iterator, List
+
+from lib.logger import get_logger
+from lib.query_executor.base_client import CursorBaseClass
+
+LOG = get_logger(__file__)
+
+# How often a blocked fetch checks if the upload has stopped
+PUT_TIMEOUT_SEC = 1
+
+
+class RowPrefetcher(object):
+    """Fetches batches of rows from the cursor on a background thread
+    while the previous batches are serialized and uploaded. At most
+    queue_size fetched batches wait to be uploaded.
+
+    If queue_size is 0, rows are fetched when they are needed instead.
+    """
+
+    def __init__(
+        self, cursor: CursorBaseClass, queue_size: int, fetch_size: int = 10000
+    ):
+        self._cursor = cursor
+        self._queue_size = queue_size
+        self._fetch_size = fetch_size
+
+        self._queue = Queue(maxsize=max(queue_size, 1))
+        self._stop_event = threading.Event()
+        self._thread = None
+
+        # Stats in seconds, fetch_time is spent in the cursor and
+        # wait_time is spent by the uploader waiting for rows
+        self.fetch_time = 0
+        self.wait_time = 0
+
+    def __enter__(self):
+        if self._queue_size > 0:
+            self._thread = threading.Thread(target=self._fetch_batches, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def stop(self):
+        """Stop fetching, the cursor can be used again once this returns"""
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        # Unblock the fetch thread if it is waiting on a full queue
+        while self._thread.is_alive():
+            try:
+                self._queue.get(timeout=PUT_TIMEOUT_SEC)
+            except Empty:
+                pass
+        self._thread = None
+
+    def get_batches_iter(self) -> Iterator[List[List[Any]]]:
+        """Iterate through the fetched batches, raises
+        the error of the cursor if fetching failed
+        """
+        while True:
+            if self._thread is None:
+                rows = self._fetch_batch()
+            else:
+                start = time.time()
+                rows = self._queue.get()
+                self.wait_time += time.time() - start
+                if isinstance(rows, Exception):
+                    raise rows
+
+            if len(rows) == 0:
+                return
+            yield rows
+
+    def _fetch_batch(self) -> List[List[Any]]:
+        start = time.time()
+        rows = self._cursor.get_n_rows(self._fetch_size)
+        rows = list(rows) if rows is not None else []
+        self.fetch_time += time.time() - start
+        return rows
+
+    def _fetch_batches(self):
+        while not self._stop_event.is_set():
+            try:
+                rows = self._fetch_batch()
+            except Exception as e:
+                LOG.error(e, exc_info=True)
+                rows = e
+
+            while not self._stop_event.is_set():
+                try:
+                    self._queue.put(rows, timeout=PUT_TIMEOUT_SEC)
+                    break
+                except Full:
+                    pass
+
+            if not isinstance(rows, list) or len(rows) == 0:
+                return
@@ -1,8 +1,106 @@
-from typing import Generator, List, Optional
+from collections import defaultdict
+from io import BytesIO
+from itertools import chain, islice
+from typing import Generator, Iterable, List, Optional, Union
 
+from .all_result_serializers import ALL_RESULT_SERIALIZERS
 from .all_result_stores import ALL_RESULT_STORES
+from .row_index import ResultRowIndex, get_row_index_uri
 from .stores.base_store import BaseReader, BaseUploader
+from clients.common import FileDoesNotExist
 from env import QuerybookSettings
+from lib.logger import get_logger
+from lib.utils.csv import row_to_csv, rows_to_csv
+
+LOG = get_logger(__file__)
+
+DEFAULT_RESULT_FORMAT = "csv"
+
+
+def get_upload_result_format() -> str:
+    """Get the format new query results are stored in. Falls back to csv
+       if RESULT_STORE_FORMAT is unavailable or the result store
+       cannot store it
+
+    Returns:
+        str -- name of the serializer in ALL_RESULT_SERIALIZERS
+    """
+    result_format = QuerybookSettings.RESULT_STORE_FORMAT
+    if result_format == DEFAULT_RESULT_FORMAT:
+        return result_format
+
+    if result_format not in ALL_RESULT_SERIALIZERS:
+        LOG.warning(f"Unavailable result format {result_format}, using csv instead")
+        return DEFAULT_RESULT_FORMAT
+
+    uploader_class = ALL_RESULT_STORES[QuerybookSettings.RESULT_STORE_TYPE].uploader
+    if (
+        ALL_RESULT_SERIALIZERS[result_format]().is_binary
+        and not uploader_class.supports_binary()
+    ):
+        LOG.warning(
+            f"Result store {QuerybookSettings.RESULT_STORE_TYPE} cannot store "
+            + f"{result_format} results, using csv instead"
+        )
+        return DEFAULT_RESULT_FORMAT
+    return result_format
+
+
+def get_result_format_by_uri(uri: str) -> str:
+    """The file extension of a result is the format it is stored in,
+    results without a known extension (such as logs) are treated as csv
+    """
+    file_name = uri.split("/")[-1]
+    if "." in file_name:
+        extension = file_name.split(".")[-1]
+        if extension in ALL_RESULT_SERIALIZERS:
+            return extension
+    return DEFAULT_RESULT_FORMAT
+
+
+def delete_results(uris: Iterable[str]) -> int:
+    """Delete the results and logs stored at the uris, along with
+       the row indices of the results. Uris that are not in a result
+       store, or in a store that cannot delete, are skipped
+
+    Arguments:
+        uris {Iterable[str]} -- Uris such as result_path, in the form of {store_type}://{uri}
+
+    Returns:
+        int -- The number of deleted files
+    """
+    # Dict to keep the order, row indices could be given as uris as well
+    uris_by_store_type = defaultdict(dict)
+    for uri in uris:
+        if "://" not in uri:
+            continue
+        store_type, uri_suffix = uri.split("://", 1)
+        uris_by_store_type[store_type][uri_suffix] = None
+        if uri_suffix.split(".")[-1] in ALL_RESULT_SERIALIZERS:
+            uris_by_store_type[store_type][get_row_index_uri(uri_suffix)] = None
+
+    deleted_count = 0
+    for store_type, store_uris in uris_by_store_type.items():
+        store = ALL_RESULT_STORES.get(store_type)
+        if store is None or not store.uploader.supports_delete():
+            continue
+        deleted_count += store.uploader.delete(list(store_uris))
+    return deleted_count
+
+
+def list_results(prefix: str) -> Generator[str, None, None]:
+    """List the files of the result store, including the logs and
+       the row indices of the results
+
+    Arguments:
+        prefix {str} -- Only list the files whose uri starts with it
+
+    Returns:
+        Generator[str, None, None] -- Uris in the form of {store_type}://{uri}
+    """
+    store_type = QuerybookSettings.RESULT_STORE_TYPE
+    for uri in ALL_RESULT_STORES[store_type].uploader.list_uris(prefix):
+        yield f"{store_type}://{uri}"
 
 
 class GenericUploader(BaseUploader):
@@ -18,13 +116,17 @@ class GenericUploader(BaseUploader):
     def start(self) -> None:
         self._uploader.start()
 
-    def write(self, data: str) -> bool:
+    def write(self, data: Union[str, bytes]) -> bool:
         return self._uploader.write(data)
 
     def end(self):
         self._uploader.end()
         self._uploader = None
 
+    def abort(self):
+        self._uploader.abort()
+        self._uploader = None
+
     @property
     def is_uploading(self):
         return self._uploader.is_uploading
@@ -34,10 +136,19 @@ class GenericUploader(BaseUploader):
         return self._uri_with_store_type
 
 
+def _close_when_done(stream, rows: Iterable[List[str]]):
+    try:
+        yield from rows
+    finally:
+        stream.close()
+
+
 class GenericReader(BaseReader):
     def __init__(self, uri: str, **kwargs):
         store_type, uri_suffix = uri.split("://")
         self.store_type = store_type
+        self._uri_suffix = uri_suffix
+        self.result_format = get_result_format_by_uri(uri_suffix)
         self._reader: BaseReader = ALL_RESULT_STORES[store_type].reader(
             uri_suffix, **kwargs
         )
@@ -48,17 +159,146 @@ class GenericReader(BaseReader):
     def get_csv_iter(
         self, number_of_lines: Optional[int]
     ) -> Generator[List[List[str]], None, None]:
-        return self._reader.get_csv_iter(number_of_lines)
+        if self.result_format == DEFAULT_RESULT_FORMAT:
+            return self._reader.get_csv_iter(number_of_lines)
+
+        serializer_class = ALL_RESULT_SERIALIZERS[self.result_format]
+        stream = self._reader.open_binary_stream()
+        return islice(
+            _close_when_done(stream, serializer_class.deserialize(stream)),
+            number_of_lines,
+        )
+
+    def get_csv_iter_from_row(
+        self, row_offset: int, number_of_lines: Optional[int]
+    ) -> Generator[List[List[str]], None, None]:
+        """Same as get_csv_iter, except that the rows following the
+           columns start at row_offset. Uses the row index uploaded
+           with the result to skip reading the rows before row_offset
+
+        Arguments:
+            row_offset {int} -- The number of rows to skip, not counting the columns
+            number_of_lines {Optional[int]} -- The number of lines to return, including the columns
+
+        Returns:
+            Generator[List[List[str]], None, None] -- generator for parsed csv
+        """
+        if row_offset == 0:
+            return self.get_csv_iter(number_of_lines)
+
+        row_index = self._read_row_index()
+        if row_index is None:
+            csv_iter = iter(self.get_csv_iter(None))
+            columns = next(csv_iter, None)
+            if columns is None:
+                return iter(())
+            rows = islice(csv_iter, row_offset, None)
+        else:
+            serializer_class = ALL_RESULT_SERIALIZERS[self.result_format]
+            columns = next(serializer_class.deserialize(BytesIO(row_index.header)))
+            indexed_row, byte_offset = row_index.find(row_offset)
+            stream = self._reader.open_binary_stream(byte_offset)
+            rows = islice(
+                _close_when_done(
+                    stream,
+                    serializer_class.deserialize_rows(row_index.header, stream),
+                ),
+                row_offset - indexed_row,
+                None,
+            )
+        return islice(chain([columns], rows), number_of_lines)
+
+    def _read_row_index(self) -> Optional[ResultRowIndex]:
+        index_reader = ALL_RESULT_STORES[self.store_type].reader(
+            get_row_index_uri(self._uri_suffix)
+        )
+        try:
+            with index_reader:
+                raw = index_reader.open_binary_stream().read()
+        except (FileDoesNotExist, FileNotFoundError):
+            return None
+
+        # Results uploaded without a row index, such as small ones
+        if len(raw) == 0:
+            return None
+        return ResultRowIndex.from_json(raw)
 
     def read_lines(self, number_of_lines: int) -> List[str]:
-        return self._reader.read_lines(number_of_lines)
+        if self.result_format == DEFAULT_RESULT_FORMAT:
+            return self._reader.read_lines(number_of_lines)
+        # Results in other formats are converted to csv lines, without the
+        # line terminator like the lines read from the stores
+        return [row_to_csv(row)[:-1] for row in self.get_csv_iter(number_of_lines)]
 
     def read_raw(self) -> str:
-        return self._reader.read_raw()
+        if self.result_format == DEFAULT_RESULT_FORMAT:
+            return self._reader.read_raw()
+        # Results in other formats are converted to csv when downloaded
+        return rows_to_csv(self.get_csv_iter(None))
+
+    def get_download_size(self) -> Optional[int]:
+        """Size of the csv returned by get_download_iter, known only
+           for csv results that the store can measure
+
+        Returns:
+            Optional[int] -- size in bytes, None if unknown
+        """
+        if self.result_format != DEFAULT_RESULT_FORMAT:
+            return None
+        return self._reader.get_size()
+
+    def get_download_iter(
+        self, start: int = 0, end: Optional[int] = None
+    ) -> Generator[bytes, None, None]:
+        """Stream the result as csv in chunks of about STORE_READ_SIZE
+           bytes, so that downloads do not hold the whole result in memory
+
+        Arguments:
+            start {int} -- The byte offset to start from, csv results only
+            end {Optional[int]} -- The byte offset to stop before, csv results only
+
+        Returns:
+            Generator[bytes, None, None] -- the csv bytes
+        """
+        read_size = QuerybookSettings.STORE_READ_SIZE
+        if self.result_format == DEFAULT_RESULT_FORMAT:
+            stream = self._reader.open_binary_stream(start)
+            try:
+                remaining = None if end is None else end - start
+                while remaining is None or remaining > 0:
+                    chunk = stream.read(
+                        read_size if remaining is None else min(read_size, remaining)
+                    )
+                    if not chunk:
+                        break
+                    if remaining is not None:
+                        remaining -= len(chunk)
+                    yield chunk
+            finally:
+                stream.close()
+            return
+
+        assert start == 0 and end is None, "Byte ranges are only supported for csv"
+        chunk = []
+        chunk_size = 0
+        for row in self.get_csv_iter(None):
+            row_csv = row_to_csv(row)
+            chunk.append(row_csv)
+            chunk_size += len(row_csv)
+            if chunk_size >= read_size:
+                yield "".join(chunk).encode("utf-8")
+                chunk = []
+                chunk_size = 0
+        if chunk:
+            yield "".join(chunk).encode("utf-8")
 
     @property
     def has_download_url(self):
-        return self._reader.has_download_url
+        # The download url serves the stored file as is, which must be csv
+        return (
+            self.result_format == DEFAULT_RESULT_FORMAT
+            and self._reader.has_download_url
+        )
 
     def get_download_url(self, custom_name=None) -> str:
         return self._reader.get_download_url(custom_name=custom_name)
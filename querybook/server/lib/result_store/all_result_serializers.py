@@ -0,0 +1,32 @@
+from lib.utils.import_helper import import_module_with_default
+
+PROVIDED_RESULT_SERIALIZERS_PATHS = {
+    "csv": ("lib.result_store.serializers.csv_serializer", "CSVResultSerializer"),
+    "arrow": ("lib.result_store.serializers.arrow_serializer", "ArrowResultSerializer"),
+}
+
+
+def import_provided_serializers():
+    provided_result_serializers = {}
+    for (
+        serializer_name,
+        (serializer_path, serializer_class_name),
+    ) in PROVIDED_RESULT_SERIALIZERS_PATHS.items():
+        serializer_class = import_module_with_default(
+            serializer_path, serializer_class_name, default=None
+        )
+        if serializer_class is not None:
+            provided_result_serializers[serializer_name] = serializer_class
+    return provided_result_serializers
+
+
+PROVIDED_RESULT_SERIALIZERS = import_provided_serializers()
+ALL_PLUGIN_RESULT_SERIALIZERS = import_module_with_default(
+    "result_store_plugin", "ALL_PLUGIN_RESULT_SERIALIZERS", default={}
+)
+
+
+ALL_RESULT_SERIALIZERS = {
+    **PROVIDED_RESULT_SERIALIZERS,
+    **ALL_PLUGIN_RESULT_SERIALIZERS,
+}
@@ -0,0 +1,93 @@
+import base64
+from bisect import bisect_right
+import json
+from typing import List, Tuple, Union
+
+# A row offset is recorded every ROW_INDEX_INTERVAL rows
+ROW_INDEX_INTERVAL = 10000
+
+
+def get_row_index_uri(result_uri: str) -> str:
+    return f"{result_uri}.index"
+
+
+def get_data_byte_size(data: Union[str, bytes]) -> int:
+    if isinstance(data, bytes) or data.isascii():
+        return len(data)
+    return len(data.encode("utf-8"))
+
+
+class ResultRowIndex(object):
+    """Sparse index of the byte offsets of rows in a stored result,
+    uploaded next to the result so it can be read from a row offset
+    with a single ranged read instead of scanning from the start.
+    """
+
+    def __init__(
+        self,
+        header: bytes = None,
+        rows: List[int] = None,
+        offsets: List[int] = None,
+        interval: int = ROW_INDEX_INTERVAL,
+    ):
+        self.header = header
+        # rows[i] is the row number (not counting the columns) found at offsets[i]
+        self.rows = rows or []
+        self.offsets = offsets or []
+
+        self._interval = interval
+        self._num_rows = 0
+        self._num_bytes = 0
+
+    def add_data(self, data: Union[str, bytes], num_rows: int = 0):
+        """Track data written to the uploader, must be called in write order
+
+        Arguments:
+            data {Union[str, bytes]} -- The data written
+            num_rows {int} -- Number of rows in data, 0 for the columns
+        """
+        if num_rows > 0 and self._num_rows >= len(self.rows) * self._interval:
+            self.rows.append(self._num_rows)
+            self.offsets.append(self._num_bytes)
+        self._num_rows += num_rows
+        self._num_bytes += get_data_byte_size(data)
+
+    @property
+    def is_useful(self) -> bool:
+        # A single entry means the result can be read from the start
+        return self.header is not None and len(self.rows) > 1
+
+    def find(self, row: int) -> Tuple[int, int]:
+        """Get the closest indexed row at or before the given row
+
+        Arguments:
+            row {int} -- row number, not counting the columns
+
+        Returns:
+            Tuple[int, int] -- the indexed row number and its byte offset
+        """
+        entry_idx = bisect_right(self.rows, row) - 1
+        if entry_idx < 0:
+            return 0, len(self.header)
+        return self.rows[entry_idx], self.offsets[entry_idx]
+
+    def to_json(self) -> str:
+        header_size = len(self.header)
+        return json.dumps(
+            {
+                "header": base64.b64encode(self.header).decode("ascii"),
+                "rows": self.rows,
+                # Rows never start before the end of the header, which is not
+                # the case for formats that write the header with the first rows
+                "offsets": [max(offset, header_size) for offset in self.offsets],
+            }
+        )
+
+    @classmethod
+    def from_json(cls, raw: Union[str, bytes]) -> "ResultRowIndex":
+        row_index = json.loads(raw)
+        return cls(
+            header=base64.b64decode(row_index["header"]),
+            rows=row_index["rows"],
+            offsets=row_index["offsets"],
+        )
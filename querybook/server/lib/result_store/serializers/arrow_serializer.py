@@ -0,0 +1,194 @@
+import datetime
+from io import BytesIO
+from typing import Any, BinaryIO, Generator, List, Optional
+
+import pyarrow as pa
+
+from lib.result_store.serializers.base_serializer import BaseResultSerializer
+from lib.utils.csv import serialize_cell
+
+# Python types that are kept as typed arrow columns,
+# every other column is stored as the string the csv format would produce
+TYPED_PYTHON_TYPES = (bool, int, float, str, datetime.datetime, datetime.date)
+# The arrow types that pyarrow infers for the typed python types
+ARROW_TO_PYTHON_TYPE = {
+    pa.bool_(): bool,
+    pa.int64(): int,
+    pa.float64(): float,
+    pa.string(): str,
+    pa.timestamp("us"): datetime.datetime,
+    pa.date32(): datetime.date,
+}
+
+
+def _get_column_python_type(values: List[Any]) -> Optional[type]:
+    value_types = set(type(value) for value in values if value is not None)
+    if len(value_types) != 1:
+        return None
+
+    value_type = value_types.pop()
+    if value_type not in TYPED_PYTHON_TYPES:
+        return None
+    if value_type == datetime.datetime and any(
+        value.tzinfo is not None for value in values if value is not None
+    ):
+        # Keep the original offset as it would appear in csv
+        return None
+    return value_type
+
+
+def _get_string_array(values: List[Any]) -> pa.Array:
+    return pa.array([serialize_cell(value) for value in values], type=pa.string())
+
+
+def _infer_column_array(values: List[Any]) -> pa.Array:
+    if _get_column_python_type(values) is not None:
+        try:
+            return pa.array(values)
+        except (pa.ArrowException, OverflowError):
+            # i.e integers out of int64 range
+            pass
+    return _get_string_array(values)
+
+
+def _get_column_array(
+    values: List[Any], column_type: pa.DataType
+) -> Optional[pa.Array]:
+    """Convert the values to the column type, None if they do not fit"""
+    if column_type == pa.string():
+        return _get_string_array(values)
+
+    # Values are only kept if they have the exact python type of the
+    # column, i.e pyarrow would also accept floats and bools in int columns
+    if any(value is not None for value in values) and _get_column_python_type(
+        values
+    ) != ARROW_TO_PYTHON_TYPE.get(column_type):
+        return None
+    try:
+        return pa.array(values, type=column_type)
+    except (pa.ArrowException, OverflowError, TypeError):
+        return None
+
+
+def _record_batch_to_rows(batch: pa.RecordBatch) -> Generator[List[str], None, None]:
+    columns_values = [column.to_pylist() for column in batch.columns]
+    for row in zip(*columns_values):
+        yield [serialize_cell(cell) for cell in row]
+
+
+class ArrowResultSerializer(BaseResultSerializer):
+    """Stores results as an Arrow IPC stream, one record batch per
+    batch of rows. Column types are inferred from the first batch.
+    If the values of a later batch do not fit the type of a column, such
+    as floats after ints, the stream is ended and a new one is started in
+    which the column holds strings, like the csv format would.
+    """
+
+    def __init__(self):
+        self._columns = []
+        self._schema = None
+        self._sink = BytesIO()
+        self._writer = None
+        self._header = None
+
+    @property
+    def is_binary(self) -> bool:
+        return True
+
+    @property
+    def batch_size(self) -> int:
+        return 10000
+
+    @property
+    def header(self) -> Optional[bytes]:
+        return self._header
+
+    def serialize_columns(self, columns: List[str]) -> bytes:
+        # The columns are written as part of the schema with the first batch
+        self._columns = list(columns)
+        return b""
+
+    def serialize_rows(self, rows: List[List[Any]]) -> bytes:
+        if len(rows) == 0:
+            return b""
+
+        columns_values = [list(values) for values in zip(*rows)]
+        if self._schema is None:
+            arrays = [_infer_column_array(values) for values in columns_values]
+            self._start_writer(
+                pa.schema(
+                    [
+                        pa.field(column, array.type)
+                        for column, array in zip(self._columns, arrays)
+                    ]
+                )
+            )
+        else:
+            arrays = [
+                _get_column_array(values, field.type)
+                for values, field in zip(columns_values, self._schema)
+            ]
+            if any(array is None for array in arrays):
+                arrays = [
+                    _get_string_array(values) if array is None else array
+                    for values, array in zip(columns_values, arrays)
+                ]
+                self._writer.close()
+                self._start_writer(
+                    pa.schema(
+                        [
+                            pa.field(field.name, array.type)
+                            for field, array in zip(self._schema, arrays)
+                        ]
+                    )
+                )
+                # The header would only be valid for the first stream,
+                # so results with several streams are read from the start
+                self._header = None
+
+        self._writer.write_batch(
+            pa.RecordBatch.from_arrays(arrays, schema=self._schema)
+        )
+        return self._flush_sink()
+
+    def end(self) -> bytes:
+        if self._writer is None:
+            # No rows, the columns are still kept in the schema
+            self._start_writer(
+                pa.schema([pa.field(column, pa.string()) for column in self._columns])
+            )
+        self._writer.close()
+        return self._flush_sink()
+
+    def _start_writer(self, schema: pa.Schema):
+        if self._schema is None:
+            self._header = schema.serialize().to_pybytes()
+        self._schema = schema
+        self._writer = pa.ipc.new_stream(self._sink, schema)
+
+    def _flush_sink(self) -> bytes:
+        data = self._sink.getvalue()
+        self._sink.seek(0)
+        self._sink.truncate()
+        return data
+
+    @classmethod
+    def deserialize(cls, stream: BinaryIO) -> Generator[List[str], None, None]:
+        reader = pa.ipc.open_stream(stream)
+        yield reader.schema.names
+        while True:
+            for batch in reader:
+                yield from _record_batch_to_rows(batch)
+            try:
+                reader = pa.ipc.open_stream(stream)
+            except pa.ArrowInvalid:
+                # No stream after the end of the last one
+                return
+
+    @classmethod
+    def deserialize_rows(
+        cls, header: bytes, stream: BinaryIO
+    ) -> Generator[List[str], None, None]:
+        schema = pa.ipc.read_schema(pa.py_buffer(header))
+        for message in pa.ipc.MessageReader.open_stream(stream):
+            yield from _record_batch_to_rows(pa.ipc.read_record_batch(message, schema))
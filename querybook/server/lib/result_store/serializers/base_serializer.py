@@ -0,0 +1,93 @@
+from abc import ABC, abstractmethod
+from typing import Any, BinaryIO, Generator, List, Optional, Union
+
+
+class BaseResultSerializer(ABC):
+    """Base interface for converting query results into the
+    format persisted by the result store, and back into rows of strings.
+
+    The serializer's name in all_result_serializers.py is also used
+    as the extension of the result file, so the format of a stored
+    result can be found from its path.
+    """
+
+    @property
+    def is_binary(self) -> bool:
+        """If true, the serializer produces bytes instead of str
+        and can only be used by uploaders that support binary writes
+        """
+        return False
+
+    @property
+    def batch_size(self) -> int:
+        """Number of rows passed to each serialize_rows call"""
+        return 1
+
+    @abstractmethod
+    def serialize_columns(self, columns: List[str]) -> Union[str, bytes]:
+        """Serialize the column names, called once before any rows
+
+        Arguments:
+            columns {List[str]} -- The column names of the result
+
+        Returns:
+            Union[str, bytes] -- Data to be written to the uploader
+        """
+        pass
+
+    @abstractmethod
+    def serialize_rows(self, rows: List[List[Any]]) -> Union[str, bytes]:
+        """Serialize a batch of rows
+
+        Arguments:
+            rows {List[List[Any]]} -- Rows returned by the cursor
+
+        Returns:
+            Union[str, bytes] -- Data to be written to the uploader
+        """
+        pass
+
+    @property
+    def header(self) -> Optional[bytes]:
+        """The bytes at the start of the result that describe the columns,
+        available once the first rows are serialized. It is kept in the row
+        index so rows can be read from the middle of the result.
+        None if the format cannot be read from a row offset.
+        """
+        return None
+
+    def end(self) -> Union[str, bytes]:
+        """Finish serialization, returns any trailing data that
+        needs to be written to the uploader
+        """
+        return b"" if self.is_binary else ""
+
+    @classmethod
+    def deserialize(cls, stream: BinaryIO) -> Generator[List[str], None, None]:
+        """Read the stored result back as rows of strings, the first row
+        being the columns. The cell values must match what the csv format
+        would have returned for the same result.
+
+        Arguments:
+            stream {BinaryIO} -- A readable binary file object of the result
+
+        Returns:
+            Generator[List[str], None, None] -- generator of rows
+        """
+        raise NotImplementedError()
+
+    @classmethod
+    def deserialize_rows(
+        cls, header: bytes, stream: BinaryIO
+    ) -> Generator[List[str], None, None]:
+        """Same as deserialize, but the stream starts at a row offset
+        recorded in the row index and the columns are not returned
+
+        Arguments:
+            header {bytes} -- The header of the result
+            stream {BinaryIO} -- A readable binary file object starting at a row
+
+        Returns:
+            Generator[List[str], None, None] -- generator of rows
+        """
+        raise NotImplementedError()
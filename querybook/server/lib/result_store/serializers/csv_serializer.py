@@ -0,0 +1,39 @@
+from typing import Any, BinaryIO, Generator, List, Optional
+
+from lib.result_store.serializers.base_serializer import BaseResultSerializer
+from lib.utils.csv import bytes_stream_to_csv_iter, row_to_csv, rows_to_csv
+
+
+class CSVResultSerializer(BaseResultSerializer):
+    """Default format, csv results are mostly read back
+    by the result store readers directly
+    """
+
+    def __init__(self):
+        self._header = None
+
+    @property
+    def batch_size(self) -> int:
+        return 1000
+
+    @property
+    def header(self) -> Optional[bytes]:
+        return self._header
+
+    def serialize_columns(self, columns: List[str]) -> str:
+        columns_csv = row_to_csv(columns)
+        self._header = columns_csv.encode("utf-8")
+        return columns_csv
+
+    def serialize_rows(self, rows: List[List[Any]]) -> str:
+        return rows_to_csv(rows)
+
+    @classmethod
+    def deserialize(cls, stream: BinaryIO) -> Generator[List[str], None, None]:
+        return bytes_stream_to_csv_iter(stream)
+
+    @classmethod
+    def deserialize_rows(
+        cls, header: bytes, stream: BinaryIO
+    ) -> Generator[List[str], None, None]:
+        return bytes_stream_to_csv_iter(stream)
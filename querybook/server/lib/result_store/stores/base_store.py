@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import Generator, List, Optional
+from typing import BinaryIO, Generator, List, Optional, Union
 
 
 class BaseUploader(ABC):
@@ -14,7 +14,10 @@ class BaseUploader(ABC):
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        self.end()
+        if exc_type is None:
+            self.end()
+        else:
+            self.abort()
 
     @abstractmethod
     def start(self):
@@ -26,12 +29,52 @@ class BaseUploader(ABC):
 
         pass
 
+    @classmethod
+    def supports_binary(cls) -> bool:
+        """If true, write also accepts bytes so that results
+        can be stored in binary formats such as arrow
+        """
+        return False
+
+    @classmethod
+    def supports_delete(cls) -> bool:
+        """If true, delete can remove stored files so that the
+        results of deleted query executions are cleaned up
+        """
+        return False
+
+    @classmethod
+    def delete(cls, uris: List[str]) -> int:
+        """Delete the stored files, files that do not exist are skipped
+
+        Arguments:
+            uris {List[str]} -- The uris of the files, as given to the uploader
+
+        Returns:
+            int -- The number of deleted files
+        """
+        raise NotImplementedError()
+
+    @classmethod
+    def list_uris(cls, prefix: str) -> Generator[str, None, None]:
+        """List the stored files, stores that support delete should
+        implement it so that files left by deleted results can be found
+
+        Arguments:
+            prefix {str} -- Only list the uris that start with it
+
+        Returns:
+            Generator[str, None, None] -- The uris of the files, as given to the uploader
+        """
+        raise NotImplementedError()
+
     @abstractmethod
-    def write(self, data: str) -> bool:
+    def write(self, data: Union[str, bytes]) -> bool:
         """Upload part of the string
 
         Arguments:
-            data {str} -- Part of the string to upload
+            data {Union[str, bytes]} -- Part of the string to upload,
+                                        bytes only if supports_binary is true
 
         Returns:
             bool -- Whether or not the upload was successful
@@ -44,6 +87,10 @@ class BaseUploader(ABC):
         """Finish the upload"""
         pass
 
+    def abort(self):
+        """Stop the upload after a failure without finishing it"""
+        pass
+
 
 class BaseReader(ABC):
     @abstractmethod
@@ -115,6 +162,27 @@ class BaseReader(ABC):
         """
         pass
 
+    def open_binary_stream(self, offset: int = 0) -> BinaryIO:
+        """Open the stored file as a binary file object, needed
+           to read results stored in binary formats or from a row offset
+
+        Arguments:
+            offset {int} -- The byte offset to start reading from
+
+        Returns:
+            BinaryIO -- readable file object of the raw file
+        """
+        raise NotImplementedError()
+
+    def get_size(self) -> Optional[int]:
+        """Get the size of the stored file, used to stream
+           downloads with a Content-Length and byte ranges
+
+        Returns:
+            Optional[int] -- size in bytes, None if unknown
+        """
+        return None
+
     @abstractmethod
     def end(self):
         """End the reading process"""
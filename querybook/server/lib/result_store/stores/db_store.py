@@ -1,5 +1,6 @@
+from io import BytesIO
 from itertools import islice
-from typing import Generator, List, Optional
+from typing import BinaryIO, Generator, List, Optional
 
 from env import QuerybookSettings
 from lib.result_store.stores.base_store import BaseReader, BaseUploader
@@ -38,6 +39,12 @@ class DBReader(BaseReader):
     def read_raw(self) -> str:
         return self._text
 
+    def open_binary_stream(self, offset: int = 0) -> BinaryIO:
+        return BytesIO(self._text.encode("utf-8")[offset:])
+
+    def get_size(self) -> Optional[int]:
+        return len(self._text.encode("utf-8"))
+
     def end(self):
         self._text = ""
 
@@ -54,6 +61,14 @@ class DBUploader(BaseUploader):
         self._reset_variables()
         self._uri = uri
 
+    @classmethod
+    def supports_delete(cls) -> bool:
+        return True
+
+    @classmethod
+    def delete(cls, uris: List[str]) -> int:
+        return result_store.delete_key_value_stores(uris)
+
     def _reset_variables(self):
         self._chunks = []
         self._chunks_length = 0
@@ -1,6 +1,6 @@
 from itertools import islice
 import os
-from typing import Optional
+from typing import BinaryIO, Generator, List, Optional, Union
 from lib.result_store.stores.base_store import BaseReader, BaseUploader
 from env import QuerybookSettings
 from lib.utils.csv import str_to_csv_iter
@@ -30,7 +30,42 @@ class FileUploader(BaseUploader):
         self._chunks_length = 0
         os.makedirs(self.uri_dir_path, exist_ok=True)
 
-    def write(self, data: str):
+    @classmethod
+    def supports_binary(cls) -> bool:
+        return True
+
+    @classmethod
+    def supports_delete(cls) -> bool:
+        return True
+
+    @classmethod
+    def delete(cls, uris: List[str]) -> int:
+        deleted_count = 0
+        for uri in uris:
+            file_path = get_file_uri(uri)
+            if not os.path.exists(file_path):
+                continue
+            os.remove(file_path)
+            deleted_count += 1
+
+            # Results are stored in a folder per statement execution
+            dir_path = os.path.dirname(file_path)
+            if len(os.listdir(dir_path)) == 0:
+                os.rmdir(dir_path)
+        return deleted_count
+
+    @classmethod
+    def list_uris(cls, prefix: str) -> Generator[str, None, None]:
+        # Only the folder of the prefix needs to be walked
+        dir_path = os.path.join(FILE_STORE_PATH, os.path.dirname(prefix))
+        for root, dir_names, file_names in os.walk(dir_path):
+            dir_names.sort()
+            for file_name in sorted(file_names):
+                uri = os.path.relpath(os.path.join(root, file_name), FILE_STORE_PATH)
+                if uri.startswith(prefix):
+                    yield uri
+
+    def write(self, data: Union[str, bytes]):
         # write each line into csv
         data_len = len(data)
         if (
@@ -40,7 +75,7 @@ class FileUploader(BaseUploader):
             return False
 
         self._chunks_length += data_len
-        with open(self.uri, "a") as result_file:
+        with open(self.uri, "ab" if isinstance(data, bytes) else "a") as result_file:
             result_file.write(data)
         return True
 
@@ -79,6 +114,14 @@ class FileReader(BaseReader):
         with open(self.uri) as result_file:
             return result_file.read()
 
+    def open_binary_stream(self, offset: int = 0) -> BinaryIO:
+        result_file = open(self.uri, "rb")
+        result_file.seek(offset)
+        return result_file
+
+    def get_size(self) -> Optional[int]:
+        return os.path.getsize(self.uri)
+
     def end(self):
         pass
 
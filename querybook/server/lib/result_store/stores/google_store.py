@@ -1,9 +1,11 @@
-from typing import Generator, List, Optional
+from typing import BinaryIO, Generator, List, Optional, Union
 
 from clients import google_client  # Needed to patch GoogleDownloadClient in tests
 from clients.google_client import (
     GoogleUploadClient,
     GoogleKeySigner,
+    delete_blobs,
+    list_blob_names,
 )
 from lib.result_store.stores.base_store import BaseReader, BaseUploader
 from env import QuerybookSettings
@@ -19,8 +21,31 @@ class GoogleUploader(BaseUploader):
         )
         self._uploader.start()
 
-    def write(self, data: str) -> bool:
-        self._uploader.write(data.encode())
+    @classmethod
+    def supports_binary(cls) -> bool:
+        return True
+
+    @classmethod
+    def supports_delete(cls) -> bool:
+        return True
+
+    @classmethod
+    def delete(cls, uris: List[str]) -> int:
+        return delete_blobs(
+            QuerybookSettings.STORE_BUCKET_NAME,
+            [f"{QuerybookSettings.STORE_PATH_PREFIX}{uri}" for uri in uris],
+        )
+
+    @classmethod
+    def list_uris(cls, prefix: str) -> Generator[str, None, None]:
+        path_prefix = QuerybookSettings.STORE_PATH_PREFIX
+        for blob_name in list_blob_names(
+            QuerybookSettings.STORE_BUCKET_NAME, f"{path_prefix}{prefix}"
+        ):
+            yield blob_name[len(path_prefix) :]
+
+    def write(self, data: Union[str, bytes]) -> bool:
+        self._uploader.write(data if isinstance(data, bytes) else data.encode())
         return True
 
     def end(self):
@@ -64,6 +89,11 @@ class GoogleReader(BaseReader):
         # TODO: implement read raw for Google reader
         raise NotImplementedError()
 
+    def open_binary_stream(self, offset: int = 0) -> BinaryIO:
+        stream = self._reader.open_binary_stream()
+        stream.seek(offset)
+        return stream
+
     def end(self):
         self._reader = None
 
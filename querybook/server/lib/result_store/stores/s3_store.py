@@ -1,9 +1,9 @@
-from typing import Generator, List, Optional
+from typing import BinaryIO, Generator, List, Optional, Union
 
 from lib.result_store.stores.base_store import BaseReader, BaseUploader
 from env import QuerybookSettings
 from clients import s3_client  # Needed to patch S3FileReader in tests
-from clients.s3_client import MultiPartUploader, S3KeySigner
+from clients.s3_client import MultiPartUploader, S3KeySigner, delete_keys, list_keys
 
 
 class S3Uploader(BaseUploader):
@@ -16,13 +16,40 @@ class S3Uploader(BaseUploader):
             QuerybookSettings.STORE_BUCKET_NAME, self.uri
         )
 
-    def write(self, data: str) -> bool:
+    @classmethod
+    def supports_binary(cls) -> bool:
+        return True
+
+    @classmethod
+    def supports_delete(cls) -> bool:
+        return True
+
+    @classmethod
+    def delete(cls, uris: List[str]) -> int:
+        return delete_keys(
+            QuerybookSettings.STORE_BUCKET_NAME,
+            [f"{QuerybookSettings.STORE_PATH_PREFIX}{uri}" for uri in uris],
+        )
+
+    @classmethod
+    def list_uris(cls, prefix: str) -> Generator[str, None, None]:
+        path_prefix = QuerybookSettings.STORE_PATH_PREFIX
+        for key in list_keys(
+            QuerybookSettings.STORE_BUCKET_NAME, f"{path_prefix}{prefix}"
+        ):
+            yield key[len(path_prefix) :]
+
+    def write(self, data: Union[str, bytes]) -> bool:
         return self._uploader.write(data)
 
     def end(self):
         self._uploader.complete()
         self._uploader = None
 
+    def abort(self):
+        self._uploader.abort()
+        self._uploader = None
+
     @property
     def is_uploading(self):
         return self._uploader is not None
@@ -60,6 +87,11 @@ class S3Reader(BaseReader):
         # TODO: implement read raw for s3 reader
         raise NotImplementedError()
 
+    def open_binary_stream(self, offset: int = 0) -> BinaryIO:
+        if offset == 0:
+            return self._reader.body
+        return self._reader.open_body(offset)
+
     def end(self):
         self._reader = None
 
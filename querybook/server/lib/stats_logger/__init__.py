@@ -9,6 +9,11 @@ SQL_SESSION_FAILURES = "sql_session.failures"
 TASK_FAILURES = "task.failures"
 REDIS_OPERATIONS = "redis.operations"
 QUERY_EXECUTIONS = "query.executions"
+QUERY_EXECUTION_POLLS = "query.execution_polls"
+QUERY_EXECUTION_POLL_LATENCY = "query.execution_poll_latency"
+RESULT_UPLOAD_FETCH_TIME = "result_upload.fetch_time"
+RESULT_UPLOAD_WAIT_TIME = "result_upload.wait_time"
+RESULT_UPLOAD_WRITE_TIME = "result_upload.write_time"
 
 
 logger_name = QuerybookSettings.STATS_LOGGER_NAME
@@ -173,10 +173,14 @@ class S3CSVExporter(S3BaseExporter):
 
         bucket, key = S3FileCopier.s3_path_to_bucket_key(self.destination_s3_path())
         s3_uploader = MultiPartUploader(bucket, key)
-        for chunk_no, sub_df in df.groupby(
-            np.arange(len(df)) // MULTI_UPLOADER_CHUNK_SIZE
-        ):
-            s3_uploader.write(sub_df.to_csv(index=False, header=(chunk_no == 0)))
+        try:
+            for chunk_no, sub_df in df.groupby(
+                np.arange(len(df)) // MULTI_UPLOADER_CHUNK_SIZE
+            ):
+                s3_uploader.write(sub_df.to_csv(index=False, header=(chunk_no == 0)))
+        except Exception:
+            s3_uploader.abort()
+            raise
         s3_uploader.complete()
 
     def _upload_to_s3(self):
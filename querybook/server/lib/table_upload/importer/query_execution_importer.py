@@ -82,7 +82,8 @@ class QueryExecutionImporter(BaseTableUploadImporter):
             store_type = reader.store_type
             resource_path = reader.uri
             resource_type = STORE_TYPE_TO_RESOURCE_TYPE.get(store_type, None)
-            if resource_type:
+            # Only csv results can be read directly from the store
+            if resource_type and reader.result_format == "csv":
                 return [resource_type, resource_path]
 
         return [None, None]
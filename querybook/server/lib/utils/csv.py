@@ -1,9 +1,12 @@
+import codecs
 import csv
 import datetime
 from io import StringIO
 import json
+import math
+import re
 import sys
-from typing import Generator, List, Tuple
+from typing import Any, BinaryIO, Generator, Iterable, List, Tuple
 
 from .utils import DATE_STRING, DATETIME_STRING
 
@@ -23,12 +26,46 @@ def str_to_csv_iter(raw_csv_str: str) -> Generator[List[List[str]], None, None]:
     return csv.reader(raw_results, delimiter=",")
 
 
+def bytes_stream_to_csv_iter(
+    stream: BinaryIO, read_size: int = 131072
+) -> Generator[List[List[str]], None, None]:
+    """Parse csv from a utf-8 binary file object without reading it all in memory
+
+    Arguments:
+        stream {BinaryIO} -- A readable binary file object that starts at a csv row
+        read_size {int} -- Number of bytes per read
+
+    Returns:
+        Generator[List[List[str]], None, None] -- generator for parsed csv
+    """
+
+    def read_lines():
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        partial_line = ""
+        while True:
+            raw = stream.read(read_size)
+            lines = (partial_line + decoder.decode(raw, final=not raw)).split(
+                LINE_TERMINATOR
+            )
+            partial_line = lines.pop()
+            for line in lines:
+                # Remove NULL byte to make sure csv conversion works
+                yield line.replace("\x00", "") + LINE_TERMINATOR
+            if not raw:
+                break
+        if partial_line:
+            yield partial_line.replace("\x00", "")
+
+    return csv.reader(read_lines(), delimiter=",")
+
+
 def string_to_csv(raw_csv_str: str) -> List[List[str]]:
     csv_reader = str_to_csv_iter(raw_csv_str)
     return [row for row in csv_reader]
 
 
 should_escape_list = (",", '"', "\n", "\r")
+_should_escape = re.compile("[%s]" % "".join(should_escape_list)).search
 
 
 def serialize_cell(cell) -> str:
@@ -50,16 +87,59 @@ def serialize_cell(cell) -> str:
             return "[Unserializable]"
 
 
-def row_to_csv(row):
-    output = []
-    for cell in row:
-        str_col = serialize_cell(cell)
+def _escape_csv_cell(str_col: str) -> str:
+    if _should_escape(str_col):
+        return '"%s"' % str_col.replace('"', '""')
+    return str_col
+
+
+def _serialize_float(cell: float) -> str:
+    # json.dumps only differs from repr for nan and infinity
+    return float.__repr__(cell) if math.isfinite(cell) else json.dumps(cell)
+
 
-        if any(c in str_col for c in should_escape_list):
-            str_col = '"%s"' % str_col.replace('"', '""')
+# Serializes the cells of these exact types to the same string as
+# serialize_cell. Only strings are checked for escaping since the
+# other types never serialize to characters that need to be escaped
+_csv_cell_by_type = {
+    str: _escape_csv_cell,
+    int: int.__repr__,
+    float: _serialize_float,
+    bool: lambda cell: "true" if cell else "false",
+    type(None): lambda cell: "null",
+    datetime.datetime: DATETIME_STRING,
+    datetime.date: DATE_STRING,
+}
 
-        output.append(str_col)
-    return ",".join(output) + "\n"
+
+def _serialize_csv_cell(cell) -> str:
+    return _escape_csv_cell(serialize_cell(cell))
+
+
+def rows_to_csv(rows: Iterable[List[Any]]) -> str:
+    """Encode a batch of rows as one csv chunk, the result is
+       the same as joining row_to_csv of each row
+
+    Arguments:
+        rows {Iterable[List[Any]]} -- rows of the query result
+
+    Returns:
+        str -- the csv, every row ends with a line terminator
+    """
+    get_csv_cell = _csv_cell_by_type.get
+    return "".join(
+        [
+            ",".join(
+                [get_csv_cell(type(cell), _serialize_csv_cell)(cell) for cell in row]
+            )
+            + "\n"
+            for row in rows
+        ]
+    )
+
+
+def row_to_csv(row):
+    return rows_to_csv((row,))
 
 
 def csv_sniffer(lines: List[str]) -> int:
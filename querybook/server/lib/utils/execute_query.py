@@ -2,7 +2,7 @@ from app.db import with_session
 from logic.admin import get_query_engine_by_id
 from lib.query_executor.all_executors import get_executor_class
 from lib.query_executor.executor_factory import get_client_setting_from_engine
-from lib.query_analysis.statements import get_statements
+from lib.query_analysis.analysis import get_query_analysis
 
 
 class ExecuteQuery(object):
@@ -130,7 +130,7 @@ def parse_statement_from_query(executor, query):
     if executor.SINGLE_QUERY_QUERY_ENGINE():
         statements = [query]
     else:
-        statements = get_statements(query)
+        statements = get_query_analysis(query).statements
 
     return statements
 
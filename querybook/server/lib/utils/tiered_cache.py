@@ -0,0 +1,440 @@
+"""A cache for hot keys with up to three tiers:
+
+1. In-process, a small TTL/LRU cache that is only used for keys read
+   with local_expires_after, so that values changed by other processes
+   are seen once the local copy expires.
+2. Redis, the shared tier. Entries expire with native redis TTLs.
+3. MySQL (KeyValueStore), an optional durable fallback for keys set with
+   durable=True. Expired rows are deleted when they are read.
+
+Unlike mysql_cache, no celery task is needed to expire the keys.
+"""
+
+from collections import OrderedDict
+from functools import wraps
+import math
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+import uuid
+
+from redis.exceptions import RedisError
+
+from app.db import with_session
+from clients.redis_client import with_redis
+from lib.logger import get_logger
+from lib.utils import json
+from logic.result_store import (
+    delete_key_value_store,
+    get_key_value_store,
+    upsert_key_value_store,
+)
+
+LOG = get_logger(__file__)
+
+CACHE_KEY = "tiered_cache:{}"
+LOCK_KEY = "tiered_cache_lock:{}"
+# Fields of the entries stored in redis and mysql, see _make_entry
+ENTRY_FIELDS = {"value", "updated_at", "expires_at"}
+
+# Max number of keys kept in the in-process tier
+LOCAL_CACHE_MAX_SIZE = 1000
+# Max seconds get_or_set waits for another process computing the same key
+DEFAULT_LOCK_TIMEOUT = 30
+LOCK_POLL_INTERVAL = 0.1
+
+# Deletes the lock only if it is still owned by the caller
+_RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+class LocalCache(object):
+    """Thread safe in-process cache, the least recently used
+    entries are evicted once there are more than max_size entries
+    """
+
+    def __init__(self, max_size: int = LOCAL_CACHE_MAX_SIZE):
+        self._max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            expires_at, entry = item
+            if expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, entry: Dict, expires_after: float):
+        with self._lock:
+            self._entries[key] = (time.time() + expires_after, entry)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class KeyLocks(object):
+    """In-process locks by key, so that threads or greenlets of
+    the same process compute a missing key only once
+    """
+
+    def __init__(self):
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, key: str):
+        return _KeyLock(self, key)
+
+    def _acquire(self, key: str):
+        with self._lock:
+            lock, count = self._locks.get(key, (None, 0))
+            if lock is None:
+                lock = threading.Lock()
+            self._locks[key] = (lock, count + 1)
+        lock.acquire()
+
+    def _release(self, key: str):
+        with self._lock:
+            lock, count = self._locks[key]
+            if count == 1:
+                del self._locks[key]
+            else:
+                self._locks[key] = (lock, count - 1)
+        lock.release()
+
+
+class _KeyLock(object):
+    def __init__(self, key_locks: KeyLocks, key: str):
+        self._key_locks = key_locks
+        self._key = key
+
+    def __enter__(self):
+        self._key_locks._acquire(self._key)
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._key_locks._release(self._key)
+
+
+_local_cache = LocalCache()
+_key_locks = KeyLocks()
+
+
+def _make_entry(value: Any, expires_after: Optional[int]) -> Dict:
+    now = time.time()
+    return {
+        "value": value,
+        "updated_at": int(now),
+        "expires_at": None if expires_after is None else now + expires_after,
+    }
+
+
+def _get_remaining_ttl(entry: Dict) -> Optional[float]:
+    if entry["expires_at"] is None:
+        return None
+    return entry["expires_at"] - time.time()
+
+
+def _set_local_entry(key: str, entry: Dict, local_expires_after: Optional[float]):
+    if not local_expires_after:
+        return
+    remaining_ttl = _get_remaining_ttl(entry)
+    if remaining_ttl is not None:
+        local_expires_after = min(local_expires_after, remaining_ttl)
+    if local_expires_after > 0:
+        _local_cache.set(key, entry, local_expires_after)
+
+
+@with_redis
+def _set_redis_entry(key: str, entry: Dict, redis_conn=None):
+    remaining_ttl = _get_remaining_ttl(entry)
+    if remaining_ttl is not None and remaining_ttl <= 0:
+        return
+    redis_conn.set(
+        CACHE_KEY.format(key),
+        json.dumps(entry),
+        ex=None if remaining_ttl is None else max(1, math.ceil(remaining_ttl)),
+    )
+
+
+@with_redis
+def _get_redis_entry(key: str, redis_conn=None) -> Optional[Dict]:
+    raw = redis_conn.get(CACHE_KEY.format(key))
+    return None if raw is None else json.loads(raw)
+
+
+def _is_entry(entry: Any) -> bool:
+    return isinstance(entry, dict) and ENTRY_FIELDS.issubset(entry.keys())
+
+
+@with_session
+def _get_durable_entry(key: str, session=None) -> Optional[Dict]:
+    kvs = get_key_value_store(key, session=session)
+    if kvs is None:
+        return None
+    try:
+        entry = json.loads(kvs.value)
+    except ValueError:
+        entry = None
+    if not _is_entry(entry):
+        # Rows written by mysql_cache, which did not keep the expiration
+        delete_key_value_store(key, session=session)
+        return None
+    remaining_ttl = _get_remaining_ttl(entry)
+    if remaining_ttl is not None and remaining_ttl <= 0:
+        delete_key_value_store(key, session=session)
+        return None
+    return entry
+
+
+@with_redis
+def set_key(
+    key: str,
+    value: Any,
+    expires_after: Optional[int] = None,
+    local_expires_after: Optional[float] = None,
+    durable: bool = False,
+    redis_conn=None,
+):
+    """Set the cached value of the key in every tier
+
+    Arguments:
+        key {str} -- The cache key
+        value {Any} -- Json serializable value
+
+    Keyword Arguments:
+        expires_after {Optional[int]} -- Seconds until the key expires, never if None
+        local_expires_after {Optional[float]} -- Seconds the value is kept in this process,
+                                                 not kept if None (default: {None})
+        durable {bool} -- Also store the key in mysql (default: {False})
+    """
+    entry = _make_entry(value, expires_after)
+    if durable:
+        upsert_key_value_store(key, json.dumps(entry))
+
+    try:
+        _set_redis_entry(key, entry, redis_conn=redis_conn)
+    except RedisError:
+        # The value can still be read from mysql if durable,
+        # otherwise it is computed again once redis is back
+        LOG.warning(f"Failed to set {key} in redis", exc_info=True)
+    _set_local_entry(key, entry, local_expires_after)
+
+
+@with_redis
+def get_raw_key(
+    key: str,
+    local_expires_after: Optional[float] = None,
+    durable: bool = False,
+    redis_conn=None,
+) -> Dict:
+    """Get the cached value of the key from the first tier that has it
+
+    Arguments:
+        key {str} -- The cache key
+
+    Keyword Arguments:
+        local_expires_after {Optional[float]} -- Seconds the value is kept in this process,
+                                                 not kept if None (default: {None})
+        durable {bool} -- Fall back to mysql if redis does not have the key (default: {False})
+
+    Raises:
+        LookupError: If the key is not cached or has expired
+
+    Returns:
+        Dict -- The value and updated_at, the time in seconds it was set
+    """
+    entry = _local_cache.get(key) if local_expires_after else None
+
+    if entry is None:
+        try:
+            entry = _get_redis_entry(key, redis_conn=redis_conn)
+        except RedisError:
+            LOG.warning(f"Failed to get {key} from redis", exc_info=True)
+
+        if entry is None and durable:
+            entry = _get_durable_entry(key)
+            if entry is not None:
+                try:
+                    _set_redis_entry(key, entry, redis_conn=redis_conn)
+                except RedisError:
+                    pass
+
+        if entry is None:
+            raise LookupError(f"Invalid key {key}")
+        _set_local_entry(key, entry, local_expires_after)
+
+    return {"value": entry["value"], "updated_at": entry["updated_at"]}
+
+
+def get_key(
+    key: str,
+    local_expires_after: Optional[float] = None,
+    durable: bool = False,
+) -> Any:
+    return get_raw_key(key, local_expires_after=local_expires_after, durable=durable)[
+        "value"
+    ]
+
+
+@with_redis
+def delete_key(key: str, durable: bool = False, redis_conn=None):
+    _local_cache.delete(key)
+    if durable:
+        delete_key_value_store(key)
+    try:
+        redis_conn.delete(CACHE_KEY.format(key))
+    except RedisError:
+        LOG.warning(f"Failed to delete {key} from redis", exc_info=True)
+
+
+@with_redis
+def acquire_lock(
+    name: str, expires_after: int = DEFAULT_LOCK_TIMEOUT, redis_conn=None
+) -> Optional[str]:
+    """Try to acquire a lock shared by all processes, which is released
+       by release_lock or once it expires
+
+    Arguments:
+        name {str} -- Name of the lock
+
+    Keyword Arguments:
+        expires_after {int} -- Seconds until the lock expires (default: {DEFAULT_LOCK_TIMEOUT})
+
+    Returns:
+        Optional[str] -- The token to release the lock, None if it is held by someone else
+    """
+    token = uuid.uuid4().hex
+    if redis_conn.set(LOCK_KEY.format(name), token, nx=True, ex=expires_after):
+        return token
+    return None
+
+
+@with_redis
+def release_lock(name: str, token: str, redis_conn=None):
+    redis_conn.eval(_RELEASE_LOCK_SCRIPT, 1, LOCK_KEY.format(name), token)
+
+
+def get_or_set(
+    key: str,
+    fn: Callable[..., Any],
+    expires_after: Optional[int] = None,
+    local_expires_after: Optional[float] = None,
+    durable: bool = False,
+    lock_timeout: int = DEFAULT_LOCK_TIMEOUT,
+    args: Optional[List] = None,
+    kwargs: Optional[Dict] = None,
+) -> Any:
+    """Get the cached value of the key, or call fn and cache its result.
+       When the key is missing, fn is called by a single caller while
+       the other callers, in this or other processes, wait for its result.
+
+    Arguments:
+        key {str} -- The cache key
+        fn {Callable[..., Any]} -- Returns the json serializable value of the key
+
+    Keyword Arguments:
+        lock_timeout {int} -- Max seconds to wait for another caller of fn, after which
+                              fn is called again (default: {DEFAULT_LOCK_TIMEOUT})
+        Other arguments are the same as set_key. If redis is down, fn is called
+        without waiting for other processes and its result is still returned
+
+    Returns:
+        Any -- The cached value
+    """
+
+    def get_cached_value():
+        return get_key(key, local_expires_after=local_expires_after, durable=durable)
+
+    try:
+        return get_cached_value()
+    except LookupError:
+        pass
+
+    with _key_locks(key):
+        # Another thread of this process may have set it while waiting
+        try:
+            return get_cached_value()
+        except LookupError:
+            pass
+
+        try:
+            token = acquire_lock(key, lock_timeout)
+            lock_acquired = True
+        except RedisError:
+            # Without redis, other processes cannot be waited for
+            LOG.warning(f"Failed to acquire the lock of {key}", exc_info=True)
+            token = None
+            lock_acquired = False
+
+        if token is None and lock_acquired:
+            deadline = time.time() + lock_timeout
+            while time.time() < deadline:
+                time.sleep(LOCK_POLL_INTERVAL)
+                try:
+                    return get_cached_value()
+                except LookupError:
+                    pass
+
+        try:
+            value = fn(*(args or []), **(kwargs or {}))
+            set_key(
+                key,
+                value,
+                expires_after=expires_after,
+                local_expires_after=local_expires_after,
+                durable=durable,
+            )
+        finally:
+            if token is not None:
+                try:
+                    release_lock(key, token)
+                except RedisError:
+                    # The lock expires after lock_timeout
+                    LOG.warning(f"Failed to release the lock of {key}", exc_info=True)
+        return value
+
+
+def with_cache(
+    cache_key: str,
+    expires_after: Optional[int] = None,
+    local_expires_after: Optional[float] = None,
+    durable: bool = False,
+):
+    """Same as with_mysql_cache, the result of the function is
+    cached by get_or_set under cache_key regardless of its arguments
+    """
+
+    def wrapper(fn):
+        @wraps(fn)
+        def handler(*args, **kwargs):
+            return get_or_set(
+                cache_key,
+                fn,
+                expires_after=expires_after,
+                local_expires_after=local_expires_after,
+                durable=durable,
+                args=args,
+                kwargs=kwargs,
+            )
+
+        handler.__raw__ = fn
+        return handler
+
+    return wrapper
@@ -5,7 +5,7 @@ from const.elasticsearch import ElasticsearchItem
 from models.board import Board, BoardItem, BoardEditor
 from models.access_request import AccessRequest
 from lib.sqlalchemy import update_model_fields
-from tasks.sync_elasticsearch import sync_elasticsearch
+from tasks.sync_elasticsearch import mark_elasticsearch_items_dirty
 from sqlalchemy import or_
 from logic.generic_permission import get_all_groups_and_group_members_with_access
 
@@ -194,7 +194,7 @@ def get_boards_from_board_item(
 
 
 def update_es_boards_by_id(board_id: int):
-    sync_elasticsearch.apply_async(args=[ElasticsearchItem.boards.value, board_id])
+    mark_elasticsearch_items_dirty(ElasticsearchItem.boards.value, [board_id])
 
 
 @with_session
@@ -1,5 +1,6 @@
 import datetime
 from sqlalchemy import func
+from sqlalchemy.orm import selectinload
 
 from app.db import with_session
 from const.data_doc import DataCellType
@@ -25,7 +26,7 @@ from models.datadoc import (
 from models.access_request import AccessRequest
 from models.impression import Impression
 from models.query_execution import QueryExecution
-from tasks.sync_elasticsearch import sync_elasticsearch
+from tasks.sync_elasticsearch import mark_elasticsearch_items_dirty
 from tasks.sync_es_queries_by_datadoc import (
     sync_es_queries_by_datadoc_id,
     sync_es_query_cells_by_datadoc_id,
@@ -188,15 +189,14 @@ def get_data_doc_by_user(uid, environment_id, offset, limit, session=None):
 
 
 @with_session
-def get_all_data_docs(offset=0, limit=100, session=None):
-    return (
-        session.query(DataDoc)
-        .filter_by(archived=False)
-        .order_by(DataDoc.id.desc())
-        .offset(offset)
-        .limit(limit)
-        .all()
-    )
+def get_all_data_docs(offset=0, limit=100, after_id=None, session=None):
+    query = session.query(DataDoc).filter_by(archived=False)
+    if after_id is not None:
+        # Page by id instead of offset, the docs are then in ascending id order
+        query = query.filter(DataDoc.id > after_id).order_by(DataDoc.id)
+    else:
+        query = query.order_by(DataDoc.id.desc())
+    return query.options(selectinload(DataDoc.cells)).offset(offset).limit(limit).all()
 
 
 # You cannot delete data doc
@@ -1045,7 +1045,7 @@ def get_unarchived_query_cell_by_id(id, session=None):
 
 
 def update_es_data_doc_by_id(id):
-    sync_elasticsearch.apply_async(args=[ElasticsearchItem.datadocs.value, id])
+    mark_elasticsearch_items_dirty(ElasticsearchItem.datadocs.value, [id])
 
 
 def update_es_queries_by_datadoc_id(id):
@@ -1057,7 +1057,7 @@ def update_es_query_cells_by_data_doc_id(id):
 
 
 def update_es_query_cell_by_id(id):
-    sync_elasticsearch.apply_async(args=[ElasticsearchItem.query_cells.value, id])
+    mark_elasticsearch_items_dirty(ElasticsearchItem.query_cells.value, [id])
 
 
 @with_session
@@ -1090,19 +1090,54 @@ def get_query_executions_by_data_doc_id(id, session=None):
 
 
 @with_session
-def get_all_query_cells(offset=0, limit=100, session=None):
-    return (
+def get_all_query_cells(offset=0, limit=100, after_id=None, session=None):
+    query = (
         session.query(DataCell)
         .filter_by(cell_type=DataCellType.query)
         .join(DataDocDataCell)
         .join(DataDoc)
         .filter(DataDoc.archived.is_(False))
+    )
+    if after_id is not None:
+        query = query.filter(DataCell.id > after_id)
+    return (
+        query.options(selectinload(DataCell.doc))
+        .order_by(DataCell.id)
         .offset(offset)
         .limit(limit)
         .all()
     )
 
 
+@with_session
+def get_all_query_cell_executions(after_id=0, limit=100, session=None):
+    """Get the successful query executions of the query cells in unarchived
+       data docs, paged by the id of the link between the cell and the execution
+
+    Returns:
+        List[Tuple[int, QueryExecution, DataCell]] -- Link id, query execution and cell
+    """
+    return (
+        session.query(DataCellQueryExecution.id, QueryExecution, DataCell)
+        .select_from(DataCellQueryExecution)
+        .join(
+            QueryExecution,
+            DataCellQueryExecution.query_execution_id == QueryExecution.id,
+        )
+        .join(DataCell, DataCellQueryExecution.data_cell_id == DataCell.id)
+        .join(DataDocDataCell, DataDocDataCell.data_cell_id == DataCell.id)
+        .join(DataDoc, DataDocDataCell.data_doc_id == DataDoc.id)
+        .filter(QueryExecution.status == QueryExecutionStatus.DONE)
+        .filter(DataCell.cell_type == DataCellType.query)
+        .filter(DataDoc.archived.is_(False))
+        .filter(DataCellQueryExecution.id > after_id)
+        .options(selectinload(DataCell.doc))
+        .order_by(DataCellQueryExecution.id)
+        .limit(limit)
+        .all()
+    )
+
+
 def get_data_cell_by_query_execution_id(query_execution_id, session=None):
     return (
         session.query(DataCell)
@@ -1,14 +1,19 @@
+import copy
 import math
 import re
 import time
 from html import escape
 from itertools import chain
-from typing import Any, Dict, List, Optional, Set
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from elasticsearch.helpers import parallel_bulk
 
 from app.db import with_session
 from const.ai_assistant import DEFAULT_SAMPLE_QUERY_COUNT
+from const.elasticsearch import ElasticsearchItem
 from const.impression import ImpressionItemType
 from const.query_execution import QueryExecutionStatus
+from env import QuerybookSettings
 from lib.elasticsearch.search_query import construct_query_search_query
 from lib.elasticsearch.search_utils import (
     ES_CONFIG,
@@ -16,39 +21,50 @@ from lib.elasticsearch.search_utils import (
     get_matching_objects,
 )
 from lib.logger import get_logger
-from lib.query_analysis import lineage as lineage_lib
-from lib.query_analysis.lineage import get_table_statement_type
+from lib.query_analysis.analysis import get_query_analysis
 from lib.richtext import richtext_to_plaintext
 from lib.utils.utils import DATETIME_TO_UTC, with_exception
 from logic import admin as admin_logic
 from logic import datadoc as datadoc_logic
 from logic.datadoc import (
     get_all_data_docs,
+    get_all_query_cell_executions,
     get_all_query_cells,
     get_data_cell_by_query_execution_id,
     get_data_doc_by_id,
     get_unarchived_query_cell_by_id,
 )
 from logic.impression import (
+    get_viewers_count_by_items_after_date,
     get_last_impressions_date,
-    get_viewers_count_by_item_after_date,
 )
 from logic.metastore import (
-    get_all_table,
     get_table_by_id,
     get_table_query_samples_count,
+    get_tables_query_samples_count,
+    get_tables_with_es_fields,
 )
 from logic.query_execution import (
     get_query_execution_by_id,
     get_successful_adhoc_query_executions,
-    get_successful_query_executions_by_data_cell_id,
 )
 from models.board import Board
 from models.datadoc import DataCellType
 from models.user import User
+from tasks.sync_elasticsearch import (
+    finish_elasticsearch_rebuild,
+    record_elasticsearch_rebuild_items,
+    start_elasticsearch_rebuild,
+)
 
 LOG = get_logger(__file__)
 
+# Table document fields that need the table weight
+TABLE_WEIGHT_FIELDS = {"completion_name", "importance_score"}
+
+# Only the first failed documents of a bulk request are logged in full
+MAX_LOGGED_BULK_ERRORS = 10
+
 
 def _get_dict_by_field(
     field_to_getter: Dict[str, Any], fields: Optional[List[str]] = None
@@ -82,8 +98,7 @@ def _get_datadoc_editors(datadoc, session) -> List[str]:
 
 
 def _get_table_names_from_query(query, language=None) -> List[str]:
-    table_names, _ = lineage_lib.process_query(query, language=language)
-    return list(chain.from_iterable(table_names))
+    return get_query_analysis(query, language=language, persist=True).tables
 
 
 """
@@ -93,57 +108,45 @@ def _get_table_names_from_query(query, language=None) -> List[str]:
 
 @with_session
 def _get_query_cell_executions_iter(batch_size=1000, fields=None, session=None):
-    offset = 0
+    after_id = 0
     while True:
-        query_cells = get_all_query_cells(
+        query_cell_executions = get_all_query_cell_executions(
+            after_id=after_id,
             limit=batch_size,
-            offset=offset,
             session=session,
         )
-        query_executions_count = 0
-        for query_cell in query_cells:
-            query_cell_executions_offset = 0
-            while True:
-                query_cell_executions = get_successful_query_executions_by_data_cell_id(
-                    query_cell.id,
-                    limit=batch_size,
-                    offset=query_cell_executions_offset,
-                    session=session,
-                )
-                for query_execution in query_cell_executions:
-                    expand_query_execution = query_execution_to_es(
-                        query_execution,
-                        data_cell=query_cell,
-                        fields=fields,
-                        session=session,
-                    )
-                    yield expand_query_execution
-                query_executions_count += len(query_cell_executions)
-                if len(query_cell_executions) < batch_size:
-                    break
-                query_cell_executions_offset += batch_size
         LOG.info(
-            "\n--Query cell count: {}, query cell executions count: {}, offset: {}".format(
-                len(query_cells), query_executions_count, offset
+            "\n--Query cell executions count: {}, after id: {}".format(
+                len(query_cell_executions), after_id
             )
         )
-        if len(query_cells) < batch_size:
+
+        for _, query_execution, query_cell in query_cell_executions:
+            expand_query_execution = query_execution_to_es(
+                query_execution,
+                data_cell=query_cell,
+                fields=fields,
+                session=session,
+            )
+            yield expand_query_execution
+
+        if len(query_cell_executions) < batch_size:
             break
-        offset += batch_size
+        after_id = query_cell_executions[-1][0]
 
 
 @with_session
 def _get_adhoc_query_executions_iter(batch_size=1000, fields=None, session=None):
-    offset = 0
+    after_id = 0
     while True:
         query_executions = get_successful_adhoc_query_executions(
             limit=batch_size,
-            offset=offset,
+            after_id=after_id,
             session=session,
         )
         LOG.info(
-            "\n--Adhoc query executions count: {}, offset: {}".format(
-                len(query_executions), offset
+            "\n--Adhoc query executions count: {}, after id: {}".format(
+                len(query_executions), after_id
             )
         )
 
@@ -155,7 +158,7 @@ def _get_adhoc_query_executions_iter(batch_size=1000, fields=None, session=None)
 
         if len(query_executions) < batch_size:
             break
-        offset += batch_size
+        after_id = query_executions[-1].id
 
 
 @with_session
@@ -191,7 +194,9 @@ def query_execution_to_es(query_execution, data_cell=None, fields=None, session=
         "environment_id": [env.id for env in engine.environments],
         "author_uid": query_execution.uid,
         "engine_id": engine_id,
-        "statement_type": lambda: get_table_statement_type(query_execution.query),
+        "statement_type": lambda: get_query_analysis(
+            query_execution.query, language=(engine and engine.language), persist=True
+        ).statement_types,
         "created_at": lambda: DATETIME_TO_UTC(query_execution.created_at),
         "duration": get_duration,
         "full_table_name": lambda: _get_table_names_from_query(
@@ -205,50 +210,32 @@ def query_execution_to_es(query_execution, data_cell=None, fields=None, session=
     return _get_dict_by_field(field_to_getter, fields=fields)
 
 
-@with_exception
-def _bulk_insert_query_executions():
-    index_name = ES_CONFIG["query_executions"]["index_name"]
-
-    for query_execution in get_query_executions_iter():
-        _insert(index_name, query_execution["id"], query_execution)
+def _bulk_insert_query_executions(index_name: str = None):
+    index_name = index_name or ES_CONFIG["query_executions"]["index_name"]
+    return _bulk(index_name, _get_index_actions(get_query_executions_iter()))
 
 
 @with_exception
 def _bulk_update_query_executions(fields: Set[str] = None):
     index_name = ES_CONFIG["query_executions"]["index_name"]
+    _bulk(index_name, _get_upsert_actions(get_query_executions_iter(fields=fields)))
+
 
-    for query_execution in get_query_executions_iter(fields=fields):
-        updated_body = {"doc": query_execution, "doc_as_upsert": True}
-        _update(index_name, query_execution["id"], updated_body)
+@with_session
+def _get_query_execution_es_doc(query_execution_id, session=None):
+    query_execution = get_query_execution_by_id(query_execution_id, session=session)
+    if query_execution is None or query_execution.status != QueryExecutionStatus.DONE:
+        return None
+    data_cell = get_data_cell_by_query_execution_id(query_execution_id, session=session)
+    return query_execution_to_es(query_execution, data_cell=data_cell, session=session)
 
 
 @with_exception
 @with_session
 def update_query_execution_by_id(query_execution_id, session=None):
-    index_name = ES_CONFIG["query_executions"]["index_name"]
-
-    query_execution = get_query_execution_by_id(query_execution_id, session=session)
-    if query_execution is None or query_execution.status != QueryExecutionStatus.DONE:
-        try:
-            _delete(index_name, id=query_execution_id)
-        except Exception:
-            LOG.error("failed to delete {}. Will pass.".format(query_execution_id))
-    else:
-        data_cell = get_data_cell_by_query_execution_id(
-            query_execution_id, session=session
-        )
-        formatted_object = query_execution_to_es(
-            query_execution, data_cell=data_cell, session=session
-        )
-        try:
-            # Try to update if present
-            updated_body = {
-                "doc": formatted_object,
-                "doc_as_upsert": True,
-            }  # ES requires this format for updates
-            _update(index_name, query_execution_id, updated_body)
-        except Exception:
-            LOG.error("failed to upsert {}. Will pass.".format(query_execution_id))
+    update_es_items_by_ids(
+        ElasticsearchItem.query_executions.value, [query_execution_id], session=session
+    )
 
 
 """
@@ -258,16 +245,16 @@ def update_query_execution_by_id(query_execution_id, session=None):
 
 @with_session
 def get_query_cells_iter(batch_size=1000, fields=None, session=None):
-    offset = 0
+    after_id = 0
 
     while True:
         query_cells = get_all_query_cells(
             limit=batch_size,
-            offset=offset,
+            after_id=after_id,
             session=session,
         )
         LOG.info(
-            "\n--Query cells count: {}, offset: {}".format(len(query_cells), offset)
+            "\n--Query cells count: {}, after id: {}".format(len(query_cells), after_id)
         )
 
         for query_cell in query_cells:
@@ -278,7 +265,7 @@ def get_query_cells_iter(batch_size=1000, fields=None, session=None):
 
         if len(query_cells) < batch_size:
             break
-        offset += batch_size
+        after_id = query_cells[-1].id
 
 
 @with_session
@@ -298,7 +285,9 @@ def query_cell_to_es(query_cell, fields=None, session=None):
         "environment_id": datadoc and datadoc.environment_id,
         "author_uid": datadoc and datadoc.owner_uid,
         "engine_id": engine_id,
-        "statement_type": lambda: get_table_statement_type(query),
+        "statement_type": lambda: get_query_analysis(
+            query, language=(engine and engine.language), persist=True
+        ).statement_types,
         "created_at": lambda: DATETIME_TO_UTC(query_cell.created_at),
         "full_table_name": lambda: _get_table_names_from_query(
             query, language=(engine and engine.language)
@@ -311,46 +300,31 @@ def query_cell_to_es(query_cell, fields=None, session=None):
     return _get_dict_by_field(field_to_getter, fields=fields)
 
 
-@with_exception
-def _bulk_insert_query_cells():
-    index_name = ES_CONFIG["query_cells"]["index_name"]
-
-    for query_cell in get_query_cells_iter():
-        _insert(index_name, query_cell["id"], query_cell)
+def _bulk_insert_query_cells(index_name: str = None):
+    index_name = index_name or ES_CONFIG["query_cells"]["index_name"]
+    return _bulk(index_name, _get_index_actions(get_query_cells_iter()))
 
 
 @with_exception
 def _bulk_update_query_cells(fields: Set[str] = None):
     index_name = ES_CONFIG["query_cells"]["index_name"]
-
-    for query_cell in get_query_cells_iter(fields=fields):
-        updated_body = {"doc": query_cell, "doc_as_upsert": True}
-        _update(index_name, query_cell["id"], updated_body)
+    _bulk(index_name, _get_upsert_actions(get_query_cells_iter(fields=fields)))
 
 
-@with_exception
 @with_session
-def update_query_cell_by_id(query_cell_id, session=None):
-    index_name = ES_CONFIG["query_cells"]["index_name"]
-
+def _get_query_cell_es_doc(query_cell_id, session=None):
     query_cell = get_unarchived_query_cell_by_id(query_cell_id, session=session)
     if query_cell is None:
-        try:
-            _delete(index_name, id=query_cell_id)
-        except Exception:
-            LOG.error("failed to delete {}. Will pass.".format(query_cell_id))
-    else:
-        formatted_object = query_cell_to_es(query_cell, session=session)
-        try:
-            # Try to update if present
-            updated_body = {
-                "doc": formatted_object,
-                "doc_as_upsert": True,
-            }  # ES requires this format for updates
-            _update(index_name, query_cell_id, updated_body)
+        return None
+    return query_cell_to_es(query_cell, session=session)
 
-        except Exception:
-            LOG.error("failed to upsert {}. Will pass.".format(query_cell_id))
+
+@with_exception
+@with_session
+def update_query_cell_by_id(query_cell_id, session=None):
+    update_es_items_by_ids(
+        ElasticsearchItem.query_cells.value, [query_cell_id], session=session
+    )
 
 
 def get_sample_query_cells_by_table_name(
@@ -399,15 +373,17 @@ def get_sample_query_cells_by_table_name(
 
 @with_session
 def get_datadocs_iter(batch_size=5000, fields=None, session=None):
-    offset = 0
+    after_id = 0
 
     while True:
         data_docs = get_all_data_docs(
             limit=batch_size,
-            offset=offset,
+            after_id=after_id,
             session=session,
         )
-        LOG.info("\n--Datadocs count: {}, offset: {}".format(len(data_docs), offset))
+        LOG.info(
+            "\n--Datadocs count: {}, after id: {}".format(len(data_docs), after_id)
+        )
 
         for data_doc in data_docs:
             expand_datadoc = datadocs_to_es(data_doc, fields=fields, session=session)
@@ -415,7 +391,7 @@ def get_datadocs_iter(batch_size=5000, fields=None, session=None):
 
         if len(data_docs) < batch_size:
             break
-        offset += batch_size
+        after_id = data_docs[-1].id
 
 
 def get_joined_cells(datadoc):
@@ -451,45 +427,29 @@ def datadocs_to_es(datadoc, fields=None, session=None):
     return _get_dict_by_field(field_to_getter, fields=fields)
 
 
-@with_exception
-def _bulk_insert_datadocs():
-    index_name = ES_CONFIG["datadocs"]["index_name"]
-
-    for datadoc in get_datadocs_iter():
-        _insert(index_name, datadoc["id"], datadoc)
+def _bulk_insert_datadocs(index_name: str = None):
+    index_name = index_name or ES_CONFIG["datadocs"]["index_name"]
+    return _bulk(index_name, _get_index_actions(get_datadocs_iter()))
 
 
 @with_exception
 def _bulk_update_datadocs(fields: Set[str] = None):
     index_name = ES_CONFIG["datadocs"]["index_name"]
+    _bulk(index_name, _get_upsert_actions(get_datadocs_iter(fields=fields)))
 
-    for datadoc in get_datadocs_iter(fields=fields):
-        updated_body = {"doc": datadoc, "doc_as_upsert": True}
-        _update(index_name, datadoc["id"], updated_body)
+
+@with_session
+def _get_data_doc_es_doc(doc_id, session=None):
+    doc = get_data_doc_by_id(doc_id, session=session)
+    if doc is None or doc.archived:
+        return None
+    return datadocs_to_es(doc, session=session)
 
 
 @with_exception
 @with_session
 def update_data_doc_by_id(doc_id, session=None):
-    index_name = ES_CONFIG["datadocs"]["index_name"]
-
-    doc = get_data_doc_by_id(doc_id, session=session)
-    if doc is None or doc.archived:
-        try:
-            _delete(index_name, id=doc_id)
-        except Exception:
-            LOG.error("failed to delete {}. Will pass.".format(doc_id))
-    else:
-        formatted_object = datadocs_to_es(doc, session=session)
-        try:
-            # Try to update if present
-            updated_body = {
-                "doc": formatted_object,
-                "doc_as_upsert": True,
-            }  # ES requires this format for updates
-            _update(index_name, doc_id, updated_body)
-        except Exception:
-            LOG.error("failed to upsert {}. Will pass.".format(doc_id))
+    update_es_items_by_ids(ElasticsearchItem.datadocs.value, [doc_id], session=session)
 
 
 """
@@ -499,23 +459,33 @@ def update_data_doc_by_id(doc_id, session=None):
 
 @with_session
 def get_tables_iter(batch_size=5000, fields=None, session=None):
-    offset = 0
+    after_id = 0
+    need_weight = fields is None or bool(TABLE_WEIGHT_FIELDS.intersection(fields))
 
     while True:
-        tables = get_all_table(
+        tables = get_tables_with_es_fields(
+            after_id=after_id,
             limit=batch_size,
-            offset=offset,
             session=session,
         )
-        LOG.info("\n--Table count: {}, offset: {}".format(len(tables), offset))
+        LOG.info("\n--Table count: {}, after id: {}".format(len(tables), after_id))
 
+        weights = get_table_weights(tables, session=session) if need_weight else {}
         for table in tables:
-            expand_table = table_to_es(table, fields=fields, session=session)
+            expand_table = table_to_es(
+                table, fields=fields, weight=weights.get(table.id), session=session
+            )
             yield expand_table
 
         if len(tables) < batch_size:
             break
-        offset += batch_size
+        after_id = tables[-1].id
+
+
+def _compute_table_weight(num_samples: int, num_impressions: int, boost_score) -> int:
+    # Samples worth 10x as much as impression
+    # Log the score to flatten the score distrution (since its power law distribution)
+    return int(math.log2(((num_impressions + num_samples * 10) + 1) + boost_score))
 
 
 @with_session
@@ -534,21 +504,51 @@ def get_table_weight(table_id: int, session=None) -> int:
         int -- The integer weight
     """
     num_samples = get_table_query_samples_count(table_id, session=session)
-    num_impressions = get_viewers_count_by_item_after_date(
+    num_impressions = get_viewers_count_by_items_after_date(
         ImpressionItemType.DATA_TABLE,
-        table_id,
+        [table_id],
         get_last_impressions_date(),
         session=session,
-    )
+    ).get(table_id, 0)
     boost_score = get_table_by_id(table_id, session=session).boost_score
+    return _compute_table_weight(num_samples, num_impressions, boost_score)
 
-    # Samples worth 10x as much as impression
-    # Log the score to flatten the score distrution (since its power law distribution)
-    return int(math.log2(((num_impressions + num_samples * 10) + 1) + boost_score))
+
+@with_session
+def get_table_weights(tables, session=None) -> Dict[int, int]:
+    """Same as get_table_weight for a batch of tables, with one query
+       for all the sample counts and one for all the impression counts
+
+    Arguments:
+        tables {List[DataTable]} -- The tables to weight
+
+    Returns:
+        Dict[int, int] -- Weight by table id
+    """
+    if len(tables) == 0:
+        return {}
+
+    table_ids = [table.id for table in tables]
+    samples_count = get_tables_query_samples_count(table_ids, session=session)
+    impressions_count = get_viewers_count_by_items_after_date(
+        ImpressionItemType.DATA_TABLE,
+        table_ids,
+        get_last_impressions_date(),
+        session=session,
+    )
+    return {
+        table.id: _compute_table_weight(
+            samples_count.get(table.id, 0),
+            impressions_count.get(table.id, 0),
+            table.boost_score,
+        )
+        for table in tables
+    }
 
 
 @with_session
-def table_to_es(table, fields=None, session=None):
+def table_to_es(table, fields=None, weight=None, session=None):
+    """weight can be passed if it is already computed, see get_table_weights"""
     schema = table.data_schema
     schema_name = schema.name
     table_name = table.name
@@ -574,8 +574,6 @@ def table_to_es(table, fields=None, session=None):
             richtext_to_plaintext(d.description, escape=True) for d in data_elements
         ]
 
-    weight = None
-
     def compute_weight():
         nonlocal weight
         if weight is None:
@@ -615,47 +613,28 @@ def table_to_es(table, fields=None, session=None):
     return _get_dict_by_field(field_to_getter, fields=fields)
 
 
-def _bulk_insert_tables():
-    index_name = ES_CONFIG["tables"]["index_name"]
-
-    for table in get_tables_iter():
-        _insert(index_name, table["id"], table)
+def _bulk_insert_tables(index_name: str = None):
+    index_name = index_name or ES_CONFIG["tables"]["index_name"]
+    return _bulk(index_name, _get_index_actions(get_tables_iter()))
 
 
 def _bulk_update_tables(fields: Set[str] = None):
     index_name = ES_CONFIG["tables"]["index_name"]
-
-    for table in get_tables_iter(fields=fields):
-        updated_body = {"doc": table, "doc_as_upsert": True}
-        _update(index_name, table["id"], updated_body)
+    _bulk(index_name, _get_upsert_actions(get_tables_iter(fields=fields)))
 
 
 @with_exception
 @with_session
 def update_table_by_id(table_id, update_vector_store=False, session=None):
-    index_name = ES_CONFIG["tables"]["index_name"]
+    update_es_items_by_ids(ElasticsearchItem.tables.value, [table_id], session=session)
 
-    table = get_table_by_id(table_id, session=session)
-    if table is None:
-        delete_es_table_by_id(table_id)
-    else:
-        formatted_object = table_to_es(table, session=session)
-        try:
-            # Try to update if present
-            updated_body = {
-                "doc": formatted_object,
-                "doc_as_upsert": True,
-            }  # ES requires this format for updates
-            _update(index_name, table_id, updated_body)
+    # update it in vector store as well
+    if update_vector_store:
+        table = get_table_by_id(table_id, session=session)
+        if table is not None:
+            from logic.vector_store import record_table
 
-            # update it in vector store as well
-            if update_vector_store:
-                from logic.vector_store import record_table
-
-                record_table(table=table, session=session)
-        except Exception:
-            # Otherwise insert as new
-            LOG.error("failed to upsert {}. Will pass.".format(table_id))
+            record_table(table=table, session=session)
 
 
 def delete_es_table_by_id(
@@ -664,6 +643,7 @@ def delete_es_table_by_id(
     index_name = ES_CONFIG["tables"]["index_name"]
     try:
         _delete(index_name, id=table_id)
+        record_elasticsearch_rebuild_items(ElasticsearchItem.tables.value, [table_id])
 
         # delete it from vector store as well
         from logic.vector_store import delete_table_doc
@@ -736,45 +716,36 @@ def get_users_iter(batch_size=5000, session=None):
         offset += batch_size
 
 
-def _bulk_insert_users():
-    index_name = ES_CONFIG["users"]["index_name"]
-
-    for user in get_users_iter():
-        expanded_user = user_to_es(user, fields=None)
-        _insert(index_name, expanded_user["id"], expanded_user)
+def _bulk_insert_users(index_name: str = None):
+    index_name = index_name or ES_CONFIG["users"]["index_name"]
+    return _bulk(
+        index_name,
+        _get_index_actions(user_to_es(user, fields=None) for user in get_users_iter()),
+    )
 
 
 def _bulk_update_users(fields: Set[str] = None):
     index_name = ES_CONFIG["users"]["index_name"]
+    _bulk(
+        index_name,
+        _get_upsert_actions(
+            user_to_es(user, fields=fields) for user in get_users_iter()
+        ),
+    )
 
-    for user in get_users_iter():
-        expanded_user = user_to_es(user, fields=fields)
-        updated_body = {"doc": expanded_user, "doc_as_upsert": True}
-        _update(index_name, expanded_user["id"], updated_body)
+
+@with_session
+def _get_user_es_doc(uid, session=None):
+    user = User.get(id=uid, session=session)
+    if user is None:
+        return None
+    return user_to_es(user, session=session)
 
 
 @with_exception
 @with_session
 def update_user_by_id(uid, session=None):
-    index_name = ES_CONFIG["users"]["index_name"]
-
-    user = User.get(id=uid, session=session)
-    if user is None:
-        try:
-            _delete(index_name, id=uid)
-        except Exception:
-            LOG.error("failed to delete {}. Will pass.".format(uid))
-    else:
-        formatted_object = user_to_es(user, session=session)
-        try:
-            # Try to update if present
-            updated_body = {
-                "doc": formatted_object,
-                "doc_as_upsert": True,
-            }  # ES requires this format for updates
-            _update(index_name, uid, updated_body)
-        except Exception:
-            LOG.error("failed to upsert {}. Will pass.".format(uid))
+    update_es_items_by_ids(ElasticsearchItem.users.value, [uid], session=session)
 
 
 """
@@ -834,43 +805,92 @@ def board_to_es(board, fields=None, session=None):
     return _get_dict_by_field(field_to_getter, fields=fields)
 
 
-def _bulk_insert_boards():
-    index_name = ES_CONFIG["boards"]["index_name"]
-
-    for board in get_boards_iter():
-        _insert(index_name, board["id"], board)
+def _bulk_insert_boards(index_name: str = None):
+    index_name = index_name or ES_CONFIG["boards"]["index_name"]
+    return _bulk(index_name, _get_index_actions(get_boards_iter()))
 
 
 def _bulk_update_boards(fields: Set[str] = None):
     index_name = ES_CONFIG["boards"]["index_name"]
+    _bulk(index_name, _get_upsert_actions(get_boards_iter(fields=fields)))
+
 
-    for board in get_boards_iter(fields=fields):
-        updated_body = {"doc": board, "doc_as_upsert": True}
-        _update(index_name, board["id"], updated_body)
+@with_session
+def _get_board_es_doc(board_id, session=None):
+    board = Board.get(id=board_id, session=session)
+    if board is None or board.deleted_at is not None:
+        return None
+    return board_to_es(board, session=session)
 
 
 @with_exception
 @with_session
 def update_board_by_id(board_id, session=None):
-    index_name = ES_CONFIG["boards"]["index_name"]
+    update_es_items_by_ids(ElasticsearchItem.boards.value, [board_id], session=session)
 
-    board = Board.get(id=board_id, session=session)
-    if board is None or board.deleted_at is not None:
-        try:
-            _delete(index_name, id=board_id)
-        except Exception:
-            LOG.error("failed to delete board {}. Will pass.".format(board_id))
+
+"""
+    BATCHED UPDATES
+"""
+
+
+@with_session
+def _get_table_es_docs(table_ids: List[int], session=None) -> Dict[int, Dict]:
+    tables = get_tables_with_es_fields(
+        table_ids=table_ids, limit=len(table_ids), session=session
+    )
+    weights = get_table_weights(tables, session=session)
+    return {
+        table.id: table_to_es(table, weight=weights[table.id], session=session)
+        for table in tables
+    }
+
+
+_get_es_doc_by_item_type = {
+    ElasticsearchItem.query_executions.value: _get_query_execution_es_doc,
+    ElasticsearchItem.query_cells.value: _get_query_cell_es_doc,
+    ElasticsearchItem.datadocs.value: _get_data_doc_es_doc,
+    ElasticsearchItem.users.value: _get_user_es_doc,
+    ElasticsearchItem.boards.value: _get_board_es_doc,
+}
+
+
+@with_session
+def update_es_items_by_ids(item_type: str, item_ids: List[int], session=None):
+    """Update the documents of the items with a single bulk request.
+       Documents of items that are deleted, or should no longer be
+       searchable, are removed from the index.
+
+    Arguments:
+        item_type {str} -- One of ElasticsearchItem
+        item_ids {List[int]} -- ids of the items to update
+
+    Returns:
+        Tuple[int, List[Dict]] -- Number of successful actions and the failed items
+    """
+    if item_type == ElasticsearchItem.tables.value:
+        docs_by_id = _get_table_es_docs(item_ids, session=session)
     else:
-        formatted_object = board_to_es(board, session=session)
-        try:
-            # Try to update if present
-            updated_body = {
-                "doc": formatted_object,
-                "doc_as_upsert": True,
-            }  # ES requires this format for updates
-            _update(index_name, board_id, updated_body)
-        except Exception:
-            LOG.error("failed to upsert board {}. Will pass.".format(board))
+        get_es_doc = _get_es_doc_by_item_type[item_type]
+        docs_by_id = {
+            item_id: get_es_doc(item_id, session=session) for item_id in item_ids
+        }
+
+    deleted_ids = [item_id for item_id in item_ids if docs_by_id.get(item_id) is None]
+    actions = chain(
+        _get_upsert_actions(doc for doc in docs_by_id.values() if doc is not None),
+        _get_delete_actions(deleted_ids),
+    )
+    result = _bulk(ES_CONFIG[item_type]["index_name"], actions)
+    record_elasticsearch_rebuild_items(item_type, item_ids)
+
+    if item_type == ElasticsearchItem.tables.value and len(deleted_ids):
+        from logic.vector_store import delete_table_doc
+
+        for table_id in deleted_ids:
+            delete_table_doc(table_id)
+
+    return result
 
 
 """
@@ -878,60 +898,188 @@ def update_board_by_id(board_id, session=None):
 """
 
 
-def _insert(index_name, id, content):
-    get_hosted_es().index(index=index_name, id=id, body=content)
-
-
 def _delete(index_name, id):
     get_hosted_es().delete(index=index_name, id=id)
 
 
-def _update(index_name, id, content):
-    get_hosted_es().update(index=index_name, id=id, body=content)
+def _get_index_actions(docs: Iterable[Dict]) -> Iterator[Dict]:
+    return ({"_id": doc["id"], "_source": doc} for doc in docs)
+
+
+def _get_upsert_actions(docs: Iterable[Dict]) -> Iterator[Dict]:
+    # ES requires this format for updates
+    return (
+        {"_op_type": "update", "_id": doc["id"], "doc": doc, "doc_as_upsert": True}
+        for doc in docs
+    )
+
+
+def _get_delete_actions(ids: Iterable[int]) -> Iterator[Dict]:
+    return ({"_op_type": "delete", "_id": id} for id in ids)
+
+
+def _is_missing_delete(item: Dict) -> bool:
+    # Deleting a document that is not in the index is not an error
+    return item.get("delete", {}).get("status") == 404
+
+
+def _bulk(index_name: str, actions: Iterable[Dict]) -> Tuple[int, List[Dict]]:
+    """Send the actions to the index with _bulk requests, which are
+       split by ES_BULK_CHUNK_SIZE and ES_BULK_MAX_CHUNK_BYTES and sent
+       by ES_BULK_THREAD_COUNT threads. Failed documents do not stop the bulk.
+
+    Arguments:
+        index_name {str} -- The index to send the actions to
+        actions {Iterable[Dict]} -- Bulk actions, see _get_index_actions and _get_upsert_actions
+
+    Returns:
+        Tuple[int, List[Dict]] -- Number of successful actions and the failed items
+    """
+    success_count = 0
+    errors = []
+    for ok, item in parallel_bulk(
+        get_hosted_es(),
+        actions,
+        index=index_name,
+        thread_count=QuerybookSettings.ES_BULK_THREAD_COUNT,
+        chunk_size=QuerybookSettings.ES_BULK_CHUNK_SIZE,
+        max_chunk_bytes=QuerybookSettings.ES_BULK_MAX_CHUNK_BYTES,
+        raise_on_error=False,
+        raise_on_exception=False,
+    ):
+        if ok or _is_missing_delete(item):
+            success_count += 1
+        else:
+            if len(errors) < MAX_LOGGED_BULK_ERRORS:
+                LOG.error(f"Bulk request to {index_name} failed for {item}")
+            errors.append(item)
+
+    LOG.info(
+        f"Bulk request to {index_name} done, {success_count} succeeded, {len(errors)} failed"
+    )
+    return success_count, errors
 
 
-def _bulk_insert_index(type_name: str):
+def _bulk_insert_index(type_name: str, index_name: str):
+    """Insert all documents of the type into the index,
+    raises if any of them failed to be inserted"""
+    errors = []
     if type_name == "query_executions":
         LOG.info("Inserting query executions")
-        _bulk_insert_query_executions()
+        _, errors = _bulk_insert_query_executions(index_name)
     elif type_name == "query_cells":
         LOG.info("Inserting query cells")
-        _bulk_insert_query_cells()
+        _, errors = _bulk_insert_query_cells(index_name)
     elif type_name == "datadocs":
         LOG.info("Inserting datadocs")
-        _bulk_insert_datadocs()
+        _, errors = _bulk_insert_datadocs(index_name)
     elif type_name == "tables":
         LOG.info("Inserting tables")
-        _bulk_insert_tables()
+        _, errors = _bulk_insert_tables(index_name)
     elif type_name == "users":
         LOG.info("Inserting users")
-        _bulk_insert_users()
+        _, errors = _bulk_insert_users(index_name)
     elif type_name == "boards":
         LOG.info("Inserting boards")
-        _bulk_insert_boards()
+        _, errors = _bulk_insert_boards(index_name)
+
+    if errors:
+        raise Exception(
+            f"Failed to insert {len(errors)} {type_name} documents into {index_name}"
+        )
+
+
+# The index_name of each config is an alias to a versioned index named
+# {index_name}_{timestamp}, so that indices can be rebuilt in the background
+# and swapped in atomically while search keeps using the previous one.
+def _get_alias_indices(alias: str) -> List[str]:
+    """Get the indices behind the alias. If the alias is actually an index,
+    which is the case for indices created before aliases were used, it is
+    returned instead.
+    """
+    es = get_hosted_es()
+    if es.indices.exists_alias(name=alias):
+        return list(es.indices.get_alias(name=alias).keys())
+    if es.indices.exists(index=alias):
+        return [alias]
+    return []
+
+
+def _build_index(es_config) -> str:
+    """Create a new versioned index for the config and insert all documents,
+       with replicas and refreshes disabled until it is loaded
+
+    Returns:
+        str -- Name of the new index
+    """
+    es = get_hosted_es()
+    index_name = "{}_{}".format(es_config["index_name"], int(time.time() * 1000))
+
+    body = copy.deepcopy(es_config["mappings"])
+    settings = body.setdefault("settings", {})
+    # None resets the settings to the cluster defaults
+    loaded_settings = {
+        "number_of_replicas": settings.get("number_of_replicas"),
+        "refresh_interval": settings.get("refresh_interval"),
+    }
+    settings.update({"number_of_replicas": 0, "refresh_interval": "-1"})
+
+    LOG.info(f"Building index {index_name}")
+    es.indices.create(index_name, body)
+    try:
+        _bulk_insert_index(es_config["type_name"], index_name)
+        es.indices.put_settings(body={"index": loaded_settings}, index=index_name)
+        es.indices.refresh(index=index_name)
+    except Exception:
+        es.indices.delete(index=index_name)
+        raise
+    return index_name
+
+
+def _swap_alias(alias: str, index_name: str):
+    """Atomically point the alias to index_name and delete the indices it pointed to"""
+    actions = [
+        {"remove_index": {"index": old_index_name}}
+        for old_index_name in _get_alias_indices(alias)
+    ]
+    actions.append({"add": {"index": index_name, "alias": alias}})
+    get_hosted_es().indices.update_aliases(body={"actions": actions})
+    LOG.info(f"Alias {alias} now points to {index_name}")
+
+
+def _rebuild_index(es_config):
+    """Build a new index for the config and swap it in. Items synced while
+    it is being built only update the previous index, so they are synced
+    again once the new index is swapped in.
+    """
+    type_name = es_config["type_name"]
+    start_elasticsearch_rebuild(type_name)
+    try:
+        _swap_alias(es_config["index_name"], _build_index(es_config))
+    except Exception:
+        finish_elasticsearch_rebuild(type_name, replay=False)
+        raise
+    finish_elasticsearch_rebuild(type_name, replay=True)
 
 
 def create_indices(*config_names):
     es_configs = get_es_config_by_name(*config_names)
     for es_config in es_configs:
-        get_hosted_es().indices.create(es_config["index_name"], es_config["mappings"])
-        _bulk_insert_index(es_config["type_name"])
+        _rebuild_index(es_config)
 
 
 def create_indices_if_not_exist(*config_names):
     es_configs = get_es_config_by_name(*config_names)
     for es_config in es_configs:
         if not get_hosted_es().indices.exists(index=es_config["index_name"]):
-            get_hosted_es().indices.create(
-                es_config["index_name"], es_config["mappings"]
-            )
-            _bulk_insert_index(es_config["type_name"])
+            _rebuild_index(es_config)
 
 
 def delete_indices(*config_names):
     es_configs = get_es_config_by_name(*config_names)
     for es_config in es_configs:
-        get_hosted_es().indices.delete(es_config["index_name"])
+        for index_name in _get_alias_indices(es_config["index_name"]):
+            get_hosted_es().indices.delete(index_name)
 
 
 def get_es_config_by_name(*config_names):
@@ -941,8 +1089,9 @@ def get_es_config_by_name(*config_names):
 
 
 def recreate_indices(*config_names):
-    delete_indices(*config_names)
-    create_indices_if_not_exist(*config_names)
+    """Rebuild the indices in the background, search keeps using
+    the current indices until the new ones are swapped in"""
+    create_indices(*config_names)
 
 
 def update_indices(*config_names):
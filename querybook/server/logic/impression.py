@@ -1,9 +1,11 @@
-from datetime import datetime, timedelta
-from sqlalchemy.sql import func
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List
+from sqlalchemy.sql import distinct, func
 
 from app.db import with_session
-from const.impression import IMPRESSION_RETENTION_DELTA
-from models.impression import Impression
+from const.impression import IMPRESSION_RETENTION_DELTA, ImpressionItemType
+from models.impression import Impression, ImpressionDailyRollup
 
 
 """
@@ -26,6 +28,95 @@ def create_impression(item_id, item_type, uid, commit=True, session=None):
     return impression
 
 
+@with_session
+def create_impressions(impressions: List[Dict], commit=True, session=None):
+    """Insert impressions in bulk, and update the daily
+       rollups of their items
+
+    Arguments:
+        impressions {List[Dict]} -- Dicts of item_id, item_type, uid and created_at
+    """
+    if not impressions:
+        return
+
+    # The rollups are updated first, since they are diffed against
+    # the impressions inserted before
+    update_impression_daily_rollups(impressions, session=session)
+    session.bulk_insert_mappings(Impression, impressions)
+
+    if commit:
+        session.commit()
+    else:
+        session.flush()
+
+
+@with_session
+def update_impression_daily_rollups(impressions: List[Dict], session=None):
+    """Add the given impressions, which must not be inserted yet, to the
+       rollups of their items and days. Only the days of the given impressions
+       are updated, viewers are counted once per item and day.
+
+    Arguments:
+        impressions {List[Dict]} -- Dicts of item_id, item_type, uid and created_at
+    """
+    impressions_by_type = defaultdict(list)
+    for impression in impressions:
+        impressions_by_type[impression["item_type"]].append(impression)
+
+    for item_type, type_impressions in impressions_by_type.items():
+        views_count = defaultdict(int)
+        viewers = defaultdict(set)
+        for impression in type_impressions:
+            key = (impression["item_id"], impression["created_at"].date())
+            views_count[key] += 1
+            viewers[key].add(impression["uid"])
+
+        item_ids = list(set(item_id for item_id, _ in views_count))
+        uids = set(impression["uid"] for impression in type_impressions)
+        days = set(day for _, day in views_count)
+        start_datetime = datetime.combine(min(days), datetime.min.time())
+        end_datetime = datetime.combine(
+            max(days) + timedelta(days=1), datetime.min.time()
+        )
+
+        # Viewers who already viewed the items on these days
+        impression_date = func.date(Impression.created_at)
+        for item_id, day, uid in (
+            session.query(Impression.item_id, impression_date, Impression.uid)
+            .filter(Impression.item_type == item_type)
+            .filter(Impression.item_id.in_(item_ids))
+            .filter(Impression.uid.in_(list(uids)))
+            .filter(Impression.created_at >= start_datetime)
+            .filter(Impression.created_at < end_datetime)
+            .distinct()
+        ):
+            if isinstance(day, str):
+                day = date.fromisoformat(day)
+            viewers.get((item_id, day), set()).discard(uid)
+
+        rollups = {
+            (rollup.item_id, rollup.date): rollup
+            for rollup in session.query(ImpressionDailyRollup)
+            .filter(ImpressionDailyRollup.item_type == item_type)
+            .filter(ImpressionDailyRollup.item_id.in_(item_ids))
+            .filter(ImpressionDailyRollup.date.in_(list(days)))
+        }
+        for (item_id, day), count in views_count.items():
+            rollup = rollups.get((item_id, day))
+            if rollup is None:
+                rollup = ImpressionDailyRollup(
+                    item_id=item_id,
+                    item_type=item_type,
+                    date=day,
+                    viewers_count=0,
+                    views_count=0,
+                )
+                session.add(rollup)
+            rollup.viewers_count += len(viewers[(item_id, day)])
+            rollup.views_count += count
+    session.flush()
+
+
 @with_session
 def get_impressions_by_date(date, session=None):
     impressions = (
@@ -104,14 +195,38 @@ def get_viewers_count_by_item_after_date(item_type, item_id, after_date, session
     return count
 
 
+@with_session
+def get_viewers_count_by_items_after_date(
+    item_type: ImpressionItemType,
+    item_ids: Iterable[int],
+    after_date: date,
+    session=None,
+) -> Dict[int, int]:
+    """Batch version of get_viewers_count_by_item_after_date, items
+       without viewers are not in the returned dict
+
+    Returns:
+        Dict[int, int] -- Distinct viewers count by item id
+    """
+    counts = (
+        session.query(Impression.item_id, func.count(distinct(Impression.uid)))
+        .filter(Impression.item_type == item_type)
+        .filter(Impression.item_id.in_(item_ids))
+        .filter(Impression.created_at >= after_date)
+        .group_by(Impression.item_id)
+        .all()
+    )
+    return {item_id: count for item_id, count in counts}
+
+
 @with_session
 def get_item_timeseries_after_date(item_type, item_id, after_date, session=None):
     return (
-        session.query(func.count(Impression.uid), func.date(Impression.created_at))
-        .distinct(Impression.uid)
-        .filter_by(item_type=item_type, item_id=item_id)
-        .filter(Impression.created_at >= after_date)
-        .group_by(func.date(Impression.created_at))
+        session.query(ImpressionDailyRollup.views_count, ImpressionDailyRollup.date)
+        .filter(ImpressionDailyRollup.item_type == item_type)
+        .filter(ImpressionDailyRollup.item_id == item_id)
+        .filter(ImpressionDailyRollup.date >= after_date)
+        .order_by(ImpressionDailyRollup.date)
         .all()
     )
 
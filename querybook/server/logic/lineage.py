@@ -1,5 +1,5 @@
 from app.db import with_session
-from lib.query_analysis.lineage import process_query
+from lib.query_analysis.analysis import get_query_analysis
 from models.metastore import (
     DataJobMetadata,
     TableLineage,
@@ -15,7 +15,9 @@ def create_table_lineage_from_metadata(
     if job_metadata is None:
         return
 
-    _, lineage_per_statement = process_query(job_metadata.query_text, query_language)
+    lineage_per_statement = get_query_analysis(
+        job_metadata.query_text, query_language
+    ).lineage_per_statement
 
     lineage_ids = []
     for statement_lineage in lineage_per_statement:
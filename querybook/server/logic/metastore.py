@@ -1,4 +1,6 @@
+from collections import defaultdict
 import datetime
+from typing import Dict, List, Set, Tuple
 
 from app.db import with_session
 from const.elasticsearch import ElasticsearchItem
@@ -22,8 +24,8 @@ from models.metastore import (
 )
 from models.query_execution import QueryExecution
 from sqlalchemy import and_, func
-from sqlalchemy.orm import aliased
-from tasks.sync_elasticsearch import sync_elasticsearch
+from sqlalchemy.orm import aliased, joinedload, selectinload
+from tasks.sync_elasticsearch import mark_elasticsearch_items_dirty
 
 LOG = get_logger(__file__)
 
@@ -148,9 +150,13 @@ def delete_schema(id=None, commit=True, session=None):
         session.flush()
 
 
-def get_all_table(offset=0, limit=100, session=None):
-    """Get all the tables."""
-    return session.query(DataTable).offset(offset).limit(limit).all()
+def get_all_table(offset=0, limit=100, after_id=None, session=None):
+    """Get all the tables ordered by id. Pass the last id of the
+    previous page as after_id to page without scanning the offset rows."""
+    query = session.query(DataTable)
+    if after_id is not None:
+        query = query.filter(DataTable.id > after_id)
+    return query.order_by(DataTable.id).offset(offset).limit(limit).all()
 
 
 @with_session
@@ -184,14 +190,23 @@ def get_table_by_schema_id(schema_id, session=None):
     return session.query(DataTable).filter(DataTable.schema_id == schema_id).all()
 
 
+@with_session
+def get_table_change_signals_by_schema_id(schema_id, session=None) -> Dict[str, str]:
+    """Get the change signal of each table of the schema by table name"""
+    return dict(
+        session.query(DataTable.name, DataTable.change_signal).filter(
+            DataTable.schema_id == schema_id
+        )
+    )
+
+
 @with_session
 def get_table_by_id(table_id, session=None):
     """Get an table by its id"""
     return session.query(DataTable).get(table_id)
 
 
-@with_session
-def create_table(
+def _get_table_fields(
     name=None,
     type=None,
     owner=None,
@@ -204,11 +219,10 @@ def create_table(
     schema_id=None,
     golden=False,
     boost_score=1,
-    commit=True,
-    session=None,
+    change_signal=None,
 ):
-    """Create a new table row given settings."""
-    fields_to_update = {
+    """Get the DataTable fields of the create_table arguments"""
+    return {
         "name": name,
         "type": type,
         "owner": owner,
@@ -229,8 +243,45 @@ def create_table(
         "schema_id": schema_id,
         "golden": golden,
         "boost_score": boost_score,
+        "change_signal": change_signal,
     }
 
+
+@with_session
+def create_table(
+    name=None,
+    type=None,
+    owner=None,
+    table_created_at=None,
+    table_updated_by=None,
+    table_updated_at=None,
+    data_size_bytes=None,
+    location=None,
+    column_count=None,
+    schema_id=None,
+    golden=False,
+    boost_score=1,
+    change_signal=None,
+    commit=True,
+    session=None,
+):
+    """Create a new table row given settings."""
+    fields_to_update = _get_table_fields(
+        name=name,
+        type=type,
+        owner=owner,
+        table_created_at=table_created_at,
+        table_updated_by=table_updated_by,
+        table_updated_at=table_updated_at,
+        data_size_bytes=data_size_bytes,
+        location=location,
+        column_count=column_count,
+        schema_id=schema_id,
+        golden=golden,
+        boost_score=boost_score,
+        change_signal=change_signal,
+    )
+
     table = get_table_by_schema_id_and_name(schema_id, name, session=session)
     should_update_es = True
     if not table:
@@ -274,6 +325,37 @@ def update_table(id, golden=None, score=None, commit=True, session=None):
     return table
 
 
+def _get_table_information_fields(
+    description=None,
+    latest_partitions=None,
+    earliest_partitions=None,
+    hive_metastore_description=None,
+    partition_keys=[],
+    custom_properties=None,
+    table_links=None,
+):
+    """Get the DataTableInformation fields of the create_table_information arguments"""
+    column_infomation = None
+    if partition_keys:
+        column_infomation = {"partition_keys": partition_keys}
+
+    fields = {
+        "latest_partitions": latest_partitions,
+        "earliest_partitions": earliest_partitions,
+        "hive_metastore_description": hive_metastore_description,
+        "column_info": column_infomation,
+        "custom_properties": custom_properties,
+        "table_links": table_links,
+    }
+
+    # The reason that we dont always set description is because it's optional.
+    # Otherwise, for those existing metastores which dont sync description
+    # to querybook, it will wipe out the existing description.
+    if description is not None:
+        fields["description"] = description
+    return fields
+
+
 @with_session
 def create_table_information(
     data_table_id=None,
@@ -291,27 +373,19 @@ def create_table_information(
         data_table_id, session=session
     )
 
-    column_infomation = None
-    if partition_keys:
-        column_infomation = {"partition_keys": partition_keys}
-
     new_table_information = DataTableInformation(
         data_table_id=data_table_id,
-        latest_partitions=latest_partitions,
-        earliest_partitions=earliest_partitions,
-        hive_metastore_description=hive_metastore_description,
-        column_info=column_infomation,
-        custom_properties=custom_properties,
-        table_links=table_links,
+        **_get_table_information_fields(
+            description=description,
+            latest_partitions=latest_partitions,
+            earliest_partitions=earliest_partitions,
+            hive_metastore_description=hive_metastore_description,
+            partition_keys=partition_keys,
+            custom_properties=custom_properties,
+            table_links=table_links,
+        ),
     )
 
-    # The reason that we dont add description direclty in
-    # DataTableInformation() above is because it's optional.
-    # Otherwise, for those existing metastores which dont sync description
-    # to querybook, it will wipe out the existing description.
-    if description is not None:
-        new_table_information.description = description
-
     if not table_information:
         session.add(new_table_information)
         table_information = new_table_information
@@ -361,6 +435,154 @@ def create_table_warnings(
         session.flush()
 
 
+@with_session
+def bulk_create_tables(
+    schema_id: int, tables: List[Dict], commit=True, session=None
+) -> Tuple[Dict[str, int], Dict[int, Dict[str, int]], Set[int]]:
+    """Create or update tables of the schema along with their information
+       and columns, same as create_table, create_table_information,
+       create_column and delete_column for each table. The existing rows
+       are read with one query per model and diffed in memory. New rows are
+       inserted in bulk, deleted columns are deleted with one statement and
+       only the rows that changed are updated.
+
+    Arguments:
+        schema_id {int} -- Id of the schema of the tables
+        tables {List[Dict]} -- Dicts with the create_table arguments as "table",
+                               the create_table_information arguments as "information",
+                               and a list of create_column arguments as "columns"
+
+    Returns:
+        Tuple -- The table ids by name, the column ids by table id and column name,
+                 and the ids of the tables that changed. Elasticsearch is not updated,
+                 the caller should sync the changed tables.
+    """
+    now = datetime.datetime.now()
+    table_names = [table["table"]["name"] for table in tables]
+
+    def get_db_tables():
+        return {
+            db_table.name: db_table
+            for db_table in session.query(DataTable)
+            .filter(DataTable.schema_id == schema_id)
+            .filter(DataTable.name.in_(table_names))
+        }
+
+    def get_db_columns_by_table_id():
+        db_columns_by_table_id = defaultdict(dict)
+        for db_column in session.query(DataTableColumn).filter(
+            DataTableColumn.table_id.in_(table_ids)
+        ):
+            db_columns_by_table_id[db_column.table_id][db_column.name] = db_column
+        return db_columns_by_table_id
+
+    db_tables = get_db_tables()
+    changed_table_names = set()
+    new_tables = []
+    for table in tables:
+        fields = _get_table_fields(schema_id=schema_id, **table["table"])
+        db_table = db_tables.get(fields["name"])
+        if db_table is None:
+            new_tables.append(fields)
+            changed_table_names.add(fields["name"])
+        elif update_model_fields(model=db_table, skip_if_value_none=True, **fields):
+            changed_table_names.add(db_table.name)
+
+    if new_tables:
+        session.bulk_insert_mappings(DataTable, new_tables)
+        db_tables = get_db_tables()
+    table_ids = [db_tables[name].id for name in table_names]
+    # Tables are marked as pulled from the metastore even if nothing changed
+    session.query(DataTable).filter(DataTable.id.in_(table_ids)).update(
+        {DataTable.updated_at: now}, synchronize_session=False
+    )
+
+    table_informations = {
+        information.data_table_id: information
+        for information in session.query(DataTableInformation).filter(
+            DataTableInformation.data_table_id.in_(table_ids)
+        )
+    }
+    db_columns_by_table_id = get_db_columns_by_table_id()
+
+    new_informations = []
+    new_columns = []
+    deleted_column_ids = []
+    for table in tables:
+        db_table = db_tables[table["table"]["name"]]
+
+        information_fields = _get_table_information_fields(**table["information"])
+        information = table_informations.get(db_table.id)
+        if information is None:
+            new_informations.append(
+                dict(data_table_id=db_table.id, **information_fields)
+            )
+            changed_table_names.add(db_table.name)
+        elif update_model_fields(model=information, **information_fields):
+            changed_table_names.add(db_table.name)
+
+        db_columns = db_columns_by_table_id[db_table.id]
+        columns = {column["name"]: column for column in table["columns"]}
+        for db_column in db_columns.values():
+            if db_column.name not in columns:
+                deleted_column_ids.append(db_column.id)
+                changed_table_names.add(db_table.name)
+
+        for column in columns.values():
+            db_column = db_columns.get(column["name"])
+            if db_column is None:
+                new_columns.append(
+                    {
+                        "name": column["name"],
+                        "type": column.get("type"),
+                        "comment": column.get("comment"),
+                        "description": column.get("description"),
+                        "table_id": db_table.id,
+                    }
+                )
+                changed_table_names.add(db_table.name)
+            elif update_model_fields(
+                model=db_column,
+                type=column.get("type"),
+                comment=column.get("comment") or db_column.comment,
+                description=(
+                    column["description"]
+                    if column.get("description") is not None
+                    else db_column.description
+                ),
+            ):
+                db_column.updated_at = now
+                changed_table_names.add(db_table.name)
+
+    if new_informations:
+        session.bulk_insert_mappings(DataTableInformation, new_informations)
+    if deleted_column_ids:
+        session.query(DataTableColumn).filter(
+            DataTableColumn.id.in_(deleted_column_ids)
+        ).delete(synchronize_session=False)
+    if new_columns:
+        # Nulls are rendered so that all the columns are inserted in one statement
+        session.bulk_insert_mappings(DataTableColumn, new_columns, render_nulls=True)
+    if deleted_column_ids or new_columns:
+        session.flush()
+        db_columns_by_table_id = get_db_columns_by_table_id()
+
+    # Read the ids before the commit expires the rows
+    table_ids_by_name = {name: db_tables[name].id for name in table_names}
+    column_ids_by_table_id = {
+        table_id: {name: db_column.id for name, db_column in db_columns.items()}
+        for table_id, db_columns in db_columns_by_table_id.items()
+    }
+    changed_table_ids = set(table_ids_by_name[name] for name in changed_table_names)
+
+    if commit:
+        session.commit()
+    else:
+        session.flush()
+
+    return table_ids_by_name, column_ids_by_table_id, changed_table_ids
+
+
 @with_session
 def delete_table(table_id=None, commit=True, session=None):
     table = get_table_by_id(table_id=table_id, session=session)
@@ -374,6 +596,24 @@ def delete_table(table_id=None, commit=True, session=None):
         update_es_tables_by_id(table_id)
 
 
+@with_session
+def bulk_delete_tables(table_ids: List[int], commit=True, session=None):
+    """Delete the tables with one statement, the rows that
+    reference them are deleted by the database cascades"""
+    if not table_ids:
+        return
+
+    session.query(DataTable).filter(DataTable.id.in_(table_ids)).delete(
+        synchronize_session=False
+    )
+
+    if commit:
+        session.commit()
+        mark_elasticsearch_items_dirty(ElasticsearchItem.tables.value, table_ids)
+    else:
+        session.flush()
+
+
 @with_session
 def update_table_information(
     data_table_id=None, description=None, commit=True, session=None
@@ -889,7 +1129,39 @@ def get_tables_by_query_execution_id(query_execution_id, session=None):
 
 
 def update_es_tables_by_id(id):
-    sync_elasticsearch.apply_async(args=[ElasticsearchItem.tables.value, id])
+    mark_elasticsearch_items_dirty(ElasticsearchItem.tables.value, [id])
+
+
+@with_session
+def get_tables_with_es_fields(after_id=0, limit=100, table_ids=None, session=None):
+    """Same as get_all_table with after_id, but the relationships used
+    by the elasticsearch document are loaded for the whole page at once.
+    Only the tables in table_ids are returned if it is given"""
+    query = session.query(DataTable).options(
+        joinedload(DataTable.data_schema),
+        joinedload(DataTable.information),
+        selectinload(DataTable.columns).selectinload(DataTableColumn.data_elements),
+        selectinload(DataTable.tags),
+    )
+    if table_ids is not None:
+        query = query.filter(DataTable.id.in_(table_ids))
+    return (
+        query.filter(DataTable.id > after_id).order_by(DataTable.id).limit(limit).all()
+    )
+
+
+@with_session
+def get_tables_query_samples_count(table_ids, session=None):
+    """Batch version of get_table_query_samples_count, tables
+    without samples are not in the returned dict"""
+    return dict(
+        session.query(
+            DataTableQueryExecution.table_id, func.count(DataTableQueryExecution.id)
+        )
+        .filter(DataTableQueryExecution.table_id.in_(table_ids))
+        .group_by(DataTableQueryExecution.table_id)
+        .all()
+    )
 
 
 """
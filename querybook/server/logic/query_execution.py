@@ -18,7 +18,7 @@ from models.query_execution import (
 from models.datadoc import DataCellQueryExecution, DataDocDataCell
 from models.admin import QueryEngine, QueryEngineEnvironment
 from models.environment import Environment
-from tasks.sync_elasticsearch import sync_elasticsearch
+from tasks.sync_elasticsearch import mark_elasticsearch_items_dirty
 from logic import admin as admin_logic
 
 CLEAN_UP_TIME_THRESHOLD = 20 * 60  # 20 mins
@@ -287,6 +287,30 @@ def update_statement_execution(
     return statement_execution
 
 
+@with_session
+def get_statement_execution_paths_by_query_execution_ids(
+    query_execution_ids, session=None
+):
+    """Get the result and log paths of the statements of the query executions"""
+    paths = (
+        session.query(StatementExecution.result_path, StatementExecution.log_path)
+        .filter(StatementExecution.query_execution_id.in_(query_execution_ids))
+        .all()
+    )
+    return [path for row in paths for path in row if path]
+
+
+@with_session
+def get_existing_statement_execution_ids(ids, session=None):
+    """Get the ids of the statement executions that have not been deleted"""
+    return [
+        statement_execution_id
+        for (statement_execution_id,) in session.query(StatementExecution.id).filter(
+            StatementExecution.id.in_(ids)
+        )
+    ]
+
+
 @with_session
 def get_statement_execution_by_id(id, with_query_execution=False, session=None):
     query = session.query(StatementExecution)
@@ -581,16 +605,18 @@ def clean_up_query_execution(dry_run=False, session=None):
 
 
 @with_session
-def get_successful_adhoc_query_executions(offset=0, limit=100, session=None):
-    return (
+def get_successful_adhoc_query_executions(
+    offset=0, limit=100, after_id=None, session=None
+):
+    query = (
         session.query(QueryExecution)
         .filter(QueryExecution.status == QueryExecutionStatus.DONE)
         .join(DataCellQueryExecution, isouter=True)
         .filter(DataCellQueryExecution.id.is_(None))
-        .offset(offset)
-        .limit(limit)
-        .all()
     )
+    if after_id is not None:
+        query = query.filter(QueryExecution.id > after_id)
+    return query.order_by(QueryExecution.id).offset(offset).limit(limit).all()
 
 
 @with_session
@@ -609,7 +635,7 @@ def get_successful_query_executions_by_data_cell_id(
 
 
 def update_es_query_execution_by_id(id):
-    sync_elasticsearch.apply_async(args=[ElasticsearchItem.query_executions.value, id])
+    mark_elasticsearch_items_dirty(ElasticsearchItem.query_executions.value, [id])
 
 
 """
@@ -41,6 +41,18 @@ def get_key_value_store(key, session=None):
     return KeyValueStore.get(session=session, key=key)
 
 
+@with_session
+def delete_key_value_stores(keys, commit=True, session=None):
+    deleted_count = (
+        session.query(KeyValueStore)
+        .filter(KeyValueStore.key.in_(keys))
+        .delete(synchronize_session=False)
+    )
+    if commit:
+        session.commit()
+    return deleted_count
+
+
 @with_session
 def delete_key_value_store(key, commit=True, session=None):
     item = get_key_value_store(key=key, session=session)
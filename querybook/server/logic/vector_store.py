@@ -1,25 +1,48 @@
+import datetime
+import hashlib
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
 from app.db import with_session
 from const.ai_assistant import (
     DEFAULT_QUERY_SEARCH_LIMIT,
     DEFAULT_TABLE_SEARCH_LIMIT,
+    DEFAULT_VECTOR_INGEST_CONCURRENCY,
+    DEFAULT_VECTOR_INGEST_MAX_RETRIES,
+    DEFAULT_VECTOR_STORE_WRITE_BATCH_SIZE,
     MAX_SAMPLE_QUERY_COUNT_FOR_TABLE_SUMMARY,
 )
 from langchain.docstore.document import Document
 from lib.ai_assistant import ai_assistant
+from lib.ai_assistant.tools.table_schema import _get_table_schema
 from lib.elasticsearch.search_table import construct_tables_query_by_table_names
 from lib.elasticsearch.search_utils import ES_CONFIG, get_matching_objects
 from lib.logger import get_logger
 from lib.vector_store import get_vector_store
 from logic.admin import get_query_engine_by_id
 from logic.elasticsearch import get_sample_query_cells_by_table_name
-from logic.metastore import get_all_table, get_table_by_name
+from logic.metastore import get_all_table, get_table_by_id, get_table_by_name
+from logic.result_store import (
+    delete_key_value_store,
+    get_key_value_store,
+    upsert_key_value_store,
+)
 from models.metastore import DataTable
+from models.vector_store import VectorStoreDocument
 from lib.elasticsearch.search_query import (
     construct_query_search_by_query_cell_ids,
 )
 
 LOG = get_logger(__file__)
 
+# Id of the last table ingested by ingest_vector_index
+INGEST_CHECKPOINT_KEY = "vector_index_ingest_checkpoint"
+
+# (summary, metadata, doc id) of a vector store document
+VectorDocument = Tuple[str, dict, str]
+
 
 def create_and_store_document(summary: str, metadata: dict, doc_id: str):
     """Create a Document and store it in the vector store."""
@@ -31,6 +54,122 @@ def create_and_store_document(summary: str, metadata: dict, doc_id: str):
         raise
 
 
+def create_and_store_documents(
+    documents: List[VectorDocument],
+    batch_size: int = DEFAULT_VECTOR_STORE_WRITE_BATCH_SIZE,
+):
+    """Same as create_and_store_document for many documents. Each batch
+    is embedded with one call and written with one bulk request."""
+    for i in range(0, len(documents), batch_size):
+        batch = documents[i : i + batch_size]
+        try:
+            get_vector_store().add_documents(
+                documents=[
+                    Document(page_content=summary, metadata=metadata)
+                    for summary, metadata, _ in batch
+                ],
+                ids=[doc_id for _, _, doc_id in batch],
+            )
+        except Exception as e:
+            LOG.error(f"Failed to store documents to vector store: {e}")
+            raise
+
+
+@with_session
+def get_document_fingerprints(doc_ids: List[str], session=None) -> Dict[str, str]:
+    """Get the fingerprints of the stored documents by doc id"""
+    if not doc_ids:
+        return {}
+    return dict(
+        session.query(VectorStoreDocument.doc_id, VectorStoreDocument.fingerprint)
+        .filter(VectorStoreDocument.doc_id.in_(doc_ids))
+        .all()
+    )
+
+
+@with_session
+def upsert_document_fingerprints(
+    fingerprints: Dict[str, str], commit=True, session=None
+):
+    """Save the fingerprints of the stored documents by doc id"""
+    if not fingerprints:
+        return
+
+    existing_documents = {
+        document.doc_id: document
+        for document in session.query(VectorStoreDocument).filter(
+            VectorStoreDocument.doc_id.in_(list(fingerprints.keys()))
+        )
+    }
+    for doc_id, fingerprint in fingerprints.items():
+        document = existing_documents.get(doc_id)
+        if document is None:
+            session.add(VectorStoreDocument(doc_id=doc_id, fingerprint=fingerprint))
+        else:
+            document.fingerprint = fingerprint
+            document.updated_at = datetime.datetime.now()
+
+    if commit:
+        session.commit()
+    else:
+        session.flush()
+
+
+@with_session
+def delete_document_fingerprints(doc_ids: List[str], commit=True, session=None):
+    session.query(VectorStoreDocument).filter(
+        VectorStoreDocument.doc_id.in_(doc_ids)
+    ).delete(synchronize_session=False)
+    if commit:
+        session.commit()
+
+
+@with_session
+def store_documents_with_fingerprints(documents: List[VectorDocument], session=None):
+    """Store the documents, then save their fingerprints so that they
+    are not summarized again until their content changes"""
+    create_and_store_documents(documents)
+    upsert_document_fingerprints(
+        {doc_id: metadata["fingerprint"] for _, metadata, doc_id in documents},
+        session=session,
+    )
+
+
+def _get_fingerprint(content) -> str:
+    return hashlib.sha256(
+        json.dumps(content, sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()
+
+
+def _get_table_fingerprint(table: DataTable, sample_query_cells: List[dict]) -> str:
+    """Hash of what the table summary is generated from. The latest partitions
+    are left out, otherwise every new partition would change the fingerprint"""
+    table_schema = _get_table_schema(
+        table, ai_assistant._should_skip_column if ai_assistant else None
+    )
+    if table_schema:
+        table_schema.pop("latest_partitions", None)
+    return _get_fingerprint(
+        {
+            "schema": table_schema,
+            "sample_queries": [
+                q["query_text"]
+                for q in sample_query_cells[:MAX_SAMPLE_QUERY_COUNT_FOR_TABLE_SUMMARY]
+            ],
+        }
+    )
+
+
+def _get_query_cell_fingerprint(es_query_cell: dict) -> str:
+    return _get_fingerprint(
+        {
+            "query": es_query_cell["query_text"],
+            "tables": es_query_cell["full_table_name"],
+            "engine_id": es_query_cell["engine_id"],
+        }
+    )
+
+
 def _get_table_doc_id(table_id: int) -> str:
     return f"table_{table_id}"
 
@@ -39,6 +178,52 @@ def _get_query_doc_id(query_cell_id: int) -> str:
     return f"query_{query_cell_id}"
 
 
+def _should_record_query_cell(es_query_cell: dict) -> bool:
+    # skip if title is empty or "Untitled"
+    return bool(
+        es_query_cell
+        and es_query_cell["title"]
+        and es_query_cell["title"] != "Untitled"
+    )
+
+
+@with_session
+def _summarize_query_cell(
+    es_query_cell: dict,
+    fingerprint: str,
+    session=None,
+) -> Optional[VectorDocument]:
+    """Summarize the elastic search query cell, None if it should not be recorded."""
+    engine_id = es_query_cell["engine_id"]
+    engine = get_query_engine_by_id(engine_id, session=session)
+    if not engine:
+        LOG.warning(f"Engine {engine_id} not found.")
+        return None
+
+    metastore_id = engine.metastore_id
+    if not metastore_id:
+        LOG.warning(f"Engine {engine_id} does not have metastore.")
+        return None
+
+    query_text = es_query_cell["query_text"]
+    table_names = es_query_cell["full_table_name"]
+    summary = ai_assistant.summarize_query(
+        metastore_id=metastore_id,
+        table_names=table_names,
+        query=query_text,
+        session=session,
+    )
+    metadata = {
+        "type": "query",
+        "tables": table_names,
+        "query": query_text,
+        "query_cell_id": es_query_cell["id"],
+        "metastore_id": metastore_id,
+        "fingerprint": fingerprint,
+    }
+    return summary, metadata, _get_query_doc_id(es_query_cell["id"])
+
+
 @with_session
 def record_query_cell_from_es(
     es_query_cell: dict,
@@ -49,47 +234,52 @@ def record_query_cell_from_es(
     if not get_vector_store():
         return
 
-    # skip if title is empty or "Untitled"
-    if (
-        not es_query_cell
-        or not es_query_cell["title"]
-        or es_query_cell["title"] == "Untitled"
-    ):
+    if not _should_record_query_cell(es_query_cell):
         return
 
     try:
-        engine_id = es_query_cell["engine_id"]
-        engine = get_query_engine_by_id(engine_id, session=session)
-        if not engine:
-            LOG.warning(f"Engine {engine_id} not found.")
-            return
-
-        metastore_id = engine.metastore_id
-        if not metastore_id:
-            LOG.warning(f"Engine {engine_id} does not have metastore.")
+        doc_id = _get_query_doc_id(es_query_cell["id"])
+        fingerprint = _get_query_cell_fingerprint(es_query_cell)
+        if get_document_fingerprints([doc_id], session=session).get(doc_id) == (
+            fingerprint
+        ):
             return
 
-        query_text = es_query_cell["query_text"]
-        table_names = es_query_cell["full_table_name"]
-        summary = ai_assistant.summarize_query(
-            metastore_id=metastore_id,
-            table_names=table_names,
-            query=query_text,
-            session=session,
-        )
-        metadata = {
-            "type": "query",
-            "tables": table_names,
-            "query": query_text,
-            "query_cell_id": es_query_cell["id"],
-            "metastore_id": metastore_id,
-        }
-        doc_id = _get_query_doc_id(es_query_cell["id"])
-        create_and_store_document(summary, metadata, doc_id)
+        document = _summarize_query_cell(es_query_cell, fingerprint, session=session)
+        if document:
+            store_documents_with_fingerprints([document], session=session)
     except Exception as e:
         LOG.error(f"Failed to process sample query cell: {e}")
 
 
+@with_session
+def _summarize_table(
+    table_id: int,
+    metastore_id: int,
+    full_table_name: str,
+    sample_query_cells: List[dict],
+    fingerprint: str,
+    session=None,
+) -> VectorDocument:
+    summary = ai_assistant.summarize_table(
+        metastore_id=metastore_id,
+        table_name=full_table_name,
+        sample_queries=[
+            q["query_text"]
+            for q in sample_query_cells[:MAX_SAMPLE_QUERY_COUNT_FOR_TABLE_SUMMARY]
+        ],
+        session=session,
+    )
+    metadata = {
+        "type": "table",
+        "tables": [full_table_name],
+        "table_ids": [table_id],
+        "metastore_id": metastore_id,
+        "fingerprint": fingerprint,
+    }
+    return summary, metadata, _get_table_doc_id(table_id)
+
+
 @with_session
 def record_table(
     table: DataTable,
@@ -116,25 +306,23 @@ def record_table(
             table_name=full_table_name
         )
 
-        # ingest table summary
-        summary = ai_assistant.summarize_table(
-            metastore_id=metastore_id,
-            table_name=full_table_name,
-            sample_queries=[
-                q["query_text"]
-                for q in sample_query_cells[:MAX_SAMPLE_QUERY_COUNT_FOR_TABLE_SUMMARY]
-            ],
-            session=session,
-        )
-
-        metadata = {
-            "type": "table",
-            "tables": [full_table_name],
-            "table_ids": [table.id],
-            "metastore_id": metastore_id,
-        }
+        # ingest table summary, unless nothing it is generated from changed
         doc_id = _get_table_doc_id(table.id)
-        create_and_store_document(summary, metadata, doc_id)
+        fingerprint = _get_table_fingerprint(table, sample_query_cells)
+        if get_document_fingerprints([doc_id], session=session).get(doc_id) == (
+            fingerprint
+        ):
+            LOG.info(f"Table {full_table_name} did not change, skip summarizing it")
+        else:
+            document = _summarize_table(
+                table.id,
+                metastore_id,
+                full_table_name,
+                sample_query_cells,
+                fingerprint,
+                session=session,
+            )
+            store_documents_with_fingerprints([document], session=session)
 
         # ingest sample queries summary
         if ingest_sample_queries:
@@ -155,6 +343,7 @@ def delete_table_doc(table_id: int):
         return
     doc_id = _get_table_doc_id(table_id)
     get_vector_store().delete([doc_id])
+    delete_document_fingerprints([doc_id])
 
 
 def search_tables(
@@ -220,24 +409,190 @@ def get_table_summary_by_name(
     return get_vector_store().get_table_summary(table.id)
 
 
+def _is_rate_limit_error(error: Exception) -> bool:
+    # The ai assistant raises the error of the llm provider as the cause
+    while error is not None:
+        if (
+            "RateLimit" in type(error).__name__
+            or getattr(error, "status_code", None) == 429
+        ):
+            return True
+        error = error.__cause__
+    return False
+
+
+def _call_with_rate_limit_retry(
+    fn: Callable, *args, max_retries=DEFAULT_VECTOR_INGEST_MAX_RETRIES, **kwargs
+):
+    """Call fn and retry with exponential backoff if the llm provider is rate limiting"""
+    for attempt in range(max_retries + 1):
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            if attempt == max_retries or not _is_rate_limit_error(e):
+                raise
+            wait_seconds = min(2**attempt, 60)
+            LOG.warning(f"Rate limited by the llm provider, retry in {wait_seconds}s")
+            time.sleep(wait_seconds)
+
+
 @with_session
-def ingest_vector_index(batch_size=100, session=None):
-    """It will ingest all tables and some sample queries of the tables into the vector store."""
-    offset = 0
-
-    while True:
-        tables = get_all_table(
-            limit=batch_size,
-            offset=offset,
+def _summarize_table_for_ingestion(
+    table_info: Tuple[int, int, str, Optional[str]], session=None
+) -> Tuple[Optional[VectorDocument], List[dict]]:
+    table_id, metastore_id, full_table_name, stored_fingerprint = table_info
+    LOG.info(f"Ingesting table: {full_table_name}")
+    try:
+        sample_query_cells = get_sample_query_cells_by_table_name(
+            table_name=full_table_name
+        )
+        fingerprint = _get_table_fingerprint(
+            get_table_by_id(table_id, session=session), sample_query_cells
+        )
+        if fingerprint == stored_fingerprint:
+            return None, sample_query_cells
+
+        document = _call_with_rate_limit_retry(
+            _summarize_table,
+            table_id,
+            metastore_id,
+            full_table_name,
+            sample_query_cells,
+            fingerprint,
+        )
+        return document, sample_query_cells
+    except Exception as e:
+        LOG.error(f"Failed to summarize table {full_table_name}: {e}")
+        return None, []
+
+
+def _summarize_query_cell_for_ingestion(
+    es_query_cell: dict,
+) -> Optional[VectorDocument]:
+    try:
+        return _call_with_rate_limit_retry(
+            _summarize_query_cell,
+            es_query_cell,
+            _get_query_cell_fingerprint(es_query_cell),
+        )
+    except Exception as e:
+        LOG.error(f"Failed to summarize sample query cell {es_query_cell['id']}: {e}")
+        return None
+
+
+def _ingest_tables(
+    tables: List[DataTable],
+    executor: ThreadPoolExecutor,
+    ingest_sample_queries: bool = False,
+    ignore_fingerprints: bool = False,
+    session=None,
+):
+    """Summarize the tables and their sample queries with the threads of the
+    executor, each with its own db session, then store them in bulk. Tables
+    and queries whose fingerprint did not change are not summarized again,
+    unless ignore_fingerprints is set."""
+
+    def get_stored_fingerprints(doc_ids: List[str]) -> Dict[str, str]:
+        if ignore_fingerprints:
+            return {}
+        return get_document_fingerprints(doc_ids, session=session)
+
+    tables = [
+        table for table in tables if not get_vector_store().should_skip_table(table)
+    ]
+    stored_fingerprints = get_stored_fingerprints(
+        [_get_table_doc_id(table.id) for table in tables]
+    )
+    table_infos = [
+        (
+            table.id,
+            table.data_schema.metastore_id,
+            f"{table.data_schema.name}.{table.name}",
+            stored_fingerprints.get(_get_table_doc_id(table.id)),
+        )
+        for table in tables
+    ]
+    results = list(executor.map(_summarize_table_for_ingestion, table_infos))
+    store_documents_with_fingerprints(
+        [document for document, _ in results if document], session=session
+    )
+
+    if ingest_sample_queries:
+        # tables of the same page often share sample queries
+        query_cells = {
+            query_cell["id"]: query_cell
+            for _, sample_query_cells in results
+            for query_cell in sample_query_cells
+            if _should_record_query_cell(query_cell)
+        }
+        stored_fingerprints = get_stored_fingerprints(
+            [_get_query_doc_id(query_cell_id) for query_cell_id in query_cells]
+        )
+        changed_query_cells = [
+            query_cell
+            for query_cell in query_cells.values()
+            if stored_fingerprints.get(_get_query_doc_id(query_cell["id"]))
+            != _get_query_cell_fingerprint(query_cell)
+        ]
+        store_documents_with_fingerprints(
+            [
+                document
+                for document in executor.map(
+                    _summarize_query_cell_for_ingestion, changed_query_cells
+                )
+                if document
+            ],
             session=session,
         )
 
-        for table in tables:
-            full_table_name = f"{table.data_schema.name}.{table.name}"
-            LOG.info(f"Ingesting table: {full_table_name}")
-            record_table(table=table, ingest_sample_queries=True, session=session)
 
-        if len(tables) < batch_size:
-            break
+@with_session
+def ingest_vector_index(
+    batch_size=100,
+    concurrency=DEFAULT_VECTOR_INGEST_CONCURRENCY,
+    resume=True,
+    ignore_fingerprints=False,
+    session=None,
+):
+    """It will ingest all tables and some sample queries of the tables into the vector store.
+
+    Tables are ingested in pages of batch_size ordered by id. The summaries of a page
+    are generated by concurrency threads and stored in bulk, then the id of the last
+    table of the page is saved, so that an interrupted ingestion resumes after it.
+
+    Documents that did not change since they were stored are skipped. Set
+    ignore_fingerprints to summarize all of them again, e.g. after changing
+    the summarization model or prompts.
+    """
+    # vector store is not configured
+    if not get_vector_store():
+        LOG.warning("Vector store is not configured.")
+        return
 
-        offset += batch_size
+    checkpoint = get_key_value_store(INGEST_CHECKPOINT_KEY, session=session)
+    after_id = int(checkpoint.value) if resume and checkpoint else None
+    if after_id is not None:
+        LOG.info(f"Resuming vector index ingestion after table {after_id}")
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        while True:
+            tables = get_all_table(limit=batch_size, after_id=after_id, session=session)
+            if not tables:
+                break
+
+            _ingest_tables(
+                tables,
+                executor,
+                ingest_sample_queries=True,
+                ignore_fingerprints=ignore_fingerprints,
+                session=session,
+            )
+            after_id = tables[-1].id
+            upsert_key_value_store(
+                INGEST_CHECKPOINT_KEY, str(after_id), session=session
+            )
+
+            if len(tables) < batch_size:
+                break
+
+    delete_key_value_store(INGEST_CHECKPOINT_KEY, session=session)
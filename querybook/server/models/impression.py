@@ -24,3 +24,31 @@ class Impression(Base):
             "uid": self.uid,
             "created_at": self.created_at,
         }
+
+
+class ImpressionDailyRollup(Base):
+    """Impressions of an item on a day, kept up to date by flush_impressions"""
+
+    __tablename__ = "impression_daily_rollup"
+    __table_args__ = (
+        sql.UniqueConstraint(
+            "item_type", "item_id", "date", name="unique_impression_daily_rollup"
+        ),
+    )
+
+    id = sql.Column(sql.Integer, primary_key=True)
+    item_id = sql.Column(sql.Integer, nullable=False)
+    item_type = sql.Column(sql.Enum(ImpressionItemType), nullable=False)
+    date = sql.Column(sql.Date, nullable=False, index=True)
+    # Number of distinct users who viewed the item on the date
+    viewers_count = sql.Column(sql.Integer, nullable=False, default=0)
+    views_count = sql.Column(sql.Integer, nullable=False, default=0)
+
+    def to_dict(self):
+        return {
+            "item_id": self.item_id,
+            "item_type": self.item_type.name,
+            "date": self.date,
+            "viewers_count": self.viewers_count,
+            "views_count": self.views_count,
+        }
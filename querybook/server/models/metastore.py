@@ -189,6 +189,9 @@ class DataTable(CRUDMixin, TruncateString("name", "type", "location"), Base):
     )
     golden = sql.Column(sql.Boolean, default=False)
     boost_score = sql.Column(sql.Numeric, default=1, nullable=False)
+    # Value from the metastore that changes whenever the table changes,
+    # used by the metastore loader to skip the unchanged tables
+    change_signal = sql.Column(sql.String(length=name_length))
 
     information = relationship(
         "DataTableInformation",
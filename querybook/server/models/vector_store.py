@@ -0,0 +1,20 @@
+import sqlalchemy as sql
+
+from app import db
+from const.db import utf8mb4_name_length, now
+from lib.sqlalchemy import CRUDMixin
+
+
+class VectorStoreDocument(CRUDMixin, db.Base):
+    """Fingerprint of the content a vector store document was generated from,
+    so that it is only summarized and embedded again when the content changes
+    """
+
+    __tablename__ = "vector_store_document"
+
+    id = sql.Column(sql.Integer, primary_key=True)
+    doc_id = sql.Column(
+        sql.String(length=utf8mb4_name_length), unique=True, index=True, nullable=False
+    )
+    fingerprint = sql.Column(sql.String(length=64), nullable=False)
+    updated_at = sql.Column(sql.DateTime, default=now)
@@ -1,3 +1,15 @@
+import argparse
+
 from logic.vector_store import ingest_vector_index
 
-ingest_vector_index()
+parser = argparse.ArgumentParser(
+    description="Ingest the tables and their sample queries into the vector store"
+)
+parser.add_argument(
+    "--force",
+    action="store_true",
+    help="Summarize all the documents again, even the ones that did not change",
+)
+args = parser.parse_args()
+
+ingest_vector_index(ignore_fingerprints=args.force)
@@ -14,11 +14,15 @@ from .run_sample_query import run_sample_query
 from .dummy_task import dummy_task
 from .update_metastore import update_metastore
 from .sync_elasticsearch import sync_elasticsearch
+from .flush_impressions import flush_impressions
 from .run_datadoc import run_datadoc
 from .delete_mysql_cache import delete_mysql_cache
 from .poll_engine_status import poll_engine_status
 from .presto_hive_function_scrapper import presto_hive_function_scrapper
-from .db_clean_up_jobs import run_all_db_clean_up_jobs
+from .db_clean_up_jobs import (
+    clean_up_orphaned_query_results,
+    run_all_db_clean_up_jobs,
+)
 from .disable_scheduled_docs import disable_scheduled_docs
 
 LOG = get_logger(__file__)
@@ -35,11 +39,13 @@ run_query_task
 dummy_task
 update_metastore
 sync_elasticsearch
+flush_impressions
 run_datadoc
 delete_mysql_cache
 poll_engine_status
 presto_hive_function_scrapper
 run_all_db_clean_up_jobs
+clean_up_orphaned_query_results
 run_sample_query
 disable_scheduled_docs
 
@@ -1,15 +1,34 @@
 from app.flask_app import celery
+from collections import defaultdict
 from datetime import datetime, timedelta
+from itertools import islice
+import time
+
+from celery.utils.log import get_task_logger
+from sqlalchemy import and_, or_
 
 from app.db import DBSession, with_session
+from const.elasticsearch import ElasticsearchItem
 from const.query_execution import QueryExecutionStatus
-from logic.query_execution import update_es_query_execution_by_id
+from lib.result_store import delete_results, list_results
+from logic.query_execution import (
+    get_existing_statement_execution_ids,
+    get_statement_execution_paths_by_query_execution_ids,
+)
 from models.schedule import TaskRunRecord
 from models.query_execution import QueryExecution
-from models.impression import Impression
+from models.impression import Impression, ImpressionDailyRollup
 from models.datadoc import DataDoc
 from models.event_log import EventLog
 from logic.schedule import with_task_logging
+from tasks.sync_elasticsearch import mark_elasticsearch_items_dirty
+
+LOG = get_task_logger(__name__)
+
+# Query executions are deleted in batches, along with their results
+QUERY_EXECUTION_CLEAN_UP_BATCH_SIZE = 1000
+# Results and logs are stored in a folder per statement execution
+QUERY_RESULTS_PREFIX = "querybook_temp/"
 
 
 @celery.task(bind=True)
@@ -22,6 +41,9 @@ def run_all_db_clean_up_jobs(
     days_to_keep_impression=30,
     days_to_keep_archived_data_doc=60,
     days_to_keep_event_logs=7,
+    clean_up_query_results=True,
+    query_results_dry_run=False,
+    query_results_deletes_per_second=1000,
 ):
     with DBSession() as session:
         if days_to_keep_task_record != -1:
@@ -32,6 +54,9 @@ def run_all_db_clean_up_jobs(
             clean_up_query_execution(
                 days_to_keep_done=days_to_keep_query_exec_done,
                 days_to_keep_else=days_to_keep_query_exec_else,
+                clean_up_results=clean_up_query_results,
+                results_dry_run=query_results_dry_run,
+                results_deletes_per_second=query_results_deletes_per_second,
                 session=session,
             )
         if days_to_keep_impression != -1:
@@ -55,32 +80,159 @@ def clean_up_task_run_record(days_to_keep=30, session=None):
 
 
 @with_session
-def clean_up_query_execution(days_to_keep_done=90, days_to_keep_else=30, session=None):
+def clean_up_query_execution(
+    days_to_keep_done=90,
+    days_to_keep_else=30,
+    clean_up_results=True,
+    results_dry_run=False,
+    results_deletes_per_second=None,
+    session=None,
+):
     last_day_for_done = datetime.now() - timedelta(days_to_keep_done)
     last_day_for_else = datetime.now() - timedelta(days_to_keep_else)
 
-    # Delete completed queries
-    query = (
-        session.query(QueryExecution)
-        .filter(QueryExecution.status == QueryExecutionStatus.DONE)
-        .filter(QueryExecution.completed_at < last_day_for_done)
+    # Completed queries are kept longer than the others
+    query = session.query(QueryExecution.id).filter(
+        or_(
+            and_(
+                QueryExecution.status == QueryExecutionStatus.DONE,
+                QueryExecution.completed_at < last_day_for_done,
+            ),
+            and_(
+                QueryExecution.status != QueryExecutionStatus.DONE,
+                QueryExecution.created_at < last_day_for_else,
+            ),
+        )
     )
-    query_execution_ids_to_delete = [query_exec.id for query_exec in query.all()]
-    query.delete(synchronize_session=False)
-
-    # Delete else
-    query = (
-        session.query(QueryExecution)
-        .filter(QueryExecution.status != QueryExecutionStatus.DONE)
-        .filter(QueryExecution.created_at < last_day_for_else)
+
+    # Paginated by id, since the query executions are kept on dry runs
+    last_id = 0
+    while True:
+        query_execution_ids = [
+            query_exec_id
+            for (query_exec_id,) in query.filter(QueryExecution.id > last_id)
+            .order_by(QueryExecution.id)
+            .limit(QUERY_EXECUTION_CLEAN_UP_BATCH_SIZE)
+            .all()
+        ]
+        if len(query_execution_ids) == 0:
+            break
+        last_id = query_execution_ids[-1]
+
+        # Results are deleted first, since they cannot be found once
+        # the query executions are deleted
+        if clean_up_results:
+            clean_up_query_execution_results(
+                query_execution_ids,
+                dry_run=results_dry_run,
+                deletes_per_second=results_deletes_per_second,
+                session=session,
+            )
+            # Otherwise their results could not be deleted once the dry run is over
+            if results_dry_run:
+                LOG.info(
+                    f"Dry run, would delete {len(query_execution_ids)} query executions"
+                )
+                continue
+
+        session.query(QueryExecution).filter(
+            QueryExecution.id.in_(query_execution_ids)
+        ).delete(synchronize_session=False)
+        session.commit()
+
+        mark_elasticsearch_items_dirty(
+            ElasticsearchItem.query_executions.value, query_execution_ids
+        )
+
+
+@with_session
+def clean_up_query_execution_results(
+    query_execution_ids, dry_run=False, deletes_per_second=None, session=None
+):
+    """Delete the stored results and logs of the query executions
+
+    Arguments:
+        query_execution_ids {List[int]}
+
+    Keyword Arguments:
+        dry_run {bool} -- If true, only log the files to delete (default: {False})
+        deletes_per_second {int} -- Wait after deleting to stay under this rate (default: {None})
+    """
+    uris = get_statement_execution_paths_by_query_execution_ids(
+        query_execution_ids, session=session
     )
-    query_execution_ids_to_delete += [query_exec.id for query_exec in query.all()]
-    query.delete(synchronize_session=False)
+    _delete_query_results(uris, dry_run=dry_run, deletes_per_second=deletes_per_second)
 
-    session.commit()
 
-    for query_exec_id in query_execution_ids_to_delete:
-        update_es_query_execution_by_id(query_exec_id)
+@celery.task(bind=True)
+@with_task_logging()
+def clean_up_orphaned_query_results(self, dry_run=False, deletes_per_second=1000):
+    """Delete the stored results and logs of statement executions that no
+    longer exist. Meant to be run once, for the results of query executions
+    deleted before run_all_db_clean_up_jobs deleted their results as well
+    """
+    with DBSession() as session:
+        clean_up_orphaned_query_execution_results(
+            dry_run=dry_run, deletes_per_second=deletes_per_second, session=session
+        )
+
+
+@with_session
+def clean_up_orphaned_query_execution_results(
+    dry_run=False, deletes_per_second=None, session=None
+):
+    """Delete the files in the result store whose statement execution
+       was deleted, the files are listed and checked in batches
+
+    Keyword Arguments:
+        dry_run {bool} -- If true, only log the files to delete (default: {False})
+        deletes_per_second {int} -- Wait after deleting to stay under this rate (default: {None})
+    """
+    uris = list_results(QUERY_RESULTS_PREFIX)
+    while True:
+        batch_uris = list(islice(uris, QUERY_EXECUTION_CLEAN_UP_BATCH_SIZE))
+        if len(batch_uris) == 0:
+            break
+
+        # Uris are {store_type}://querybook_temp/{statement_execution_id}/{file_name}
+        uris_by_statement_execution_id = defaultdict(list)
+        for uri in batch_uris:
+            folder = uri.split("://", 1)[-1][len(QUERY_RESULTS_PREFIX) :].split("/")[0]
+            if folder.isdigit():
+                uris_by_statement_execution_id[int(folder)].append(uri)
+
+        existing_ids = set(
+            get_existing_statement_execution_ids(
+                list(uris_by_statement_execution_id.keys()), session=session
+            )
+        )
+        orphaned_uris = []
+        for (
+            statement_execution_id,
+            statement_uris,
+        ) in uris_by_statement_execution_id.items():
+            if statement_execution_id not in existing_ids:
+                orphaned_uris += statement_uris
+
+        _delete_query_results(
+            orphaned_uris, dry_run=dry_run, deletes_per_second=deletes_per_second
+        )
+
+
+def _delete_query_results(uris, dry_run=False, deletes_per_second=None):
+    if len(uris) == 0:
+        return
+
+    if dry_run:
+        LOG.info(f"Dry run, would delete {len(uris)} results and logs: {uris}")
+        return
+
+    start_time = time.time()
+    deleted_count = delete_results(uris)
+    LOG.info(f"Deleted {deleted_count} files for {len(uris)} results and logs")
+
+    if deletes_per_second:
+        time.sleep(max(0, len(uris) / deletes_per_second - (time.time() - start_time)))
 
 
 @with_session
@@ -90,6 +242,9 @@ def clean_up_impression(days_to_keep=30, session=None):
     session.query(Impression).filter(Impression.created_at < last_day).delete(
         synchronize_session=False
     )
+    session.query(ImpressionDailyRollup).filter(
+        ImpressionDailyRollup.date < last_day.date()
+    ).delete(synchronize_session=False)
     session.commit()
 
 
@@ -0,0 +1,108 @@
+from datetime import datetime
+import json
+import time
+
+from app.db import DBSession
+from app.flask_app import celery
+from celery.utils.log import get_task_logger
+from clients.redis_client import get_redis, with_redis
+from const.impression import ImpressionItemType
+from lib.utils.tiered_cache import acquire_lock, release_lock
+
+LOG = get_task_logger(__name__)
+
+# Impressions are pushed to this redis list, which is
+# drained by flush_impressions with one insert per batch
+IMPRESSION_BUFFER_KEY = "impression_buffer"
+# Set while a flush is scheduled, so that only one is queued at a time
+FLUSH_SCHEDULED_KEY = "impression_buffer_flush_scheduled"
+# Held while flushing, so that the daily rollups are not updated concurrently
+FLUSH_LOCK_NAME = "impression_buffer_flush"
+
+# Seconds to wait for more impressions before inserting them
+FLUSH_COUNTDOWN = 10
+# Number of impressions inserted per transaction
+FLUSH_BATCH_SIZE = 1000
+# In case the flush task is lost, allow another one to be scheduled
+FLUSH_KEY_EXPIRATION = FLUSH_COUNTDOWN + 60 * 10
+
+
+@with_redis
+def buffer_impression(
+    item_id: int, item_type: ImpressionItemType, uid: int, redis_conn=None
+):
+    """Queue the impression to be inserted by flush_impressions,
+       instead of inserting it in the request
+
+    Arguments:
+        item_id {int} -- Id of the viewed item
+        item_type {ImpressionItemType} -- Type of the viewed item
+        uid {int} -- Id of the viewer
+    """
+    redis_conn.rpush(
+        IMPRESSION_BUFFER_KEY,
+        json.dumps([int(item_id), item_type.value, uid, time.time()]),
+    )
+    _schedule_flush(redis_conn)
+
+
+def _schedule_flush(redis_conn):
+    if redis_conn.set(FLUSH_SCHEDULED_KEY, 1, nx=True, ex=FLUSH_KEY_EXPIRATION):
+        flush_impressions.apply_async(countdown=FLUSH_COUNTDOWN)
+
+
+def _deserialize_impression(raw: bytes):
+    item_id, item_type, uid, created_at = json.loads(raw)
+    return {
+        "item_id": item_id,
+        "item_type": ImpressionItemType(item_type),
+        "uid": uid,
+        "created_at": datetime.utcfromtimestamp(created_at),
+    }
+
+
+@celery.task(bind=True)
+def flush_impressions(self, *args, **kwargs):
+    redis_conn = get_redis()
+    lock_token = acquire_lock(
+        FLUSH_LOCK_NAME, expires_after=FLUSH_KEY_EXPIRATION, redis_conn=redis_conn
+    )
+    if lock_token is None:
+        # Another flush is running, the scheduled key is kept so
+        # that this one is the only flush queued after it
+        flush_impressions.apply_async(countdown=FLUSH_COUNTDOWN)
+        return
+
+    try:
+        # Impressions buffered from now on are flushed by the next scheduled task
+        redis_conn.delete(FLUSH_SCHEDULED_KEY)
+        _flush_buffer(redis_conn)
+    finally:
+        release_lock(FLUSH_LOCK_NAME, lock_token, redis_conn=redis_conn)
+
+
+def _flush_buffer(redis_conn):
+    # Delaying this import to avoid circular depdendency
+    from logic.impression import create_impressions
+
+    while True:
+        with redis_conn.pipeline() as pipe:
+            pipe.lrange(IMPRESSION_BUFFER_KEY, 0, FLUSH_BATCH_SIZE - 1)
+            pipe.ltrim(IMPRESSION_BUFFER_KEY, FLUSH_BATCH_SIZE, -1)
+            raw_impressions, _ = pipe.execute()
+        if not raw_impressions:
+            break
+
+        try:
+            with DBSession() as session:
+                create_impressions(
+                    [_deserialize_impression(raw) for raw in raw_impressions],
+                    session=session,
+                )
+        except Exception:
+            LOG.error(
+                f"Failed to insert {len(raw_impressions)} impressions, will retry later"
+            )
+            redis_conn.rpush(IMPRESSION_BUFFER_KEY, *raw_impressions)
+            _schedule_flush(redis_conn)
+            raise
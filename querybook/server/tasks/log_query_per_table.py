@@ -2,10 +2,7 @@ from app.flask_app import celery
 
 from app.db import DBSession, with_session
 from const.query_execution import QueryExecutionStatus
-from lib.query_analysis.lineage import (
-    process_query,
-    get_table_statement_type,
-)
+from lib.query_analysis.analysis import get_query_analysis
 from lib.metastore import get_metastore_loader
 from logic import query_execution as qe_logic, metastore as m_logic
 from lib.lineage.utils import lineage as lineage_logic
@@ -23,10 +20,11 @@ def log_query_per_table_task(self, query_execution_id, execution_type):
             # This query engine has no metastore configured
             return
 
-        statement_types = get_table_statement_type(query_execution.query)
-        table_per_statement, _ = process_query(
-            query_execution.query, query_execution.engine.language
+        analysis = get_query_analysis(
+            query_execution.query, query_execution.engine.language, persist=True
         )
+        statement_types = analysis.statement_types
+        table_per_statement = analysis.table_per_statement
 
         sync_table_to_metastore(
             table_per_statement, statement_types, metastore_id, session=session
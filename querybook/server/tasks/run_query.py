@@ -1,5 +1,6 @@
 import traceback
 import datetime
+import time
 from celery.contrib.abortable import AbortableTask
 from celery.exceptions import SoftTimeLimitExceeded
 from celery.utils.log import get_task_logger
@@ -85,10 +86,16 @@ def run_query_task(
 
 
 def run_executor_until_finish(celery_task, executor):
+    # The gevent pool of the query workers does not enforce soft time limits
+    soft_time_limit = celery_task.soft_time_limit or celery.conf.task_soft_time_limit
+    deadline = time.time() + soft_time_limit if soft_time_limit else None
+
     while True:
         if celery_task.is_aborted():
             executor.cancel()
             break
+        if deadline is not None and time.time() > deadline:
+            raise SoftTimeLimitExceeded()
         executor.poll()
         if executor.status != QueryExecutionStatus.RUNNING:
             break
@@ -7,7 +7,7 @@ from const.time import seconds_in_a_day
 from lib.query_analysis.samples import make_samples_query
 from lib.utils.utils import DATETIME_TO_UTC
 from lib.utils.execute_query import ExecuteQuery
-from lib.utils import mysql_cache
+from lib.utils import tiered_cache
 
 
 class SampleQueryRunTimeError(Exception):
@@ -51,11 +51,12 @@ def run_sample_query(
             "created_by": uid,
         }
 
-        mysql_cache.set_key(
+        tiered_cache.set_key(
             f"table_samples_{table_id}_{uid}",
             results,
             expires_after=seconds_in_a_day,
-            session=session,
+            # Samples are costly to compute, so they are kept if redis is flushed
+            durable=True,
         )
 
 
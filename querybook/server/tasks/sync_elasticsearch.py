@@ -1,30 +1,184 @@
+from typing import Dict, Iterable, List
+
 from app.flask_app import celery
-from lib.celery.task_decorator import debounced_task
+from celery.utils.log import get_task_logger
+from clients.redis_client import get_redis, with_redis
 from const.elasticsearch import ElasticsearchItem
 
+LOG = get_task_logger(__name__)
+
+# Items that need to be synced are added to a redis set per item type,
+# which is drained by sync_elasticsearch with one bulk request per batch
+DIRTY_ITEMS_KEY = "es_dirty_items:{}"
+# Set while a sync is scheduled, so that only one is queued at a time
+SYNC_SCHEDULED_KEY = "es_dirty_items_sync_scheduled"
+# Set while a sync is queued because too many items are waiting
+SYNC_FLUSH_KEY = "es_dirty_items_sync_flush"
+
+# Seconds to wait for more items before syncing them
+SYNC_COUNTDOWN = 60
+# Number of items synced per bulk request, a sync is
+# queued right away once this many items are waiting
+SYNC_BATCH_SIZE = 1000
+# In case the sync task is lost, allow another one to be scheduled
+SYNC_KEY_EXPIRATION = SYNC_COUNTDOWN + 60 * 10
+
+# Set while the index of the item type is being rebuilt. Items synced during
+# the rebuild are only written to the previous index, so their ids are kept
+# in a set and synced again once the rebuilt index is swapped in
+REBUILD_KEY = "es_rebuild:{}"
+REBUILD_ITEMS_KEY = "es_rebuild_items:{}"
+# In case the rebuild is killed, stop recording the synced items
+REBUILD_KEY_EXPIRATION = 60 * 60 * 24
+
+
+def _get_dirty_items_key(item_type: str) -> str:
+    return DIRTY_ITEMS_KEY.format(item_type)
+
+
+@with_redis
+def mark_elasticsearch_items_dirty(
+    item_type: str, item_ids: Iterable[int], redis_conn=None
+):
+    """Queue the items to be synced to elasticsearch. Items marked several
+       times before the next sync are only synced once.
+
+    Arguments:
+        item_type {str} -- One of ElasticsearchItem
+        item_ids {Iterable[int]} -- ids of the items to sync
+    """
+    item_ids = list(item_ids)
+    if not item_ids:
+        return
+
+    key = _get_dirty_items_key(item_type)
+    with redis_conn.pipeline() as pipe:
+        pipe.sadd(key, *item_ids)
+        pipe.scard(key)
+        _, num_dirty_items = pipe.execute()
+
+    if redis_conn.set(SYNC_SCHEDULED_KEY, 1, nx=True, ex=SYNC_KEY_EXPIRATION):
+        sync_elasticsearch.apply_async(countdown=SYNC_COUNTDOWN)
+    if num_dirty_items >= SYNC_BATCH_SIZE and redis_conn.set(
+        SYNC_FLUSH_KEY, 1, nx=True, ex=SYNC_KEY_EXPIRATION
+    ):
+        sync_elasticsearch.apply_async()
+
+
+@with_redis
+def start_elasticsearch_rebuild(item_type: str, redis_conn=None):
+    """Record the items synced from now on, until finish_elasticsearch_rebuild
+
+    Arguments:
+        item_type {str} -- One of ElasticsearchItem
+    """
+    with redis_conn.pipeline() as pipe:
+        pipe.delete(REBUILD_ITEMS_KEY.format(item_type))
+        pipe.set(REBUILD_KEY.format(item_type), 1, ex=REBUILD_KEY_EXPIRATION)
+        pipe.execute()
+
+
+@with_redis
+def record_elasticsearch_rebuild_items(
+    item_type: str, item_ids: Iterable[int], redis_conn=None
+):
+    """Record the synced items if the index of the item type is being rebuilt
+
+    Arguments:
+        item_type {str} -- One of ElasticsearchItem
+        item_ids {Iterable[int]} -- ids of the synced items
+    """
+    item_ids = list(item_ids)
+    if item_ids and redis_conn.exists(REBUILD_KEY.format(item_type)):
+        items_key = REBUILD_ITEMS_KEY.format(item_type)
+        with redis_conn.pipeline() as pipe:
+            pipe.sadd(items_key, *item_ids)
+            pipe.expire(items_key, REBUILD_KEY_EXPIRATION)
+            pipe.execute()
+
+
+@with_redis
+def finish_elasticsearch_rebuild(item_type: str, replay: bool, redis_conn=None):
+    """Stop recording the synced items
+
+    Arguments:
+        item_type {str} -- One of ElasticsearchItem
+        replay {bool} -- Mark the items synced during the rebuild as dirty,
+                         should be True once the rebuilt index is swapped in
+    """
+    items_key = REBUILD_ITEMS_KEY.format(item_type)
+    with redis_conn.pipeline() as pipe:
+        pipe.delete(REBUILD_KEY.format(item_type))
+        pipe.smembers(items_key)
+        pipe.delete(items_key)
+        _, item_ids, _ = pipe.execute()
+
+    if replay:
+        mark_elasticsearch_items_dirty(
+            item_type, [int(item_id) for item_id in item_ids], redis_conn=redis_conn
+        )
+
+
+def _is_retryable_status(status) -> bool:
+    # The status is not a number if the request could not be sent
+    return not isinstance(status, int) or status == 429 or status >= 500
+
+
+def _get_retryable_item_ids(errors: List[Dict]) -> List[int]:
+    """Get the ids of the failed bulk items that can be synced again, such as
+       the ones rejected because the cluster is overloaded. Items rejected
+       for their document, such as mapping errors, would fail again.
+
+    Arguments:
+        errors {List[Dict]} -- Failed bulk items, see logic.elasticsearch._bulk
+
+    Returns:
+        List[int] -- ids of the items to sync again
+    """
+    item_ids = []
+    for error in errors:
+        for result in error.values():
+            if _is_retryable_status(result.get("status")):
+                item_ids.append(int(result["_id"]))
+    return item_ids
+
 
-@debounced_task(countdown=60)
 @celery.task(bind=True)
-def sync_elasticsearch(self, item_type, item_id, *args, **kwargs):
+def sync_elasticsearch(self, *args, **kwargs):
     # Delaying this import to avoid circular depdendency
-    from logic.elasticsearch import (
-        update_data_doc_by_id,
-        update_table_by_id,
-        update_user_by_id,
-        update_query_execution_by_id,
-        update_query_cell_by_id,
-        update_board_by_id,
-    )
-
-    if item_type == ElasticsearchItem.datadocs.value:
-        update_data_doc_by_id(item_id)
-    elif item_type == ElasticsearchItem.tables.value:
-        update_table_by_id(item_id)
-    elif item_type == ElasticsearchItem.users.value:
-        update_user_by_id(item_id)
-    elif item_type == ElasticsearchItem.query_executions.value:
-        update_query_execution_by_id(item_id)
-    elif item_type == ElasticsearchItem.query_cells.value:
-        update_query_cell_by_id(item_id)
-    elif item_type == ElasticsearchItem.boards.value:
-        update_board_by_id(item_id)
+    from logic.elasticsearch import update_es_items_by_ids
+
+    redis_conn = get_redis()
+    # Items marked from now on are synced by the next scheduled task
+    redis_conn.delete(SYNC_SCHEDULED_KEY, SYNC_FLUSH_KEY)
+
+    for item_type in ElasticsearchItem:
+        key = _get_dirty_items_key(item_type.value)
+        # Marked after draining the set, so that they are retried by the next sync
+        failed_item_ids = []
+        while True:
+            item_ids = [
+                int(item_id) for item_id in redis_conn.spop(key, SYNC_BATCH_SIZE)
+            ]
+            if not item_ids:
+                break
+
+            try:
+                _, errors = update_es_items_by_ids(item_type.value, item_ids)
+            except Exception:
+                LOG.error(
+                    f"Failed to sync {len(item_ids)} {item_type.value}, will retry later"
+                )
+                mark_elasticsearch_items_dirty(
+                    item_type.value, item_ids + failed_item_ids, redis_conn=redis_conn
+                )
+                raise
+            failed_item_ids.extend(_get_retryable_item_ids(errors))
+
+        if failed_item_ids:
+            LOG.error(
+                f"Failed to sync {len(failed_item_ids)} {item_type.value}, will retry later"
+            )
+            mark_elasticsearch_items_dirty(
+                item_type.value, failed_item_ids, redis_conn=redis_conn
+            )
@@ -4,8 +4,13 @@ from logic.schedule import with_task_logging
 
 @celery.task(bind=True)
 @with_task_logging()
-def update_metastore(self, id, *args, **kwargs):
+def update_metastore(self, id, full_load=False, *args, **kwargs):
     # Delaying this import to avoid circular depdendency
     from lib.metastore import load_metastore
 
-    load_metastore(id)
+    def report_progress(num_synced, num_tables):
+        self.update_state(
+            state="PROGRESS", meta={"synced": num_synced, "total": num_tables}
+        )
+
+    return load_metastore(id, full_load=full_load, progress_callback=report_progress)
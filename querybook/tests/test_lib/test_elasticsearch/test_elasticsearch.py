@@ -4,10 +4,17 @@ from unittest.mock import MagicMock, patch
 from const.data_doc import DataCellType
 
 from logic.elasticsearch import (
+    _bulk,
+    _bulk_insert_index,
+    _get_index_actions,
+    _get_upsert_actions,
     datadocs_to_es,
+    get_table_weights,
     query_cell_to_es,
     query_execution_to_es,
+    recreate_indices,
     table_to_es,
+    update_es_items_by_ids,
     user_to_es,
 )
 
@@ -110,9 +117,19 @@ class QueryTestCaseMixin(TestCase):
 
         self.assertEqual(len(result.items()), len(expected_result.items()))
 
+    def _patch_query_analysis_cache(self):
+        # The query analysis is computed again instead of being cached in redis
+        get_or_set_patch = patch(
+            "lib.utils.tiered_cache.get_or_set",
+            side_effect=lambda key, fn, **kwargs: fn(),
+        )
+        get_or_set_patch.start()
+        self.addCleanup(get_or_set_patch.stop)
+
     def setUp(self):
         self._patch_get_query_engine_by_id()
         self._patch_get_datadoc_editors_by_doc_id()
+        self._patch_query_analysis_cache()
 
 
 class QueryCellTestCase(QueryTestCaseMixin):
@@ -436,6 +453,36 @@ class TableTestCase(TestCase):
         )
         self.assertEqual(self.get_table_weight_mock.call_count, 0)
 
+    def test_precomputed_weight(self):
+        self.assertEqual(
+            table_to_es(
+                self.table_mock,
+                fields=["importance_score"],
+                weight=3,
+                session=MagicMock(),
+            ),
+            {"importance_score": 3},
+        )
+        self.assertEqual(self.get_table_weight_mock.call_count, 0)
+
+    @patch("logic.elasticsearch.get_last_impressions_date")
+    @patch("logic.elasticsearch.get_viewers_count_by_items_after_date")
+    @patch("logic.elasticsearch.get_tables_query_samples_count")
+    def test_get_table_weights(
+        self,
+        get_tables_query_samples_count_mock,
+        get_viewers_count_by_items_after_date_mock,
+        get_last_impressions_date_mock,
+    ):
+        tables = [MagicMock(id=1, boost_score=1), MagicMock(id=2, boost_score=0)]
+        get_tables_query_samples_count_mock.return_value = {1: 3}
+        get_viewers_count_by_items_after_date_mock.return_value = {1: 1, 2: 7}
+
+        # log2(impressions + samples * 10 + 1 + boost_score)
+        self.assertEqual(get_table_weights(tables, session=MagicMock()), {1: 5, 2: 3})
+        self.assertEqual(get_tables_query_samples_count_mock.call_args[0][0], [1, 2])
+        self.assertEqual(get_table_weights([], session=MagicMock()), {})
+
 
 class UserTestCase(TestCase):
     def setUp(self):
@@ -486,3 +533,234 @@ class UserTestCase(TestCase):
                 },
             )
             self.assertEqual(mock_process_names.call_count, 0)
+
+
+class BulkTestCase(TestCase):
+    def setUp(self):
+        get_hosted_es_patch = patch("logic.elasticsearch.get_hosted_es")
+        self.get_hosted_es_mock = get_hosted_es_patch.start()
+        self.addCleanup(get_hosted_es_patch.stop)
+
+        parallel_bulk_patch = patch("logic.elasticsearch.parallel_bulk")
+        self.parallel_bulk_mock = parallel_bulk_patch.start()
+        self.addCleanup(parallel_bulk_patch.stop)
+
+    def test_actions(self):
+        docs = [{"id": 1, "name": "foo"}, {"id": 2, "name": "bar"}]
+        self.assertEqual(
+            list(_get_index_actions(docs)),
+            [{"_id": 1, "_source": docs[0]}, {"_id": 2, "_source": docs[1]}],
+        )
+        self.assertEqual(
+            list(_get_upsert_actions(docs[:1])),
+            [
+                {
+                    "_op_type": "update",
+                    "_id": 1,
+                    "doc": docs[0],
+                    "doc_as_upsert": True,
+                }
+            ],
+        )
+
+    def test_bulk_errors(self):
+        failed_item = {"index": {"_id": 2, "status": 400, "error": "mapping"}}
+        self.parallel_bulk_mock.return_value = iter(
+            [(True, {"index": {"_id": 1}}), (False, failed_item)]
+        )
+        actions = _get_index_actions([{"id": 1}, {"id": 2}])
+        with patch("logic.elasticsearch.LOG"):
+            self.assertEqual(_bulk("tables", actions), (1, [failed_item]))
+
+        self.parallel_bulk_mock.assert_called_once()
+        args, kwargs = self.parallel_bulk_mock.call_args
+        self.assertEqual(args, (self.get_hosted_es_mock.return_value, actions))
+        self.assertEqual(kwargs["index"], "tables")
+        self.assertFalse(kwargs["raise_on_error"])
+
+    def test_bulk_missing_delete(self):
+        # Deleting a document that is not indexed is not an error
+        missing_item = {"delete": {"_id": 1, "status": 404, "result": "not_found"}}
+        self.parallel_bulk_mock.return_value = iter([(False, missing_item)])
+        with patch("logic.elasticsearch.LOG"):
+            self.assertEqual(_bulk("tables", []), (1, []))
+
+
+class UpdateEsItemsByIdsTestCase(TestCase):
+    def setUp(self):
+        bulk_patch = patch("logic.elasticsearch._bulk")
+        self.bulk_mock = bulk_patch.start()
+        self.addCleanup(bulk_patch.stop)
+
+        record_patch = patch("logic.elasticsearch.record_elasticsearch_rebuild_items")
+        self.record_mock = record_patch.start()
+        self.addCleanup(record_patch.stop)
+
+    def get_bulk_actions(self):
+        self.bulk_mock.assert_called_once()
+        index_name, actions = self.bulk_mock.call_args[0]
+        return index_name, list(actions)
+
+    def test_upsert_and_delete(self):
+        docs = {1: {"id": 1}, 2: None, 3: {"id": 3}}
+        with patch.dict(
+            "logic.elasticsearch._get_es_doc_by_item_type",
+            {"users": lambda uid, session=None: docs[uid]},
+        ):
+            update_es_items_by_ids("users", [1, 2, 3], session=MagicMock())
+
+        index_name, actions = self.get_bulk_actions()
+        self.assertEqual(index_name, "search_users_v1")
+        self.assertEqual(
+            actions,
+            [
+                {"_op_type": "update", "_id": 1, "doc": docs[1], "doc_as_upsert": True},
+                {"_op_type": "update", "_id": 3, "doc": docs[3], "doc_as_upsert": True},
+                {"_op_type": "delete", "_id": 2},
+            ],
+        )
+        # Synced again if the index is being rebuilt
+        self.record_mock.assert_called_once_with("users", [1, 2, 3])
+
+    @patch("logic.vector_store.delete_table_doc")
+    @patch("logic.elasticsearch._get_table_es_docs")
+    def test_tables(self, get_table_es_docs_mock, delete_table_doc_mock):
+        get_table_es_docs_mock.return_value = {1: {"id": 1}}
+        update_es_items_by_ids("tables", [1, 2], session=MagicMock())
+
+        _, actions = self.get_bulk_actions()
+        self.assertEqual(
+            [action["_op_type"] for action in actions], ["update", "delete"]
+        )
+        # Deleted tables are removed from the vector store as well
+        delete_table_doc_mock.assert_called_once_with(2)
+
+
+class RecreateIndicesTestCase(TestCase):
+    ES_CONFIG = {
+        "tables": {
+            "index_name": "search_tables_v1",
+            "type_name": "tables",
+            "mappings": {"settings": {"number_of_replicas": 2}, "mappings": {}},
+        }
+    }
+
+    def setUp(self):
+        get_hosted_es_patch = patch("logic.elasticsearch.get_hosted_es")
+        self.es_mock = get_hosted_es_patch.start().return_value
+        self.addCleanup(get_hosted_es_patch.stop)
+
+        es_config_patch = patch("logic.elasticsearch.ES_CONFIG", self.ES_CONFIG)
+        es_config_patch.start()
+        self.addCleanup(es_config_patch.stop)
+
+        bulk_insert_index_patch = patch("logic.elasticsearch._bulk_insert_index")
+        self.bulk_insert_index_mock = bulk_insert_index_patch.start()
+        self.addCleanup(bulk_insert_index_patch.stop)
+
+        time_patch = patch("logic.elasticsearch.time.time", return_value=123)
+        time_patch.start()
+        self.addCleanup(time_patch.stop)
+
+        start_rebuild_patch = patch("logic.elasticsearch.start_elasticsearch_rebuild")
+        self.start_rebuild_mock = start_rebuild_patch.start()
+        self.addCleanup(start_rebuild_patch.stop)
+
+        finish_rebuild_patch = patch("logic.elasticsearch.finish_elasticsearch_rebuild")
+        self.finish_rebuild_mock = finish_rebuild_patch.start()
+        self.addCleanup(finish_rebuild_patch.stop)
+
+    def test_build_and_swap(self):
+        self.es_mock.indices.exists_alias.return_value = True
+        self.es_mock.indices.get_alias.return_value = {
+            "search_tables_v1_100": {"aliases": {"search_tables_v1": {}}}
+        }
+
+        recreate_indices("tables")
+
+        self.es_mock.indices.create.assert_called_once_with(
+            "search_tables_v1_123000",
+            {
+                "settings": {"number_of_replicas": 0, "refresh_interval": "-1"},
+                "mappings": {},
+            },
+        )
+        self.bulk_insert_index_mock.assert_called_once_with(
+            "tables", "search_tables_v1_123000"
+        )
+        self.es_mock.indices.put_settings.assert_called_once_with(
+            body={"index": {"number_of_replicas": 2, "refresh_interval": None}},
+            index="search_tables_v1_123000",
+        )
+        self.es_mock.indices.update_aliases.assert_called_once_with(
+            body={
+                "actions": [
+                    {"remove_index": {"index": "search_tables_v1_100"}},
+                    {
+                        "add": {
+                            "index": "search_tables_v1_123000",
+                            "alias": "search_tables_v1",
+                        }
+                    },
+                ]
+            }
+        )
+        # The config is not modified
+        self.assertEqual(
+            self.ES_CONFIG["tables"]["mappings"]["settings"], {"number_of_replicas": 2}
+        )
+        # Tables synced during the build are synced again to the new index
+        self.start_rebuild_mock.assert_called_once_with("tables")
+        self.finish_rebuild_mock.assert_called_once_with("tables", replay=True)
+
+    def test_replace_index_without_alias(self):
+        self.es_mock.indices.exists_alias.return_value = False
+        self.es_mock.indices.exists.return_value = True
+
+        recreate_indices("tables")
+
+        actions = self.es_mock.indices.update_aliases.call_args[1]["body"]["actions"]
+        self.assertEqual(actions[0], {"remove_index": {"index": "search_tables_v1"}})
+
+    def test_failed_build(self):
+        self.bulk_insert_index_mock.side_effect = Exception("ES is down")
+
+        with self.assertRaises(Exception):
+            recreate_indices("tables")
+
+        self.es_mock.indices.delete.assert_called_once_with(
+            index="search_tables_v1_123000"
+        )
+        self.es_mock.indices.update_aliases.assert_not_called()
+        self.finish_rebuild_mock.assert_called_once_with("tables", replay=False)
+
+    def _build_query_cells_index(self, **bulk_kwargs):
+        es_config = {
+            "index_name": "search_query_cells_v1",
+            "type_name": "query_cells",
+            "mappings": {"settings": {}, "mappings": {}},
+        }
+        self.bulk_insert_index_mock.side_effect = _bulk_insert_index
+        with patch.dict(self.ES_CONFIG, {"query_cells": es_config}), patch(
+            "logic.elasticsearch.get_query_cells_iter", return_value=iter([{"id": 1}])
+        ), patch("logic.elasticsearch._bulk", **bulk_kwargs):
+            recreate_indices("query_cells")
+
+    def test_failed_documents(self):
+        failed_item = {"index": {"_id": 1, "status": 429}}
+        with self.assertRaises(Exception):
+            self._build_query_cells_index(return_value=(0, [failed_item]))
+
+        self.es_mock.indices.delete.assert_called_once_with(
+            index="search_query_cells_v1_123000"
+        )
+        self.es_mock.indices.update_aliases.assert_not_called()
+
+    def test_failed_bulk(self):
+        with self.assertRaises(ConnectionError):
+            self._build_query_cells_index(side_effect=ConnectionError())
+
+        self.es_mock.indices.delete.assert_called_once_with(
+            index="search_query_cells_v1_123000"
+        )
+        self.es_mock.indices.update_aliases.assert_not_called()
@@ -0,0 +1,38 @@
+from unittest import TestCase, mock
+
+from redis.exceptions import RedisError
+
+from const.query_execution import QueryEngineStatus
+from lib.engine_status_checker.select_one_checker import SelectOneChecker
+
+
+class GetServerStatusTestCase(TestCase):
+    def setUp(self):
+        for name, kwargs in (
+            ("get_raw_key", {"side_effect": LookupError()}),
+            ("acquire_lock", {"return_value": "token"}),
+            ("poll_engine_status", {}),
+            ("LOG", {}),
+        ):
+            patch = mock.patch(
+                f"lib.engine_status_checker.base_checker.{name}", **kwargs
+            )
+            setattr(self, f"{name}_mock", patch.start())
+            self.addCleanup(patch.stop)
+
+    def test_queue_check(self):
+        self.assertEqual(
+            SelectOneChecker.get_server_status(1),
+            {"status": QueryEngineStatus.UNAVAILABLE.value, "messages": []},
+        )
+        self.poll_engine_status_mock.delay.assert_called_once_with(
+            SelectOneChecker.NAME(), 1
+        )
+
+    def test_without_redis(self):
+        self.acquire_lock_mock.side_effect = RedisError()
+        self.assertEqual(
+            SelectOneChecker.get_server_status(1),
+            {"status": QueryEngineStatus.UNAVAILABLE.value, "messages": []},
+        )
+        self.poll_engine_status_mock.delay.assert_not_called()
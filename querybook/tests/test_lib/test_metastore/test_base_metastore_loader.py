@@ -0,0 +1,211 @@
+import multiprocessing
+from unittest import TestCase, mock
+
+from const.metastore import DataColumn, DataTable
+from lib.metastore.base_metastore_loader import BaseMetastoreLoader
+
+
+class MockMetastoreLoader(BaseMetastoreLoader):
+    def get_all_schema_names(self):
+        return ["schema"]
+
+    def get_all_table_names_in_schema(self, schema_name):
+        return ["table_a", "table_b", "missing"]
+
+    def get_table_and_columns(self, schema_name, table_name):
+        if table_name == "missing":
+            return None, []
+        return (
+            DataTable(name=table_name, description="description"),
+            [DataColumn(name="col", type="int")],
+        )
+
+    @classmethod
+    def get_metastore_params_template(cls):
+        return None
+
+
+class CreateTablesTestCase(TestCase):
+    def setUp(self):
+        self.loader = MockMetastoreLoader({"id": 1, "acl_control": {}})
+        self.session = mock.MagicMock()
+
+        self.bulk_create_tables_mock = self._patch("bulk_create_tables")
+        self.bulk_create_tables_mock.return_value = (
+            {"table_a": 1, "table_b": 2},
+            {1: {"col": 10}, 2: {"col": 20}},
+            {2},
+        )
+        self.mark_dirty_mock = self._patch("mark_elasticsearch_items_dirty")
+        self.create_table_warnings_mock = self._patch("create_table_warnings")
+
+    def _patch(self, name):
+        patch = mock.patch(f"lib.metastore.base_metastore_loader.{name}")
+        self.addCleanup(patch.stop)
+        return patch.start()
+
+    def test_bulk_create(self):
+        table_ids = self.loader._create_tables_in_schema(
+            1, "schema", ["table_a", "table_b", "missing"], session=self.session
+        )
+        self.assertEqual(table_ids, [1, 2])
+
+        schema_id, tables = self.bulk_create_tables_mock.call_args[0]
+        self.assertEqual(schema_id, 1)
+        self.assertEqual(
+            [table["table"]["name"] for table in tables], ["table_a", "table_b"]
+        )
+        self.assertEqual(tables[0]["table"]["column_count"], 1)
+        self.assertEqual(tables[0]["information"]["description"], "description")
+        self.assertEqual(tables[0]["columns"][0]["name"], "col")
+
+        self.session.commit.assert_called_once()
+        # Only the changed tables are synced to elasticsearch
+        self.mark_dirty_mock.assert_called_once_with("tables", {2})
+
+    def test_fall_back_to_single_table(self):
+        self.bulk_create_tables_mock.side_effect = ValueError()
+        with mock.patch.object(
+            self.loader, "_create_table_table", side_effect=[1, None]
+        ) as create_table_table_mock, mock.patch(
+            "lib.metastore.base_metastore_loader.LOG"
+        ):
+            table_ids = self.loader._create_tables_in_schema(
+                1, "schema", ["table_a", "table_b"], session=self.session
+            )
+        self.session.rollback.assert_called_once()
+        self.assertEqual(create_table_table_mock.call_count, 2)
+        self.assertEqual(table_ids, [1])
+
+    def _create_tables_in_processes(self, progress_callback=None):
+        schema_tables = [
+            (1, "a", "table_1"),
+            (1, "a", "table_2"),
+            (1, "a", "table_3"),
+            (2, "b", "table_4"),
+        ]
+        with mock.patch.object(
+            MockMetastoreLoader,
+            "_create_tables_in_schema",
+            side_effect=lambda schema_id, schema_name, table_names, session: [
+                int(table_name[-1]) for table_name in table_names
+            ],
+        ), mock.patch.object(
+            self.loader,
+            "_get_parallelization_setting",
+            return_value={"num_threads": 1, "min_batch_size": 1, "num_processes": 2},
+        ), mock.patch(
+            "lib.metastore.base_metastore_loader.TABLE_SYNC_BATCH_SIZE", 2
+        ), mock.patch(
+            "lib.metastore.base_metastore_loader.DBSession"
+        ):
+            return self.loader._create_tables_batched(schema_tables, progress_callback)
+
+    def test_create_tables_in_processes(self):
+        progress_callback = mock.MagicMock()
+        table_ids = self._create_tables_in_processes(progress_callback)
+        self.assertEqual(sorted(table_ids), [1, 2, 3, 4])
+        self.assertEqual(progress_callback.call_count, 3)
+        progress_callback.assert_called_with(4, 4)
+
+    def test_create_tables_in_daemonic_process(self):
+        # Such as the processes of prefork celery workers
+        with mock.patch.dict(multiprocessing.current_process()._config, daemon=True):
+            table_ids = self._create_tables_in_processes()
+        self.assertEqual(sorted(table_ids), [1, 2, 3, 4])
+
+    def test_create_tables_in_greenlets_if_processes_fail(self):
+        with mock.patch(
+            "lib.metastore.base_metastore_loader.billiard.get_context",
+            side_effect=OSError(),
+        ), mock.patch("lib.metastore.base_metastore_loader.LOG"):
+            table_ids = self._create_tables_in_processes()
+        self.assertEqual(sorted(table_ids), [1, 2, 3, 4])
+
+    def test_create_tables_by_schema(self):
+        with mock.patch.object(
+            self.loader, "_create_tables_in_schema"
+        ) as create_tables_in_schema_mock, mock.patch(
+            "lib.metastore.base_metastore_loader.TABLE_SYNC_BATCH_SIZE", 2
+        ), mock.patch(
+            "lib.metastore.base_metastore_loader.DBSession"
+        ):
+            self.loader._create_tables(
+                [
+                    (1, "a", "table_1"),
+                    (1, "a", "table_2"),
+                    (1, "a", "table_3"),
+                    (2, "b", "table_4"),
+                ]
+            )
+        self.assertEqual(
+            [call[0] for call in create_tables_in_schema_mock.call_args_list],
+            [
+                (1, "a", ["table_1", "table_2"]),
+                (1, "a", ["table_3"]),
+                (2, "b", ["table_4"]),
+            ],
+        )
+
+
+class LoadTestCase(TestCase):
+    def setUp(self):
+        self.loader = MockMetastoreLoader({"id": 1, "acl_control": {}})
+
+        for name in (
+            "DBSession",
+            "delete_schema_not_in_metastore",
+            "delete_table_not_in_metastore",
+            "create_schema",
+        ):
+            patch = mock.patch(f"lib.metastore.base_metastore_loader.{name}")
+            patch.start()
+            self.addCleanup(patch.stop)
+
+        patch = mock.patch(
+            "lib.metastore.base_metastore_loader.get_table_change_signals_by_schema_id",
+            return_value={"table_a": "1", "table_b": "1"},
+        )
+        patch.start()
+        self.addCleanup(patch.stop)
+
+        patch = mock.patch.object(self.loader, "_create_tables_batched")
+        self.create_tables_batched_mock = patch.start()
+        self.addCleanup(patch.stop)
+
+    def _get_loaded_table_names(self):
+        return [
+            table_name
+            for _, _, table_name in self.create_tables_batched_mock.call_args[0][0]
+        ]
+
+    def test_load_without_change_signals(self):
+        self.create_tables_batched_mock.return_value = [1, 2]
+        stats = self.loader.load()
+        self.assertEqual(
+            self._get_loaded_table_names(), ["table_a", "table_b", "missing"]
+        )
+        self.assertEqual(stats, {"scanned": 3, "skipped": 0, "changed": 3, "failed": 1})
+
+    def test_load_changed_tables(self):
+        with mock.patch.object(
+            self.loader,
+            "get_table_change_signals",
+            return_value={"table_a": "1", "table_b": "2"},
+        ):
+            self.create_tables_batched_mock.return_value = [2]
+            stats = self.loader.load()
+        # table_b changed and missing has no signal
+        self.assertEqual(self._get_loaded_table_names(), ["table_b", "missing"])
+        self.assertEqual(stats, {"scanned": 3, "skipped": 1, "changed": 2, "failed": 1})
+
+    def test_full_load(self):
+        with mock.patch.object(
+            self.loader,
+            "get_table_change_signals",
+            return_value={"table_a": "1", "table_b": "1", "missing": "1"},
+        ) as get_table_change_signals_mock:
+            self.create_tables_batched_mock.return_value = [1, 2]
+            stats = self.loader.load(full_load=True)
+        get_table_change_signals_mock.assert_not_called()
+        self.assertEqual(stats, {"scanned": 3, "skipped": 0, "changed": 3, "failed": 1})
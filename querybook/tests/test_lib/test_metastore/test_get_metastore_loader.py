@@ -0,0 +1,51 @@
+from unittest import TestCase, mock
+
+import lib.metastore
+from lib.metastore import get_metastore_loader, invalidate_metastore_loader
+
+
+class GetMetastoreLoaderTestCase(TestCase):
+    def setUp(self):
+        self.metastore_dict = {
+            "id": 1,
+            "loader": "MockLoader",
+            "metastore_params": {"hms_connection": ["host:9083"]},
+            "acl_control": {},
+        }
+        metastore = mock.MagicMock()
+        metastore.to_dict_admin.side_effect = lambda: dict(self.metastore_dict)
+
+        self.loader_class = mock.MagicMock(
+            shareable=True, side_effect=lambda _: mock.MagicMock()
+        )
+        for name, return_value in (
+            ("get_query_metastore_by_id", metastore),
+            ("get_metastore_loader_class_by_name", self.loader_class),
+        ):
+            patch = mock.patch(f"lib.metastore.{name}", return_value=return_value)
+            patch.start()
+            self.addCleanup(patch.stop)
+
+        patch = mock.patch.object(lib.metastore, "_loaders", {})
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def test_reuse_loader(self):
+        loader = get_metastore_loader(1, session=mock.MagicMock())
+        self.assertIs(get_metastore_loader(1, session=mock.MagicMock()), loader)
+        self.assertEqual(self.loader_class.call_count, 1)
+
+    def test_recreate_loader_on_config_change(self):
+        loader = get_metastore_loader(1, session=mock.MagicMock())
+        self.metastore_dict["metastore_params"] = {"hms_connection": ["other:9083"]}
+        self.assertIsNot(get_metastore_loader(1, session=mock.MagicMock()), loader)
+
+    def test_invalidate_loader(self):
+        loader = get_metastore_loader(1, session=mock.MagicMock())
+        invalidate_metastore_loader(1)
+        self.assertIsNot(get_metastore_loader(1, session=mock.MagicMock()), loader)
+
+    def test_loader_not_shareable(self):
+        self.loader_class.shareable = False
+        loader = get_metastore_loader(1, session=mock.MagicMock())
+        self.assertIsNot(get_metastore_loader(1, session=mock.MagicMock()), loader)
@@ -0,0 +1,109 @@
+from unittest import TestCase, mock
+
+from lib.query_analysis import analysis
+from lib.query_analysis.analysis import QueryAnalysis, get_query_analysis
+
+
+class QueryAnalysisTestCase(TestCase):
+    def test_analysis(self):
+        query_analysis = QueryAnalysis(
+            "insert into a select * from b;\n-- comment\nselect * from c;"
+        )
+        self.assertEqual(query_analysis.statement_ranges, [(0, 29), (42, 57)])
+        self.assertEqual(
+            query_analysis.statements,
+            ["insert into a select * from b", "select * from c"],
+        )
+        self.assertEqual(query_analysis.statement_types, ["INSERT", "SELECT"])
+        self.assertEqual(
+            [sorted(tables) for tables in query_analysis.table_per_statement],
+            [["default.a", "default.b"], ["default.c"]],
+        )
+        self.assertEqual(
+            query_analysis.lineage_per_statement,
+            [[{"source": "default.b", "target": "default.a"}], []],
+        )
+
+    def test_process_query_once(self):
+        query_analysis = QueryAnalysis("select * from a", "presto")
+        with mock.patch(
+            "lib.query_analysis.lineage.process_query",
+            return_value=([["default.a"]], [[]]),
+        ) as process_query_mock:
+            self.assertEqual(query_analysis.tables, ["default.a"])
+            self.assertEqual(query_analysis.lineage_per_statement, [[]])
+        process_query_mock.assert_called_once_with("select * from a", "presto")
+
+
+class GetQueryAnalysisTestCase(TestCase):
+    def setUp(self):
+        analysis._local_cache.clear()
+        self.addCleanup(analysis._local_cache.clear)
+
+    def test_memoized_by_query_and_language(self):
+        with mock.patch(
+            "lib.query_analysis.lineage.get_table_statement_type",
+            return_value=["SELECT"],
+        ) as get_table_statement_type_mock:
+            get_query_analysis("select * from a", "presto").statement_types
+            get_query_analysis("select * from a", "presto").statement_types
+            self.assertEqual(get_table_statement_type_mock.call_count, 1)
+
+            get_query_analysis("select * from a", "hive").statement_types
+            get_query_analysis("select * from b", "presto").statement_types
+            self.assertEqual(get_table_statement_type_mock.call_count, 3)
+
+    def test_memoized_by_backend(self):
+        query_analysis = get_query_analysis("select * from a", "presto")
+        with mock.patch(
+            "lib.query_analysis.analysis.QuerybookSettings.QUERY_ANALYSIS_BACKEND",
+            "sqlglot",
+        ):
+            sqlglot_analysis = get_query_analysis("select * from a", "presto")
+        self.assertNotEqual(sqlglot_analysis._key, query_analysis._key)
+        self.assertIsNot(sqlglot_analysis._values, query_analysis._values)
+
+    def mock_get_or_set(self):
+        self.cache = {}
+
+        def get_or_set(key, fn, expires_after=None):
+            if key not in self.cache:
+                self.cache[key] = fn()
+            return self.cache[key]
+
+        return mock.patch("lib.utils.tiered_cache.get_or_set", side_effect=get_or_set)
+
+    def test_persist_after_local_analysis(self):
+        with self.mock_get_or_set():
+            statement_types = get_query_analysis("select * from a").statement_types
+            self.assertEqual(len(self.cache), 0)
+
+            # The value computed without persist is stored without computing it again
+            with mock.patch(
+                "lib.query_analysis.lineage.get_table_statement_type"
+            ) as get_table_statement_type_mock:
+                self.assertEqual(
+                    get_query_analysis("select * from a", persist=True).statement_types,
+                    statement_types,
+                )
+            get_table_statement_type_mock.assert_not_called()
+            self.assertEqual(list(self.cache.values()), [statement_types])
+
+    def test_persist(self):
+        with self.mock_get_or_set():
+            statement_types = get_query_analysis(
+                "select * from a", persist=True
+            ).statement_types
+            # Only the accessed results are computed
+            self.assertEqual(len(self.cache), 1)
+
+            # Another process only has the results in redis
+            analysis._local_cache.clear()
+            with mock.patch(
+                "lib.query_analysis.lineage.get_table_statement_type"
+            ) as get_table_statement_type_mock:
+                self.assertEqual(
+                    get_query_analysis("select * from a", persist=True).statement_types,
+                    statement_types,
+                )
+            get_table_statement_type_mock.assert_not_called()
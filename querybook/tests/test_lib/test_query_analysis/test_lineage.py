@@ -1,6 +1,7 @@
-from unittest import TestCase
+from unittest import TestCase, mock
 from lib.query_analysis.lineage import (
     process_query,
+    process_query_with_sqlglot,
     tokenize_by_statement,
     get_statement_placeholders,
     get_statement_schema,
@@ -94,6 +95,60 @@ FROM
         self.assertEqual(process_query("\n\n;\n\n;\n\n"), ([[], []], [[], []]))
 
 
+class SqlglotProcessQueryTestCase(ProcessQueryTestCase):
+    """Same cases as ProcessQueryTestCase with the sqlglot backend"""
+
+    def setUp(self):
+        patch = mock.patch(
+            "lib.query_analysis.lineage.QuerybookSettings.QUERY_ANALYSIS_BACKEND",
+            "sqlglot",
+        )
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def test_nested_cte_and_subquery(self):
+        query = """
+            WITH a AS (SELECT * FROM x),
+            b AS (
+                WITH c AS (SELECT * FROM a)
+                SELECT * FROM c JOIN (SELECT * FROM s.y) t ON c.id = t.id
+            )
+            INSERT INTO s.t SELECT * FROM b WHERE id IN (SELECT id FROM z)
+        """
+        table_per_statement, lineage_per_statement = process_query(query, "presto")
+        self.assertCountEqual(
+            table_per_statement[0], ["s.t", "default.x", "s.y", "default.z"]
+        )
+        self.assertCountEqual(
+            lineage_per_statement[0],
+            [
+                {"source": "default.x", "target": "s.t"},
+                {"source": "s.y", "target": "s.t"},
+                {"source": "default.z", "target": "s.t"},
+            ],
+        )
+
+    def test_statements(self):
+        query = """
+            create database test;
+            drop table test.a;
+            msck repair table b;
+            insert into c (id) values (1);
+            create table d as select * from e
+        """
+        table_per_statement, lineage_per_statement = process_query_with_sqlglot(
+            query, "hive"
+        )
+        self.assertEqual(
+            table_per_statement,
+            [[], ["test.a"], ["default.b"], ["default.c"], mock.ANY],
+        )
+        self.assertCountEqual(table_per_statement[4], ["default.d", "default.e"])
+        self.assertEqual(
+            lineage_per_statement[4], [{"source": "default.e", "target": "default.d"}]
+        )
+
+
 class TokenizeByStatementTestCase(TestCase):
     def test_tokenize_by_statement(self):
         raw_query = """
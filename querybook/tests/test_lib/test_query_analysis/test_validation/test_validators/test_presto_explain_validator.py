@@ -1,4 +1,7 @@
-from unittest import TestCase
+from unittest import TestCase, mock
+
+from pyhive.exc import DatabaseError
+
 from lib.query_analysis.validation.validators.presto_explain_validator import (
     PrestoExplainValidator,
 )
@@ -49,3 +52,75 @@ class MapStatementErrorToQueryTestCase(TestCase):
         )
         self.assertEqual(validation_result.start_line, 1)
         self.assertEqual(validation_result.start_ch, 5)
+
+
+class ValidateTestCase(TestCase):
+    def setUp(self) -> None:
+        super().setUp()
+
+        self._validator = PrestoExplainValidator("")
+        self._cache = {}
+        self._run_statement_mock = mock.MagicMock(side_effect=self._run_statement)
+
+        for name, kwargs in (
+            ("DBSession", {}),
+            ("get_query_engine_by_id", {}),
+            ("get_table_by_name", {"return_value": None}),
+        ):
+            patch = mock.patch(
+                "lib.query_analysis.validation.validators.presto_explain_validator."
+                + name,
+                **kwargs,
+            )
+            patch.start()
+            self.addCleanup(patch.stop)
+
+        for name, side_effect in (
+            ("_get_client", lambda engine, uid, session: mock.MagicMock()),
+            ("_run_validation_statement", self._run_statement_mock),
+        ):
+            patch = mock.patch.object(self._validator, name, side_effect=side_effect)
+            patch.start()
+            self.addCleanup(patch.stop)
+
+        patch = mock.patch(
+            "lib.query_analysis.validation.validators.presto_explain_validator."
+            "tiered_cache.get_or_set",
+            side_effect=self._get_or_set,
+        )
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def _get_or_set(self, key, fn, expires_after=None, args=[]):
+        if key not in self._cache:
+            self._cache[key] = fn(*args)
+        return self._cache[key]
+
+    def _run_statement(self, statement, client):
+        if "select 2" in statement:
+            raise DatabaseError(
+                {
+                    "message": "error",
+                    "errorLocation": {"lineNumber": 2, "columnNumber": 3},
+                }
+            )
+
+    def test_validate(self):
+        validation_results = self._validator.validate(
+            "select 1; select 2;\nselect 3", uid=1, engine_id=1
+        )
+        self.assertEqual(self._run_statement_mock.call_count, 3)
+        self.assertEqual(len(validation_results), 1)
+        self.assertEqual(validation_results[0].start_line, 0)
+        self.assertEqual(validation_results[0].start_ch, 12)
+        self.assertEqual(validation_results[0].message, "error")
+
+    def test_cache_unchanged_statements(self):
+        self._validator.validate("select 1; select 2", uid=1, engine_id=1)
+        validation_results = self._validator.validate(
+            "select 1; select 2;\nselect 3", uid=1, engine_id=1
+        )
+        # Only the new statement is explained
+        self.assertEqual(self._run_statement_mock.call_count, 3)
+        self.assertEqual(len(validation_results), 1)
+        self.assertEqual(validation_results[0].start_ch, 12)
@@ -1,5 +1,11 @@
-from unittest import TestCase
-from lib.query_executor.base_executor import QueryExecutorBaseClass
+from unittest import TestCase, mock
+
+from lib.query_executor.base_executor import (
+    STATEMENT_UPDATE_FLUSH_INTERVAL,
+    STATEMENT_UPDATE_FLUSH_LOG_SIZE,
+    QueryExecutorBaseClass,
+    QueryExecutorLogger,
+)
 
 
 class QueryExecutorBaseMatchTestCase(TestCase):
@@ -31,3 +37,74 @@ class QueryExecutorBaseMatchTestCase(TestCase):
         self.assertTrue(TestEngine.match("French", "Test"))
         self.assertFalse(TestEngine.match("English", "Prod"))
         self.assertFalse(TestEngine.match("Spanish", "Test"))
+
+
+class QueryExecutorLoggerTestCase(TestCase):
+    def setUp(self):
+        for name in ["qe_logic", "DBSession", "socketio"]:
+            patcher = mock.patch(f"lib.query_executor.base_executor.{name}")
+            setattr(self, f"{name}_mock", patcher.start())
+            self.addCleanup(patcher.stop)
+
+        time_patch = mock.patch("lib.query_executor.base_executor.time.time")
+        self.time_mock = time_patch.start()
+        self.time_mock.return_value = 1000
+        self.addCleanup(time_patch.stop)
+
+        self.celery_task = mock.MagicMock()
+        self.logger = QueryExecutorLogger(1, self.celery_task, "select 1", [[0, 8]])
+        self.logger.statement_execution_ids.append(2)
+        self.socketio_mock.emit.reset_mock()
+        self.DBSession_mock.reset_mock()
+
+    def get_statement_updates(self):
+        return [
+            call.args[1]
+            for call in self.socketio_mock.emit.call_args_list
+            if call.args[0] == "statement_update"
+        ]
+
+    def test_buffered_updates(self):
+        self.logger.on_statement_update(log="a", percent_complete=10)
+        # Updates within the flush interval are buffered
+        self.time_mock.return_value += 1
+        self.logger.on_statement_update(log="b", percent_complete=20)
+        self.logger.on_statement_update(log="c", meta_info="url")
+        self.assertEqual(
+            self.get_statement_updates(),
+            [{"query_execution_id": 1, "id": 2, "log": ["a"], "percent_complete": 10}],
+        )
+
+        self.time_mock.return_value += 1
+        self.logger.on_statement_update()
+        self.assertEqual(
+            self.get_statement_updates()[1],
+            {
+                "query_execution_id": 1,
+                "id": 2,
+                "log": ["b\nc"],
+                "meta_info": "url",
+                "percent_complete": 20,
+            },
+        )
+        # One transaction per flush
+        self.assertEqual(self.DBSession_mock.return_value.__enter__.call_count, 2)
+        self.assertEqual(self.celery_task.update_state.call_count, 2)
+
+    def test_flush_on_log_size(self):
+        self.logger.on_statement_update(log="a")
+        self.logger.on_statement_update(log="b" * STATEMENT_UPDATE_FLUSH_LOG_SIZE)
+        self.assertEqual(len(self.get_statement_updates()), 2)
+
+    def test_no_change(self):
+        self.logger.on_statement_update(percent_complete=10)
+        self.time_mock.return_value += STATEMENT_UPDATE_FLUSH_INTERVAL
+        self.logger.on_statement_update(percent_complete=10)
+        self.assertEqual(len(self.get_statement_updates()), 1)
+
+    def test_flush_on_exception(self):
+        self.logger.on_statement_update(log="a")
+        self.logger.on_statement_update(log="b")
+        with mock.patch.object(self.logger, "_upload_log", return_value=(None, False)):
+            self.logger.on_exception(0, "error", None)
+        self.assertEqual(self.get_statement_updates()[-1]["log"], ["b"])
@@ -0,0 +1,25 @@
+from unittest import TestCase
+
+from lib.query_executor.poll_policy import PollPolicy
+
+
+class PollPolicyTestCase(TestCase):
+    def test_backoff(self):
+        policy = PollPolicy(min_interval=1, max_interval=5, multiplier=2, jitter=0)
+        self.assertEqual([policy.next_interval() for _ in range(5)], [1, 2, 4, 5, 5])
+
+    def test_reset(self):
+        policy = PollPolicy(min_interval=1, max_interval=5, multiplier=2, jitter=0)
+        policy.next_interval()
+        policy.next_interval()
+        policy.reset()
+        self.assertEqual(policy.next_interval(), 1)
+
+    def test_jitter(self):
+        policy = PollPolicy(min_interval=1, max_interval=1, jitter=0.1)
+        for _ in range(100):
+            self.assertTrue(0.9 <= policy.next_interval() <= 1.1)
+
+    def test_max_below_min(self):
+        policy = PollPolicy(min_interval=3, max_interval=1, jitter=0)
+        self.assertEqual([policy.next_interval() for _ in range(2)], [3, 3])
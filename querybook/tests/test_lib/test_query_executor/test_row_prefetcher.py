@@ -0,0 +1,50 @@
+from unittest import TestCase, mock
+
+from lib.query_executor.row_prefetcher import RowPrefetcher
+
+
+class MockCursor(object):
+    def __init__(self, num_rows: int, fail_at_batch: int = None):
+        self.rows = [[i] for i in range(num_rows)]
+        self.num_fetches = 0
+        self.fail_at_batch = fail_at_batch
+
+    def get_n_rows(self, n: int):
+        if self.num_fetches == self.fail_at_batch:
+            raise ValueError("Fetch failed")
+        self.num_fetches += 1
+        rows, self.rows = self.rows[:n], self.rows[n:]
+        return rows
+
+
+class RowPrefetcherTestCase(TestCase):
+    def test_fetch_all_rows(self):
+        for queue_size in (0, 1, 3):
+            cursor = MockCursor(10)
+            with RowPrefetcher(cursor, queue_size, fetch_size=3) as prefetcher:
+                batches = list(prefetcher.get_batches_iter())
+            self.assertEqual(
+                batches, [[[0], [1], [2]], [[3], [4], [5]], [[6], [7], [8]], [[9]]]
+            )
+
+    def test_no_rows(self):
+        with RowPrefetcher(MockCursor(0), 2) as prefetcher:
+            self.assertEqual(list(prefetcher.get_batches_iter()), [])
+
+    def test_fetch_error(self):
+        cursor = MockCursor(10, fail_at_batch=2)
+        with mock.patch("lib.query_executor.row_prefetcher.LOG"):
+            with RowPrefetcher(cursor, 2, fetch_size=3) as prefetcher:
+                batches_iter = prefetcher.get_batches_iter()
+                self.assertEqual(next(batches_iter), [[0], [1], [2]])
+                self.assertEqual(next(batches_iter), [[3], [4], [5]])
+                with self.assertRaises(ValueError):
+                    next(batches_iter)
+
+    def test_stop_early(self):
+        cursor = MockCursor(100)
+        with mock.patch("lib.query_executor.row_prefetcher.PUT_TIMEOUT_SEC", 0.01):
+            with RowPrefetcher(cursor, 1, fetch_size=3) as prefetcher:
+                self.assertEqual(next(prefetcher.get_batches_iter()), [[0], [1], [2]])
+        # The fetching stops once the queue is full instead of reading everything
+        self.assertLess(cursor.num_fetches, 5)
@@ -0,0 +1,52 @@
+from unittest import TestCase, mock
+
+from lib.result_store import delete_results
+
+
+class DeleteResultsTestCase(TestCase):
+    def test_delete_by_store(self):
+        s3_store = mock.MagicMock()
+        s3_store.uploader.delete.return_value = 3
+        db_store = mock.MagicMock()
+        db_store.uploader.supports_delete.return_value = False
+        with mock.patch.dict(
+            "lib.result_store.ALL_RESULT_STORES",
+            {"s3": s3_store, "db": db_store},
+            clear=True,
+        ):
+            deleted_count = delete_results(
+                [
+                    "s3://querybook_temp/1/result.csv",
+                    "s3://querybook_temp/1/log.txt",
+                    "db://querybook_temp/2/result.csv",
+                    "stream://",
+                    "unknown://querybook_temp/3/result.csv",
+                ]
+            )
+
+        self.assertEqual(deleted_count, 3)
+        # Row indices are deleted along with the results
+        s3_store.uploader.delete.assert_called_once_with(
+            [
+                "querybook_temp/1/result.csv",
+                "querybook_temp/1/result.csv.index",
+                "querybook_temp/1/log.txt",
+            ]
+        )
+        db_store.uploader.delete.assert_not_called()
+
+    def test_delete_listed_row_index(self):
+        file_store = mock.MagicMock()
+        with mock.patch.dict(
+            "lib.result_store.ALL_RESULT_STORES", {"file": file_store}, clear=True
+        ):
+            delete_results(
+                [
+                    "file://querybook_temp/1/result.arrow",
+                    "file://querybook_temp/1/result.arrow.index",
+                ]
+            )
+
+        file_store.uploader.delete.assert_called_once_with(
+            ["querybook_temp/1/result.arrow", "querybook_temp/1/result.arrow.index"]
+        )
@@ -0,0 +1,99 @@
+import tempfile
+from unittest import TestCase, mock
+
+from lib.result_store import GenericReader
+from lib.result_store.serializers.arrow_serializer import ArrowResultSerializer
+from lib.result_store.stores.file_store import FileUploader
+
+COLUMNS = ["id", "name"]
+ROWS = [[i, f"名字 {i},\n" if i % 2 else f"name {i}"] for i in range(20)]
+RAW_CSV = 'id,name\n0,name 0\n1,"名字 1,\n"\n2,name 2\n'
+
+
+class GetDownloadIterTestCase(TestCase):
+    def setUp(self):
+        store_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(store_dir.cleanup)
+        file_store_path_patch = mock.patch(
+            "lib.result_store.stores.file_store.FILE_STORE_PATH", store_dir.name + "/"
+        )
+        file_store_path_patch.start()
+        self.addCleanup(file_store_path_patch.stop)
+
+        read_size_patch = mock.patch(
+            "lib.result_store.QuerybookSettings.STORE_READ_SIZE", 4
+        )
+        read_size_patch.start()
+        self.addCleanup(read_size_patch.stop)
+
+    def upload_result(self, uri: str, data):
+        with FileUploader(uri) as uploader:
+            uploader.write(data)
+        return "file://" + uri
+
+    def test_csv(self):
+        uri = self.upload_result("querybook_test/result.csv", RAW_CSV)
+        raw_bytes = RAW_CSV.encode("utf-8")
+        with GenericReader(uri) as reader:
+            self.assertEqual(reader.get_download_size(), len(raw_bytes))
+            chunks = list(reader.get_download_iter())
+            self.assertTrue(all(len(chunk) <= 4 for chunk in chunks))
+            self.assertEqual(b"".join(chunks), raw_bytes)
+
+    def test_csv_range(self):
+        uri = self.upload_result("querybook_test/result.csv", RAW_CSV)
+        raw_bytes = RAW_CSV.encode("utf-8")
+        with GenericReader(uri) as reader:
+            for start, end in [(0, 1), (3, 20), (17, len(raw_bytes))]:
+                self.assertEqual(
+                    b"".join(reader.get_download_iter(start, end)),
+                    raw_bytes[start:end],
+                )
+
+    def test_arrow(self):
+        serializer = ArrowResultSerializer()
+        data = serializer.serialize_columns(COLUMNS)
+        data += serializer.serialize_rows(ROWS)
+        data += serializer.end()
+        uri = self.upload_result("querybook_test/result.arrow", data)
+
+        with GenericReader(uri) as reader:
+            # The converted csv size is not known until it is read
+            self.assertIsNone(reader.get_download_size())
+            self.assertEqual(
+                b"".join(reader.get_download_iter()).decode("utf-8"),
+                reader.read_raw(),
+            )
+
+    def test_arrow_stream_closed(self):
+        serializer = ArrowResultSerializer()
+        data = serializer.serialize_columns(COLUMNS)
+        data += serializer.serialize_rows(ROWS)
+        data += serializer.end()
+        uri = self.upload_result("querybook_test/result.arrow", data)
+
+        with GenericReader(uri) as reader:
+            streams = []
+            open_binary_stream = reader._reader.open_binary_stream
+
+            def open_stream(*args):
+                streams.append(open_binary_stream(*args))
+                return streams[-1]
+
+            with mock.patch.object(
+                reader._reader, "open_binary_stream", side_effect=open_stream
+            ):
+                self.assertEqual(len(list(reader.get_csv_iter(None))), 21)
+            self.assertEqual(len(streams), 1)
+            self.assertTrue(streams[0].closed)
+
+    def test_arrow_read_lines(self):
+        serializer = ArrowResultSerializer()
+        data = serializer.serialize_columns(COLUMNS)
+        data += serializer.serialize_rows(ROWS)
+        data += serializer.end()
+        uri = self.upload_result("querybook_test/result.arrow", data)
+
+        with GenericReader(uri) as reader:
+            lines = reader.read_lines(3)
+        self.assertEqual(lines, ["id,name", "0,name 0", '1,"名字 1,\n"'])
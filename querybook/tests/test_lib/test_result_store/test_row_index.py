@@ -0,0 +1,112 @@
+import datetime
+import tempfile
+from unittest import TestCase, mock
+
+from lib.result_store import GenericReader
+from lib.result_store.row_index import ResultRowIndex, get_row_index_uri
+from lib.result_store.serializers.arrow_serializer import ArrowResultSerializer
+from lib.result_store.serializers.csv_serializer import CSVResultSerializer
+from lib.result_store.stores.file_store import FileUploader
+from lib.utils.csv import string_to_csv, row_to_csv
+
+COLUMNS = ["id", "name", "created_at"]
+ROWS = [
+    [i, f"name {i},\n中文" if i % 2 else f"name {i}", datetime.datetime(2020, 1, i + 1)]
+    for i in range(10)
+]
+EXPECTED_CSV = string_to_csv("".join(row_to_csv(row) for row in [COLUMNS] + ROWS))
+
+
+class ResultRowIndexTestCase(TestCase):
+    def test_add_data(self):
+        row_index = ResultRowIndex(interval=3)
+        row_index.add_data("a,b\n")
+        for _ in range(4):
+            row_index.add_data("中,b\n", 1)
+        row_index.add_data(b"12345", 4)
+        row_index.add_data(b"12", 1)
+
+        self.assertEqual(row_index.rows, [0, 3, 8])
+        self.assertEqual(row_index.offsets, [4, 22, 33])
+
+    def test_find(self):
+        row_index = ResultRowIndex(header=b"a,b\n", rows=[0, 3, 6], offsets=[4, 9, 20])
+        self.assertEqual(row_index.find(0), (0, 4))
+        self.assertEqual(row_index.find(4), (3, 9))
+        self.assertEqual(row_index.find(100), (6, 20))
+
+    def test_json(self):
+        row_index = ResultRowIndex(header=b"\x00\xff", rows=[0, 3], offsets=[0, 9])
+        loaded_row_index = ResultRowIndex.from_json(row_index.to_json())
+        self.assertEqual(loaded_row_index.header, b"\x00\xff")
+        self.assertEqual(loaded_row_index.rows, [0, 3])
+        # Rows start after the header
+        self.assertEqual(loaded_row_index.offsets, [2, 9])
+
+
+class GetCSVIterFromRowTestCase(TestCase):
+    def setUp(self):
+        store_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(store_dir.cleanup)
+        file_store_path_patch = mock.patch(
+            "lib.result_store.stores.file_store.FILE_STORE_PATH", store_dir.name + "/"
+        )
+        file_store_path_patch.start()
+        self.addCleanup(file_store_path_patch.stop)
+
+    def upload_result(
+        self, uri: str, serializer, batch_size: int, with_index: bool = True
+    ):
+        row_index = ResultRowIndex(interval=3)
+        with FileUploader(uri) as uploader:
+            with open(uploader.uri, "wb"):
+                pass
+
+            data = serializer.serialize_columns(COLUMNS)
+            uploader.write(data)
+            row_index.add_data(data)
+            for i in range(0, len(ROWS), batch_size):
+                rows = ROWS[i : i + batch_size]
+                data = serializer.serialize_rows(rows)
+                uploader.write(data)
+                row_index.add_data(data, len(rows))
+            uploader.write(serializer.end())
+
+        row_index.header = serializer.header
+        with FileUploader(get_row_index_uri(uri)) as index_uploader:
+            with open(index_uploader.uri, "w"):
+                pass
+            if with_index:
+                index_uploader.write(row_index.to_json())
+        return "file://" + uri
+
+    def assert_pages(self, uri: str):
+        for offset in range(len(ROWS) + 1):
+            for limit in (1, 2, 5, None):
+                with GenericReader(uri) as reader:
+                    self.assertEqual(
+                        list(reader.get_csv_iter_from_row(offset, limit)),
+                        [EXPECTED_CSV[0]]
+                        + EXPECTED_CSV[1 + offset :][
+                            : None if limit is None else limit - 1
+                        ],
+                    )
+
+    def test_csv(self):
+        self.assert_pages(
+            self.upload_result("querybook_test/result.csv", CSVResultSerializer(), 1)
+        )
+
+    def test_csv_without_index(self):
+        self.assert_pages(
+            self.upload_result(
+                "querybook_test/result.csv", CSVResultSerializer(), 1, False
+            )
+        )
+
+    def test_arrow(self):
+        self.assert_pages(
+            self.upload_result(
+                "querybook_test/result.arrow", ArrowResultSerializer(), 3
+            )
+        )
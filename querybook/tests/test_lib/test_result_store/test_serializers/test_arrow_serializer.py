@@ -0,0 +1,96 @@
+import datetime
+from io import BytesIO
+from unittest import TestCase
+
+from lib.result_store.serializers.arrow_serializer import ArrowResultSerializer
+from lib.utils.csv import string_to_csv, row_to_csv
+
+
+def serialize_result(columns, rows, batch_size=2):
+    serializer = ArrowResultSerializer()
+    data = serializer.serialize_columns(columns)
+    for i in range(0, len(rows), batch_size):
+        data += serializer.serialize_rows(rows[i : i + batch_size])
+    data += serializer.end()
+    return data
+
+
+def serialize_result_as_csv(columns, rows):
+    return string_to_csv("".join(row_to_csv(row) for row in [columns] + rows))
+
+
+class ArrowResultSerializerTestCase(TestCase):
+    columns = ["name", "count", "ratio", "is_valid", "created_at", "ds", "info", "id"]
+    rows = [
+        [
+            "foo",
+            1,
+            0.5,
+            True,
+            datetime.datetime(2020, 1, 2, 3, 4, 5),
+            None,
+            [1, 2],
+            2**70,
+        ],
+        ['hello "world"\n,', None, 1.0, False, None, datetime.date(2020, 1, 2), {}, 1],
+        [None, 2, float("nan"), None, None, None, "text", 2],
+        ["中文", 3, 2.25, True, None, datetime.date(2021, 5, 6), None, None],
+    ]
+
+    def test_same_result_as_csv(self):
+        data = serialize_result(self.columns, self.rows)
+        self.assertEqual(
+            list(ArrowResultSerializer.deserialize(BytesIO(data))),
+            serialize_result_as_csv(self.columns, self.rows),
+        )
+
+    def test_column_types_kept(self):
+        import pyarrow as pa
+
+        data = serialize_result(self.columns, self.rows)
+        schema = pa.ipc.open_stream(BytesIO(data)).schema
+        self.assertEqual(
+            schema.types,
+            [
+                pa.string(),
+                pa.int64(),
+                pa.float64(),
+                pa.bool_(),
+                pa.timestamp("us"),
+                pa.date32(),
+                pa.string(),
+                pa.string(),
+            ],
+        )
+
+    def test_no_rows(self):
+        data = serialize_result(["a", "b"], [])
+        self.assertEqual(
+            list(ArrowResultSerializer.deserialize(BytesIO(data))), [["a", "b"]]
+        )
+
+    def test_column_type_changed(self):
+        columns = ["a", "b", "c", "d"]
+        rows = [
+            [1, 1, "x", True],
+            [2, 2, "y", False],
+            # The types of the first batch no longer fit
+            [1.5, 2**70, 3, 1],
+            ["foo", 3, None, None],
+        ]
+        data = serialize_result(columns, rows)
+        self.assertEqual(
+            list(ArrowResultSerializer.deserialize(BytesIO(data))),
+            serialize_result_as_csv(columns, rows),
+        )
+
+    def test_column_type_changed_header(self):
+        serializer = ArrowResultSerializer()
+        serializer.serialize_columns(["a"])
+        serializer.serialize_rows([[1], [2]])
+        serializer.serialize_rows([[3], [None]])
+        self.assertIsNotNone(serializer.header)
+
+        # The header cannot be used to read the rows after the type changed
+        serializer.serialize_rows([[0.5]])
+        self.assertIsNone(serializer.header)
@@ -1,3 +1,5 @@
+import os
+import tempfile
 from unittest import TestCase, mock
 from lib.result_store.stores.file_store import (
     FileUploader,
@@ -102,3 +104,36 @@ class FileReaderTestCase(TestCase):
         with mock.patch("builtins.open", mock.mock_open(read_data=self.mock_raw_csv)):
             reader = FileReader("test")
             self.assertEqual(reader.read_csv(None), self.mock_csv)
+
+
+class FileDeleteTestCase(TestCase):
+    def test_delete(self):
+        with tempfile.TemporaryDirectory() as store_dir:
+            with mock.patch(
+                "lib.result_store.stores.file_store.FILE_STORE_PATH", store_dir + "/"
+            ):
+                for uri in ["1/result.csv", "1/log.txt", "2/result.csv"]:
+                    with FileUploader(uri) as uploader:
+                        uploader.write("data")
+
+                self.assertEqual(
+                    FileUploader.delete(["1/result.csv", "2/result.csv", "3/log.txt"]),
+                    2,
+                )
+                self.assertEqual(os.listdir(store_dir), ["1"])
+                self.assertEqual(os.listdir(os.path.join(store_dir, "1")), ["log.txt"])
+
+    def test_list_uris(self):
+        with tempfile.TemporaryDirectory() as store_dir:
+            with mock.patch(
+                "lib.result_store.stores.file_store.FILE_STORE_PATH", store_dir + "/"
+            ):
+                for uri in ["temp/1/result.csv", "temp/2/log.txt", "other/log.txt"]:
+                    with FileUploader(uri) as uploader:
+                        uploader.write("data")
+
+                self.assertEqual(
+                    list(FileUploader.list_uris("temp/")),
+                    ["temp/1/result.csv", "temp/2/log.txt"],
+                )
+                self.assertEqual(list(FileUploader.list_uris("missing/")), [])
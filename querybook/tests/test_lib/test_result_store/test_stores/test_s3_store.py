@@ -1,6 +1,10 @@
 from unittest import TestCase, mock
+
+from botocore.exceptions import EndpointConnectionError
+
+from clients.s3_client import MultiPartUploader, delete_keys, list_keys
 from env import QuerybookSettings
-from lib.result_store.stores.s3_store import S3Reader
+from lib.result_store.stores.s3_store import S3Reader, S3Uploader
 
 
 class S3FileReaderTestCase(TestCase):
@@ -28,3 +32,147 @@ class S3FileReaderTestCase(TestCase):
             self.s3_file_reader_mock.assert_called_once_with(
                 QuerybookSettings.STORE_BUCKET_NAME, reader.uri, max_read_size=5
             )
+
+
+class MultiPartUploaderTestCase(TestCase):
+    def setUp(self):
+        boto3_client_patch = mock.patch("clients.s3_client.boto3.client")
+        self.addCleanup(boto3_client_patch.stop)
+        self.s3_mock = boto3_client_patch.start().return_value
+        self.s3_mock.create_multipart_upload.return_value = {"UploadId": "upload_id"}
+        self.s3_mock.upload_part.side_effect = lambda PartNumber, **kwargs: {
+            "ETag": f'"etag_{PartNumber}"'
+        }
+
+        sleep_patch = mock.patch("clients.s3_client.time.sleep")
+        self.addCleanup(sleep_patch.stop)
+        sleep_patch.start()
+
+        chunk_size_patch = mock.patch.object(
+            QuerybookSettings, "STORE_MIN_UPLOAD_CHUNK_SIZE", 2
+        )
+        self.addCleanup(chunk_size_patch.stop)
+        chunk_size_patch.start()
+
+    def upload(self, data, max_concurrency=2):
+        uploader = MultiPartUploader(
+            "bucket", "key", max_concurrency=max_concurrency, max_part_retries=1
+        )
+        for string in data:
+            uploader.write(string)
+        uploader.complete()
+
+    def test_parts_in_order(self):
+        self.upload(["abc", b"def", "gh"], max_concurrency=3)
+
+        self.assertCountEqual(
+            [call.kwargs["Body"] for call in self.s3_mock.upload_part.call_args_list],
+            [b"abc", b"def", b"gh"],
+        )
+        self.s3_mock.complete_multipart_upload.assert_called_once_with(
+            Bucket="bucket",
+            Key="key",
+            UploadId="upload_id",
+            MultipartUpload={
+                "Parts": [
+                    {"PartNumber": 1, "ETag": "etag_1"},
+                    {"PartNumber": 2, "ETag": "etag_2"},
+                    {"PartNumber": 3, "ETag": "etag_3"},
+                ]
+            },
+        )
+
+    def test_retry_failed_part(self):
+        failed_parts = set()
+
+        def upload_part(PartNumber, **kwargs):
+            if PartNumber not in failed_parts:
+                failed_parts.add(PartNumber)
+                raise EndpointConnectionError(endpoint_url="s3")
+            return {"ETag": f"etag_{PartNumber}"}
+
+        self.s3_mock.upload_part.side_effect = upload_part
+        self.upload(["abc", "def"])
+
+        self.assertEqual(self.s3_mock.upload_part.call_count, 4)
+        self.s3_mock.complete_multipart_upload.assert_called_once()
+
+    def test_abort_after_retries(self):
+        self.s3_mock.upload_part.side_effect = EndpointConnectionError(
+            endpoint_url="s3"
+        )
+        with self.assertRaises(EndpointConnectionError):
+            self.upload(["abc"])
+
+        self.s3_mock.abort_multipart_upload.assert_called_once_with(
+            Bucket="bucket", Key="key", UploadId="upload_id"
+        )
+        self.s3_mock.complete_multipart_upload.assert_not_called()
+
+    def test_abort_when_write_fails(self):
+        self.s3_mock.upload_part.side_effect = EndpointConnectionError(
+            endpoint_url="s3"
+        )
+        uploader = MultiPartUploader(
+            "bucket", "key", max_concurrency=1, max_part_retries=0
+        )
+        uploader.write("abc")
+        # The failure of the first part is raised when the second one is written
+        with self.assertRaises(EndpointConnectionError):
+            uploader.write("def")
+
+        self.s3_mock.abort_multipart_upload.assert_called_once_with(
+            Bucket="bucket", Key="key", UploadId="upload_id"
+        )
+        self.assertTrue(uploader._executor._shutdown)
+
+    def test_abort_when_caller_fails(self):
+        with self.assertRaises(ValueError):
+            with S3Uploader("uri") as uploader:
+                uploader.write("abc")
+                raise ValueError()
+
+        self.s3_mock.abort_multipart_upload.assert_called_once()
+        self.s3_mock.complete_multipart_upload.assert_not_called()
+
+
+class DeleteKeysTestCase(TestCase):
+    @mock.patch("clients.s3_client.boto3.client")
+    def test_delete_keys(self, boto3_client_mock):
+        s3_mock = boto3_client_mock.return_value
+        s3_mock.delete_objects.side_effect = [
+            {},
+            {"Errors": [{"Key": "key_1000", "Message": "Access Denied"}]},
+        ]
+        keys = [f"key_{i}" for i in range(1500)]
+        with mock.patch("clients.s3_client.LOG"):
+            self.assertEqual(delete_keys("bucket", keys), 1499)
+
+        # At most 1000 keys per request
+        self.assertEqual(
+            [
+                len(call.kwargs["Delete"]["Objects"])
+                for call in s3_mock.delete_objects.call_args_list
+            ],
+            [1000, 500],
+        )
+
+
+class ListKeysTestCase(TestCase):
+    @mock.patch("clients.s3_client.boto3.client")
+    def test_list_keys(self, boto3_client_mock):
+        paginator_mock = boto3_client_mock.return_value.get_paginator.return_value
+        paginator_mock.paginate.return_value = [
+            {"Contents": [{"Key": "prefix/1/result.csv"}, {"Key": "prefix/1/log.txt"}]},
+            {"Contents": [{"Key": "prefix/2/log.txt"}]},
+            # Pages of empty prefixes have no contents
+            {},
+        ]
+
+        self.assertEqual(
+            list(list_keys("bucket", "prefix/")),
+            ["prefix/1/result.csv", "prefix/1/log.txt", "prefix/2/log.txt"],
+        )
+        paginator_mock.paginate.assert_called_once_with(
+            Bucket="bucket", Prefix="prefix/"
+        )
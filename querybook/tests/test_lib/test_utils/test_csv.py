@@ -1,7 +1,15 @@
 import datetime
+import decimal
 from unittest import TestCase
 
-from lib.utils.csv import serialize_cell, row_to_csv, csv_sniffer, split_csv_to_chunks
+from lib.utils.csv import (
+    serialize_cell,
+    row_to_csv,
+    rows_to_csv,
+    should_escape_list,
+    csv_sniffer,
+    split_csv_to_chunks,
+)
 
 
 class SerializeCellTestCase(TestCase):
@@ -91,3 +99,58 @@ class SplitCSVToChunksTestCase(TestCase):
     def test_simple_csv_entire_partial(self):
         data = ['"foo,bar', "1, 2", "3, 4"]
         self.assertEqual(split_csv_to_chunks(data), ([], data))
+
+
+def legacy_row_to_csv(row):
+    # row_to_csv before rows_to_csv, kept to make sure the output is the same
+    output = []
+    for cell in row:
+        str_col = serialize_cell(cell)
+        if any(c in str_col for c in should_escape_list):
+            str_col = '"%s"' % str_col.replace('"', '""')
+        output.append(str_col)
+    return ",".join(output) + "\n"
+
+
+class MockStr(str):
+    pass
+
+
+class MockInt(int):
+    pass
+
+
+def get_presto_like_rows(num_rows: int):
+    # Mixed types as returned by the presto cursor, with nulls and nested values
+    return [
+        [
+            i,
+            f"user_{i}",
+            'said "hi",\nthen left' if i % 7 == 0 else "中文 text",
+            i * 0.25,
+            i % 3 == 0,
+            None if i % 5 == 0 else datetime.datetime(2020, 1, 1, 0, 0, i % 60),
+            datetime.date(2020, 1, 1 + i % 28),
+            [i, i + 1] if i % 2 else {"key": "a,b"},
+            decimal.Decimal("1.10"),
+            float("nan") if i % 11 == 0 else -i,
+            2**70,
+        ]
+        for i in range(num_rows)
+    ]
+
+
+class RowsToCSVTestCase(TestCase):
+    def test_same_as_row_to_csv(self):
+        rows = get_presto_like_rows(100) + [
+            [],
+            [""],
+            ["\r", '"', "", None],
+            [float("inf"), float("-inf"), -0.0, 1e100, True, False],
+            [b"bytes", MockStr("a,b"), MockInt(1)],
+        ]
+        self.assertEqual(
+            rows_to_csv(rows), "".join(legacy_row_to_csv(row) for row in rows)
+        )
+        for row in rows:
+            self.assertEqual(row_to_csv(row), legacy_row_to_csv(row))
@@ -0,0 +1,196 @@
+from unittest import TestCase, mock
+
+from redis.exceptions import RedisError
+
+from lib.utils import json
+from lib.utils import tiered_cache
+
+
+class MockRedis(object):
+    def __init__(self):
+        self.values = {}
+        self.expirations = {}
+        self.num_gets = 0
+
+    def get(self, key):
+        self.num_gets += 1
+        return self.values.get(key)
+
+    def set(self, key, value, ex=None, nx=False):
+        if nx and key in self.values:
+            return None
+        self.values[key] = value
+        self.expirations[key] = ex
+        return True
+
+    def delete(self, *keys):
+        for key in keys:
+            self.values.pop(key, None)
+
+    def eval(self, script, num_keys, key, token):
+        if self.values.get(key) == token:
+            self.delete(key)
+
+
+class TieredCacheTestCase(TestCase):
+    def setUp(self):
+        self.redis = MockRedis()
+        get_redis_patch = mock.patch(
+            "clients.redis_client.get_redis", return_value=self.redis
+        )
+        get_redis_patch.start()
+        self.addCleanup(get_redis_patch.stop)
+
+        session_patch = mock.patch("app.db.get_session")
+        session_patch.start()
+        self.addCleanup(session_patch.stop)
+
+        self.kvs = {}
+        for name, side_effect in (
+            ("upsert_key_value_store", self._upsert_kvs),
+            ("get_key_value_store", self._get_kvs),
+            ("delete_key_value_store", self._delete_kvs),
+        ):
+            patch = mock.patch(
+                f"lib.utils.tiered_cache.{name}", side_effect=side_effect
+            )
+            patch.start()
+            self.addCleanup(patch.stop)
+
+        tiered_cache._local_cache.clear()
+
+    def _upsert_kvs(self, key, value, session=None):
+        self.kvs[key] = mock.MagicMock(value=value)
+
+    def _get_kvs(self, key, session=None):
+        return self.kvs.get(key)
+
+    def _delete_kvs(self, key, session=None):
+        self.kvs.pop(key, None)
+
+    def test_set_and_get(self):
+        tiered_cache.set_key("foo", {"bar": 1}, expires_after=60)
+        self.assertEqual(self.redis.expirations["tiered_cache:foo"], 60)
+        self.assertEqual(tiered_cache.get_key("foo"), {"bar": 1})
+        self.assertIn("updated_at", tiered_cache.get_raw_key("foo"))
+        self.assertEqual(self.kvs, {})
+
+        tiered_cache.delete_key("foo")
+        with self.assertRaises(LookupError):
+            tiered_cache.get_key("foo")
+
+    def test_local_tier(self):
+        tiered_cache.set_key("foo", 1)
+        self.assertEqual(tiered_cache.get_key("foo", local_expires_after=10), 1)
+        self.assertEqual(tiered_cache.get_key("foo", local_expires_after=10), 1)
+        self.assertEqual(self.redis.num_gets, 1)
+
+        # Local copies expire with the redis key
+        tiered_cache.set_key("bar", 2, expires_after=-1)
+        with self.assertRaises(LookupError):
+            tiered_cache.get_key("bar", local_expires_after=10)
+
+    def test_local_cache_eviction(self):
+        local_cache = tiered_cache.LocalCache(max_size=2)
+        local_cache.set("a", 1, 10)
+        local_cache.set("b", 2, 10)
+        local_cache.get("a")
+        local_cache.set("c", 3, 10)
+        self.assertEqual(local_cache.get("a"), 1)
+        self.assertIsNone(local_cache.get("b"))
+        self.assertEqual(local_cache.get("c"), 3)
+
+    def test_durable_fallback(self):
+        tiered_cache.set_key("foo", [1, 2], expires_after=60, durable=True)
+        self.assertEqual(json.loads(self.kvs["foo"].value)["value"], [1, 2])
+
+        self.redis.values.clear()
+        with self.assertRaises(LookupError):
+            tiered_cache.get_key("foo")
+        self.assertEqual(tiered_cache.get_key("foo", durable=True), [1, 2])
+        # The redis tier is filled again
+        self.assertIn("tiered_cache:foo", self.redis.values)
+
+        with mock.patch.object(self.redis, "get", side_effect=RedisError()):
+            self.assertEqual(tiered_cache.get_key("foo", durable=True), [1, 2])
+
+    def test_durable_expiration(self):
+        tiered_cache.set_key("foo", 1, expires_after=-1, durable=True)
+        with self.assertRaises(LookupError):
+            tiered_cache.get_key("foo", durable=True)
+        self.assertEqual(self.kvs, {})
+
+    def test_durable_mysql_cache_rows(self):
+        # Rows set by mysql_cache before tiered_cache are missing keys
+        for key, value in (
+            ("foo", json.dumps({"value": [1], "created_at": 1})),
+            ("bar", "not json"),
+        ):
+            self._upsert_kvs(key, value)
+            with self.assertRaises(LookupError):
+                tiered_cache.get_key(key, durable=True)
+        self.assertEqual(self.kvs, {})
+
+    def test_delete_key_without_redis(self):
+        tiered_cache.set_key("foo", 1, durable=True)
+        with mock.patch.object(
+            self.redis, "delete", side_effect=RedisError()
+        ), mock.patch("lib.utils.tiered_cache.LOG"):
+            tiered_cache.delete_key("foo", durable=True)
+        self.assertEqual(self.kvs, {})
+
+    def test_get_or_set(self):
+        fn = mock.MagicMock(return_value="value")
+        self.assertEqual(tiered_cache.get_or_set("foo", fn, args=[1]), "value")
+        self.assertEqual(tiered_cache.get_or_set("foo", fn, args=[1]), "value")
+        fn.assert_called_once_with(1)
+        # The lock is released
+        self.assertNotIn("tiered_cache_lock:foo", self.redis.values)
+
+    def test_get_or_set_waits_for_lock(self):
+        tiered_cache.acquire_lock("foo")
+        fn = mock.MagicMock(return_value="new value")
+
+        def set_value_while_waiting(_):
+            tiered_cache.set_key("foo", "value")
+
+        with mock.patch("lib.utils.tiered_cache.time.sleep") as sleep_mock:
+            sleep_mock.side_effect = set_value_while_waiting
+            self.assertEqual(tiered_cache.get_or_set("foo", fn), "value")
+        fn.assert_not_called()
+
+    def test_with_cache(self):
+        fn = mock.MagicMock(return_value=5)
+        cached_fn = tiered_cache.with_cache("foo", expires_after=10)(fn)
+        self.assertEqual(cached_fn(), 5)
+        self.assertEqual(cached_fn(), 5)
+        self.assertEqual(fn.call_count, 1)
+
+    def test_release_lock_of_others(self):
+        token = tiered_cache.acquire_lock("foo")
+        self.assertIsNotNone(token)
+        self.assertIsNone(tiered_cache.acquire_lock("foo"))
+        tiered_cache.release_lock("foo", "other token")
+        self.assertIsNone(tiered_cache.acquire_lock("foo"))
+        tiered_cache.release_lock("foo", token)
+        self.assertIsNotNone(tiered_cache.acquire_lock("foo"))
+
+    def test_get_or_set_without_redis(self):
+        fn = mock.MagicMock(return_value="value")
+        with mock.patch.multiple(
+            self.redis,
+            get=mock.MagicMock(side_effect=RedisError()),
+            set=mock.MagicMock(side_effect=RedisError()),
+        ), mock.patch("lib.utils.tiered_cache.LOG"):
+            self.assertEqual(tiered_cache.get_or_set("foo", fn), "value")
+            self.assertEqual(tiered_cache.get_or_set("foo", fn), "value")
+        # Nothing is cached, so fn is called every time
+        self.assertEqual(fn.call_count, 2)
+
+    def test_get_or_set_when_release_lock_fails(self):
+        fn = mock.MagicMock(return_value="value")
+        with mock.patch.object(
+            self.redis, "eval", side_effect=RedisError()
+        ), mock.patch("lib.utils.tiered_cache.LOG"):
+            self.assertEqual(tiered_cache.get_or_set("foo", fn), "value")
+        self.assertEqual(tiered_cache.get_key("foo"), "value")
@@ -0,0 +1,84 @@
+from datetime import date, datetime
+from unittest import mock
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from const.impression import ImpressionItemType
+from logic import impression as logic
+from logic.elasticsearch import get_table_weights
+from models.impression import Impression, ImpressionDailyRollup
+
+
+@pytest.fixture
+def session(db_engine):
+    session = sessionmaker(bind=db_engine)()
+    yield session
+    session.rollback()
+    session.query(Impression).delete()
+    session.query(ImpressionDailyRollup).delete()
+    session.commit()
+    session.close()
+
+
+def _create_impressions(session, item_id, uids, day):
+    logic.create_impressions(
+        [
+            {
+                "item_id": item_id,
+                "item_type": ImpressionItemType.DATA_TABLE,
+                "uid": uid,
+                "created_at": datetime(day.year, day.month, day.day, 12),
+            }
+            for uid in uids
+        ],
+        session=session,
+    )
+
+
+@pytest.fixture
+def impressions(session):
+    _create_impressions(session, 1, [1, 1, 2], date(2024, 1, 2))
+    _create_impressions(session, 1, [1, 3], date(2024, 1, 3))
+    _create_impressions(session, 2, [1], date(2024, 1, 3))
+    # Viewed before the dates read below
+    _create_impressions(session, 2, [2, 3], date(2023, 12, 1))
+
+
+def test_item_timeseries(session, impressions):
+    assert [
+        (row.date, row.views_count)
+        for row in logic.get_item_timeseries_after_date(
+            ImpressionItemType.DATA_TABLE, 1, date(2024, 1, 1), session=session
+        )
+    ] == [(date(2024, 1, 2), 3), (date(2024, 1, 3), 2)]
+
+
+def test_viewers_count(session, impressions):
+    # Viewers are counted once over the whole window
+    assert logic.get_viewers_count_by_items_after_date(
+        ImpressionItemType.DATA_TABLE, [1, 2, 3], date(2024, 1, 1), session=session
+    ) == {1: 3, 2: 1}
+
+
+def test_daily_rollups(session, impressions):
+    # Viewers are counted once per day
+    assert [
+        (rollup.item_id, rollup.date, rollup.viewers_count, rollup.views_count)
+        for rollup in session.query(ImpressionDailyRollup)
+        .filter(ImpressionDailyRollup.date >= date(2024, 1, 1))
+        .order_by(ImpressionDailyRollup.item_id, ImpressionDailyRollup.date)
+    ] == [
+        (1, date(2024, 1, 2), 2, 3),
+        (1, date(2024, 1, 3), 2, 2),
+        (2, date(2024, 1, 3), 1, 1),
+    ]
+
+
+def test_table_weights(session, impressions):
+    tables = [mock.MagicMock(id=table_id, boost_score=0) for table_id in (1, 2, 3)]
+    with mock.patch(
+        "logic.elasticsearch.get_last_impressions_date", return_value=date(2024, 1, 1)
+    ):
+        # log2 of the distinct viewers count + 1
+        assert get_table_weights(tables, session=session) == {1: 2, 2: 1, 3: 0}
@@ -0,0 +1,105 @@
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from logic.metastore import bulk_create_tables
+from models.metastore import (
+    DataSchema,
+    DataTable,
+    DataTableColumn,
+    DataTableInformation,
+)
+
+
+@pytest.fixture
+def session(db_engine):
+    session = sessionmaker(bind=db_engine)()
+    yield session
+    session.rollback()
+    for model in (DataTableColumn, DataTableInformation, DataTable, DataSchema):
+        session.query(model).delete()
+    session.commit()
+    session.close()
+
+
+@pytest.fixture
+def schema_id(session):
+    schema = DataSchema(name="test_schema", metastore_id=1)
+    session.add(schema)
+    session.commit()
+    return schema.id
+
+
+def _get_table(name, columns, latest_partitions=None):
+    return {
+        "table": {"name": name, "type": "TABLE"},
+        "information": {"latest_partitions": latest_partitions},
+        "columns": [
+            {"name": column_name, "type": column_type}
+            for column_name, column_type in columns
+        ],
+    }
+
+
+def _get_columns(session, table_id):
+    return {
+        column.name: column.type
+        for column in session.query(DataTableColumn).filter_by(table_id=table_id)
+    }
+
+
+def test_bulk_create_tables(session, schema_id):
+    tables = [
+        _get_table("a", [("x", "int"), ("y", "string")], latest_partitions="dt=1"),
+        _get_table("b", [("z", "int")]),
+    ]
+    table_ids, column_ids, changed_table_ids = bulk_create_tables(
+        schema_id, tables, session=session
+    )
+    assert table_ids.keys() == {"a", "b"}
+    assert changed_table_ids == set(table_ids.values())
+    assert column_ids[table_ids["a"]].keys() == {"x", "y"}
+    assert _get_columns(session, table_ids["b"]) == {"z": "int"}
+    assert (
+        session.query(DataTableInformation)
+        .filter_by(data_table_id=table_ids["a"])
+        .one()
+        .latest_partitions
+        == "dt=1"
+    )
+
+    # Nothing changed
+    assert bulk_create_tables(schema_id, tables, session=session) == (
+        table_ids,
+        column_ids,
+        set(),
+    )
+
+    # Column y is dropped and w is added to a, the partitions of b are
+    # updated and c is new
+    tables = [
+        _get_table("a", [("x", "int"), ("w", "string")], latest_partitions="dt=1"),
+        _get_table("b", [("z", "int")], latest_partitions="dt=2"),
+        _get_table("c", [("v", "int")]),
+    ]
+    new_table_ids, new_column_ids, changed_table_ids = bulk_create_tables(
+        schema_id, tables, session=session
+    )
+    assert new_table_ids["a"] == table_ids["a"]
+    assert new_table_ids["b"] == table_ids["b"]
+    assert changed_table_ids == set(new_table_ids.values())
+    assert new_column_ids[table_ids["a"]]["x"] == column_ids[table_ids["a"]]["x"]
+    assert _get_columns(session, table_ids["a"]) == {"x": "int", "w": "string"}
+    assert (
+        session.query(DataTableInformation)
+        .filter_by(data_table_id=table_ids["b"])
+        .one()
+        .latest_partitions
+        == "dt=2"
+    )
+    assert session.query(DataTable).filter_by(schema_id=schema_id).count() == 3
+
+    # Only the table whose column type changed
+    tables[1] = _get_table("b", [("z", "bigint")], latest_partitions="dt=2")
+    _, _, changed_table_ids = bulk_create_tables(schema_id, tables, session=session)
+    assert changed_table_ids == {table_ids["b"]}
+    assert _get_columns(session, table_ids["b"]) == {"z": "bigint"}
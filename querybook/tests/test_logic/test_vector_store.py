@@ -0,0 +1,191 @@
+from unittest import TestCase, mock
+
+from logic import vector_store
+
+
+class RateLimitError(Exception):
+    pass
+
+
+def _get_table(table_id):
+    table = mock.MagicMock(id=table_id)
+    table.name = f"table_{table_id}"
+    table.data_schema.name = "schema"
+    table.data_schema.metastore_id = 1
+    return table
+
+
+class IngestVectorIndexTestCase(TestCase):
+    def setUp(self):
+        self.store = mock.MagicMock()
+        self.store.should_skip_table.return_value = False
+        self.tables = [_get_table(table_id) for table_id in range(1, 6)]
+        self.kvs = {}
+        self.fingerprints = {}
+        self.table_fingerprint = "fingerprint"
+
+        self._patch("get_vector_store", return_value=self.store)
+        self._patch("get_all_table", side_effect=self._get_all_table)
+        self._patch(
+            "get_sample_query_cells_by_table_name",
+            side_effect=lambda table_name: [
+                {
+                    "id": 100,
+                    "title": "query",
+                    "query_text": "select 1",
+                    "full_table_name": [table_name],
+                    "engine_id": 1,
+                }
+            ],
+        )
+        self.summarize_table_mock = self._patch(
+            "_summarize_table",
+            side_effect=lambda table_id, metastore_id, full_table_name, cells, fingerprint: (
+                "summary",
+                {"table_ids": [table_id], "fingerprint": fingerprint},
+                f"table_{table_id}",
+            ),
+        )
+        self.summarize_query_cell_mock = self._patch(
+            "_summarize_query_cell",
+            side_effect=lambda cell, fingerprint: (
+                "summary",
+                {"fingerprint": fingerprint},
+                f"query_{cell['id']}",
+            ),
+        )
+        self._patch("get_table_by_id")
+        self._patch(
+            "_get_table_fingerprint",
+            side_effect=lambda table, cells: self.table_fingerprint,
+        )
+        self._patch(
+            "get_document_fingerprints",
+            side_effect=lambda doc_ids, session=None: {
+                doc_id: self.fingerprints[doc_id]
+                for doc_id in doc_ids
+                if doc_id in self.fingerprints
+            },
+        )
+        self._patch(
+            "upsert_document_fingerprints",
+            side_effect=lambda fingerprints, session=None: self.fingerprints.update(
+                fingerprints
+            ),
+        )
+        self._patch(
+            "get_key_value_store",
+            side_effect=lambda key, session=None: (
+                mock.MagicMock(value=self.kvs[key]) if key in self.kvs else None
+            ),
+        )
+        self._patch(
+            "upsert_key_value_store",
+            side_effect=lambda key, value, session=None: self.kvs.update({key: value}),
+        )
+        self._patch(
+            "delete_key_value_store",
+            side_effect=lambda key, session=None: self.kvs.pop(key, None),
+        )
+        self._patch("time.sleep")
+
+        session_patch = mock.patch("app.db.get_session")
+        session_patch.start()
+        self.addCleanup(session_patch.stop)
+
+    def _patch(self, name, **kwargs):
+        patch = mock.patch(f"logic.vector_store.{name}", **kwargs)
+        self.addCleanup(patch.stop)
+        return patch.start()
+
+    def _get_all_table(self, limit, after_id, session):
+        return [
+            table for table in self.tables if after_id is None or table.id > after_id
+        ][:limit]
+
+    def _get_stored_doc_ids(self):
+        return [
+            doc_id
+            for call in self.store.add_documents.call_args_list
+            for doc_id in call.kwargs["ids"]
+        ]
+
+    def test_ingest_in_batches(self):
+        vector_store.ingest_vector_index(batch_size=2, session=mock.MagicMock())
+        self.assertEqual(
+            self._get_stored_doc_ids(),
+            [
+                "table_1",
+                "table_2",
+                "query_100",
+                "table_3",
+                "table_4",
+                "query_100",
+                "table_5",
+                "query_100",
+            ],
+        )
+        # The shared sample query is summarized once per page
+        self.assertEqual(self.summarize_query_cell_mock.call_count, 3)
+        # The checkpoint is removed once everything is ingested
+        self.assertEqual(self.kvs, {})
+
+    def test_resume_from_checkpoint(self):
+        self.kvs[vector_store.INGEST_CHECKPOINT_KEY] = "3"
+        vector_store.ingest_vector_index(batch_size=2, session=mock.MagicMock())
+        self.assertEqual(
+            self._get_stored_doc_ids(), ["table_4", "table_5", "query_100"]
+        )
+
+    def test_keep_checkpoint_on_failure(self):
+        self.store.add_documents.side_effect = [None, None, ValueError()]
+        with self.assertRaises(ValueError):
+            vector_store.ingest_vector_index(batch_size=2, session=mock.MagicMock())
+        self.assertEqual(self.kvs, {vector_store.INGEST_CHECKPOINT_KEY: "2"})
+
+    def test_retry_when_rate_limited(self):
+        rate_limit_error = Exception("rate limited")
+        rate_limit_error.__cause__ = RateLimitError()
+        self.summarize_table_mock.side_effect = [
+            rate_limit_error,
+            ("summary", {"fingerprint": "fingerprint"}, "table_1"),
+        ]
+        self.tables = self.tables[:1]
+        vector_store.ingest_vector_index(session=mock.MagicMock())
+        self.assertEqual(self.summarize_table_mock.call_count, 2)
+        self.assertEqual(self._get_stored_doc_ids(), ["table_1", "query_100"])
+
+    def test_skip_unchanged_documents(self):
+        self.tables = self.tables[:2]
+        vector_store.ingest_vector_index(session=mock.MagicMock())
+        self.assertEqual(self.summarize_table_mock.call_count, 2)
+        self.assertEqual(self.summarize_query_cell_mock.call_count, 1)
+
+        # Nothing changed, so nothing is summarized again
+        vector_store.ingest_vector_index(session=mock.MagicMock())
+        self.assertEqual(self.summarize_table_mock.call_count, 2)
+        self.assertEqual(self.summarize_query_cell_mock.call_count, 1)
+
+        self.table_fingerprint = "new fingerprint"
+        vector_store.ingest_vector_index(session=mock.MagicMock())
+        self.assertEqual(self.summarize_table_mock.call_count, 4)
+        self.assertEqual(self.summarize_query_cell_mock.call_count, 1)
+        self.assertEqual(
+            self.fingerprints,
+            {
+                "table_1": "new fingerprint",
+                "table_2": "new fingerprint",
+                "query_100": mock.ANY,
+            },
+        )
+
+    def test_ignore_fingerprints(self):
+        self.tables = self.tables[:2]
+        vector_store.ingest_vector_index(session=mock.MagicMock())
+
+        # Everything is summarized again, such as after changing the prompts
+        vector_store.ingest_vector_index(
+            ignore_fingerprints=True, session=mock.MagicMock()
+        )
+        self.assertEqual(self.summarize_table_mock.call_count, 4)
+        self.assertEqual(self.summarize_query_cell_mock.call_count, 2)
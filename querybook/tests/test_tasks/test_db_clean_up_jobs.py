@@ -0,0 +1,176 @@
+from datetime import datetime, timedelta
+from unittest import mock
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from const.impression import ImpressionItemType
+from const.query_execution import QueryExecutionStatus
+from models.impression import Impression, ImpressionDailyRollup
+from models.query_execution import QueryExecution, StatementExecution
+from tasks import db_clean_up_jobs
+
+
+@pytest.fixture
+def session(db_engine):
+    session = sessionmaker(bind=db_engine)()
+    yield session
+    for model in (
+        QueryExecution,
+        StatementExecution,
+        Impression,
+        ImpressionDailyRollup,
+    ):
+        session.query(model).delete()
+    session.commit()
+    session.close()
+
+
+@pytest.fixture
+def query_execution_ids(session):
+    old_date = datetime.now() - timedelta(100)
+    query_executions = [
+        QueryExecution(
+            query="select 1",
+            status=QueryExecutionStatus.DONE,
+            created_at=old_date,
+            completed_at=old_date,
+        )
+        for _ in range(3)
+    ] + [
+        QueryExecution(
+            query="select 1",
+            status=QueryExecutionStatus.DONE,
+            created_at=datetime.now(),
+            completed_at=datetime.now(),
+        )
+    ]
+    session.add_all(query_executions)
+    session.commit()
+    return [query_execution.id for query_execution in query_executions]
+
+
+@pytest.fixture
+def clean_up_results_mock(monkeypatch):
+    monkeypatch.setattr(db_clean_up_jobs, "QUERY_EXECUTION_CLEAN_UP_BATCH_SIZE", 2)
+    monkeypatch.setattr(
+        db_clean_up_jobs, "mark_elasticsearch_items_dirty", mock.MagicMock()
+    )
+    clean_up_results_mock = mock.MagicMock()
+    monkeypatch.setattr(
+        db_clean_up_jobs, "clean_up_query_execution_results", clean_up_results_mock
+    )
+    return clean_up_results_mock
+
+
+def _get_remaining_ids(session):
+    return [
+        query_execution_id
+        for (query_execution_id,) in session.query(QueryExecution.id).order_by(
+            QueryExecution.id
+        )
+    ]
+
+
+def test_clean_up_query_execution(session, query_execution_ids, clean_up_results_mock):
+    db_clean_up_jobs.clean_up_query_execution(session=session)
+
+    assert [call.args[0] for call in clean_up_results_mock.call_args_list] == [
+        query_execution_ids[:2],
+        query_execution_ids[2:3],
+    ]
+    assert _get_remaining_ids(session) == query_execution_ids[3:]
+
+
+def test_clean_up_query_execution_dry_run(
+    session, query_execution_ids, clean_up_results_mock
+):
+    db_clean_up_jobs.clean_up_query_execution(results_dry_run=True, session=session)
+
+    assert [
+        (call.args[0], call.kwargs["dry_run"])
+        for call in clean_up_results_mock.call_args_list
+    ] == [(query_execution_ids[:2], True), (query_execution_ids[2:3], True)]
+    # Kept so that their results can be deleted after the dry run
+    assert _get_remaining_ids(session) == query_execution_ids
+
+
+def test_clean_up_orphaned_query_execution_results(
+    session, query_execution_ids, monkeypatch
+):
+    statement_execution = StatementExecution(query_execution_id=query_execution_ids[0])
+    session.add(statement_execution)
+    session.commit()
+    kept_id = statement_execution.id
+    deleted_id = kept_id + 1
+
+    monkeypatch.setattr(db_clean_up_jobs, "QUERY_EXECUTION_CLEAN_UP_BATCH_SIZE", 2)
+    list_results_mock = mock.MagicMock(
+        return_value=iter(
+            [
+                f"s3://querybook_temp/{kept_id}/result.arrow",
+                f"s3://querybook_temp/{kept_id}/result.arrow.index",
+                f"s3://querybook_temp/{deleted_id}/result.arrow",
+                f"s3://querybook_temp/{deleted_id}/result.arrow.index",
+                f"s3://querybook_temp/{deleted_id}/log.txt",
+                "s3://querybook_temp/not_a_result.txt",
+            ]
+        )
+    )
+    monkeypatch.setattr(db_clean_up_jobs, "list_results", list_results_mock)
+    delete_results_mock = mock.MagicMock()
+    monkeypatch.setattr(db_clean_up_jobs, "delete_results", delete_results_mock)
+
+    db_clean_up_jobs.clean_up_orphaned_query_execution_results(session=session)
+
+    list_results_mock.assert_called_once_with("querybook_temp/")
+    assert [call.args[0] for call in delete_results_mock.call_args_list] == [
+        [
+            f"s3://querybook_temp/{deleted_id}/result.arrow",
+            f"s3://querybook_temp/{deleted_id}/result.arrow.index",
+        ],
+        [f"s3://querybook_temp/{deleted_id}/log.txt"],
+    ]
+
+    delete_results_mock.reset_mock()
+    list_results_mock.return_value = iter([f"s3://querybook_temp/{deleted_id}/log.txt"])
+    db_clean_up_jobs.clean_up_orphaned_query_execution_results(
+        dry_run=True, session=session
+    )
+    delete_results_mock.assert_not_called()
+
+
+def test_clean_up_impression(session):
+    old_date = datetime.now() - timedelta(40)
+    session.add_all(
+        [
+            Impression(
+                item_id=1,
+                item_type=ImpressionItemType.DATA_TABLE,
+                uid=1,
+                created_at=created_at,
+            )
+            for created_at in (old_date, datetime.now())
+        ]
+        + [
+            ImpressionDailyRollup(
+                item_id=1,
+                item_type=ImpressionItemType.DATA_TABLE,
+                date=created_at.date(),
+                viewers_count=1,
+                views_count=1,
+            )
+            for created_at in (old_date, datetime.now())
+        ]
+    )
+    session.commit()
+
+    db_clean_up_jobs.clean_up_impression(days_to_keep=30, session=session)
+
+    assert [
+        impression.created_at.date() for impression in session.query(Impression)
+    ] == [datetime.now().date()]
+    # The rollups are kept as long as the impressions
+    assert [rollup.date for rollup in session.query(ImpressionDailyRollup)] == [
+        datetime.now().date()
+    ]
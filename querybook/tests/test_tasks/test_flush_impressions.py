@@ -0,0 +1,162 @@
+from datetime import date, datetime
+from unittest import mock
+
+import pytest
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import scoped_session, sessionmaker
+
+from const.impression import ImpressionItemType
+from models.impression import Impression, ImpressionDailyRollup
+from tasks import flush_impressions as flush_impressions_task
+from tasks.flush_impressions import buffer_impression, flush_impressions
+
+
+class MockRedis(object):
+    def __init__(self):
+        self.lists = {}
+        self.values = {}
+
+    def rpush(self, key, *values):
+        self.lists.setdefault(key, []).extend(
+            value.encode() if isinstance(value, str) else value for value in values
+        )
+
+    def lrange(self, key, start, end):
+        return self.lists.get(key, [])[start : end + 1]
+
+    def ltrim(self, key, start, end):
+        self.lists[key] = self.lists.get(key, [])[start:]
+
+    def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.values:
+            return None
+        self.values[key] = value
+        return True
+
+    def delete(self, *keys):
+        for key in keys:
+            self.values.pop(key, None)
+
+    def eval(self, script, num_keys, key, token):
+        if self.values.get(key) == token:
+            self.delete(key)
+
+    def pipeline(self):
+        return MockPipeline(self)
+
+
+class MockPipeline(object):
+    def __init__(self, redis):
+        self._redis = redis
+        self._results = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def __getattr__(self, name):
+        def command(*args, **kwargs):
+            self._results.append(getattr(self._redis, name)(*args, **kwargs))
+
+        return command
+
+    def execute(self):
+        results, self._results = self._results, []
+        return results
+
+
+@pytest.fixture
+def session(db_engine, monkeypatch):
+    from app import db
+
+    scoped = scoped_session(sessionmaker(bind=db_engine))
+    monkeypatch.setattr(db, "get_session", lambda scopefunc=None: scoped)
+    # Flushes run in celery, outside of any request left by other tests
+    monkeypatch.setattr(db, "has_request_context", lambda: False)
+    yield scoped()
+
+    scoped.remove()
+    session = scoped()
+    session.query(Impression).delete()
+    session.query(ImpressionDailyRollup).delete()
+    session.commit()
+    scoped.remove()
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    redis = MockRedis()
+    monkeypatch.setattr(flush_impressions_task, "get_redis", lambda: redis)
+    monkeypatch.setattr(flush_impressions, "apply_async", mock.MagicMock())
+    return redis
+
+
+def _buffer_impressions(redis, *uids, day=date(2024, 1, 2)):
+    timestamp = datetime(day.year, day.month, day.day, 12).timestamp()
+    with mock.patch("tasks.flush_impressions.time.time", return_value=timestamp):
+        for uid in uids:
+            buffer_impression(1, ImpressionItemType.DATA_TABLE, uid, redis_conn=redis)
+    flush_impressions.apply_async.reset_mock()
+
+
+def _get_rollups(session):
+    return [
+        (rollup.item_id, rollup.date, rollup.viewers_count, rollup.views_count)
+        for rollup in session.query(ImpressionDailyRollup).order_by(
+            ImpressionDailyRollup.date
+        )
+    ]
+
+
+def test_flush_twice_on_same_day(session, redis):
+    _buffer_impressions(redis, 1, 1, 2)
+    flush_impressions()
+    session.expire_all()
+    assert _get_rollups(session) == [(1, date(2024, 1, 2), 2, 3)]
+
+    _buffer_impressions(redis, 2, 3)
+    _buffer_impressions(redis, 1, day=date(2024, 1, 3))
+    flush_impressions()
+    session.expire_all()
+    assert _get_rollups(session) == [
+        (1, date(2024, 1, 2), 3, 5),
+        (1, date(2024, 1, 3), 1, 1),
+    ]
+    assert redis.lists[flush_impressions_task.IMPRESSION_BUFFER_KEY] == []
+
+
+def test_retry_failed_flush(session, redis):
+    _buffer_impressions(redis, 1, 2)
+
+    with mock.patch(
+        "logic.impression.update_impression_daily_rollups",
+        side_effect=SQLAlchemyError("db is down"),
+    ), pytest.raises(SQLAlchemyError):
+        flush_impressions()
+
+    # The impressions are pushed back and another flush is scheduled
+    assert len(redis.lists[flush_impressions_task.IMPRESSION_BUFFER_KEY]) == 2
+    assert session.query(Impression).count() == 0
+    flush_impressions.apply_async.assert_called_once()
+    # The lock is released
+    assert redis.values.keys() == {flush_impressions_task.FLUSH_SCHEDULED_KEY}
+
+    flush_impressions()
+    session.expire_all()
+    assert _get_rollups(session) == [(1, date(2024, 1, 2), 2, 2)]
+
+
+def test_flush_while_another_is_running(session, redis):
+    _buffer_impressions(redis, 1)
+    redis.set(f"tiered_cache_lock:{flush_impressions_task.FLUSH_LOCK_NAME}", "token")
+
+    flush_impressions()
+
+    # Retried once the running flush is done
+    assert len(redis.lists[flush_impressions_task.IMPRESSION_BUFFER_KEY]) == 1
+    assert flush_impressions_task.FLUSH_SCHEDULED_KEY in redis.values
+    flush_impressions.apply_async.assert_called_once_with(
+        countdown=flush_impressions_task.FLUSH_COUNTDOWN
+    )
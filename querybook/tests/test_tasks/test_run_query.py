@@ -0,0 +1,62 @@
+from unittest import TestCase
+from unittest.mock import MagicMock, PropertyMock, patch
+
+from celery.exceptions import SoftTimeLimitExceeded
+
+from const.query_execution import QueryExecutionStatus
+from tasks.run_query import run_executor_until_finish
+
+
+class RunExecutorUntilFinishTestCase(TestCase):
+    def setUp(self):
+        self.celery_task = MagicMock(soft_time_limit=10)
+        self.celery_task.is_aborted.return_value = False
+
+        self.executor = MagicMock()
+        self.status_mock = PropertyMock(return_value=QueryExecutionStatus.RUNNING)
+        type(self.executor).status = self.status_mock
+
+        # The task starts at 100, so its deadline is 110
+        self.time_mock = MagicMock(return_value=100)
+        time_patch = patch("tasks.run_query.time.time", self.time_mock)
+        time_patch.start()
+        self.addCleanup(time_patch.stop)
+
+    def test_finish_before_deadline(self):
+        self.time_mock.side_effect = [100, 101, 105]
+        self.status_mock.side_effect = [
+            QueryExecutionStatus.RUNNING,
+            QueryExecutionStatus.DONE,
+        ]
+
+        run_executor_until_finish(self.celery_task, self.executor)
+
+        self.assertEqual(self.executor.poll.call_count, 2)
+        self.executor.sleep.assert_called_once()
+        self.executor.cancel.assert_not_called()
+
+    def test_past_deadline(self):
+        self.time_mock.side_effect = [100, 105, 111]
+
+        with self.assertRaises(SoftTimeLimitExceeded):
+            run_executor_until_finish(self.celery_task, self.executor)
+
+        # Stops polling once the deadline is passed
+        self.executor.poll.assert_called_once()
+
+    def test_default_soft_time_limit(self):
+        self.celery_task.soft_time_limit = None
+        self.time_mock.side_effect = [100, 105, 111]
+
+        with patch("tasks.run_query.celery") as celery_mock:
+            celery_mock.conf.task_soft_time_limit = 10
+            with self.assertRaises(SoftTimeLimitExceeded):
+                run_executor_until_finish(self.celery_task, self.executor)
+
+    def test_cancel_when_aborted(self):
+        self.celery_task.is_aborted.side_effect = [False, True]
+
+        run_executor_until_finish(self.celery_task, self.executor)
+
+        self.executor.poll.assert_called_once()
+        self.executor.cancel.assert_called_once()
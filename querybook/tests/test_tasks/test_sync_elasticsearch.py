@@ -0,0 +1,63 @@
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+from const.elasticsearch import ElasticsearchItem
+from tasks.sync_elasticsearch import sync_elasticsearch
+
+
+class SyncElasticsearchTestCase(TestCase):
+    def setUp(self):
+        self.dirty_items = {item_type.value: [] for item_type in ElasticsearchItem}
+
+        self.redis_mock = MagicMock()
+        self.redis_mock.spop.side_effect = self._spop
+        get_redis_patch = patch(
+            "tasks.sync_elasticsearch.get_redis", return_value=self.redis_mock
+        )
+        get_redis_patch.start()
+        self.addCleanup(get_redis_patch.stop)
+
+        mark_dirty_patch = patch(
+            "tasks.sync_elasticsearch.mark_elasticsearch_items_dirty"
+        )
+        self.mark_dirty_mock = mark_dirty_patch.start()
+        self.addCleanup(mark_dirty_patch.stop)
+
+        update_patch = patch("logic.elasticsearch.update_es_items_by_ids")
+        self.update_mock = update_patch.start()
+        self.addCleanup(update_patch.stop)
+
+    def _spop(self, key, count):
+        item_type = key.split(":")[1]
+        item_ids = self.dirty_items[item_type][:count]
+        self.dirty_items[item_type] = self.dirty_items[item_type][count:]
+        return [str(item_id).encode() for item_id in item_ids]
+
+    def test_sync(self):
+        self.dirty_items["tables"] = [1, 2]
+        self.update_mock.return_value = (2, [])
+
+        sync_elasticsearch()
+
+        self.update_mock.assert_called_once_with("tables", [1, 2])
+        self.mark_dirty_mock.assert_not_called()
+
+    def test_retry_failed_items(self):
+        self.dirty_items["tables"] = [1, 2, 3, 4]
+        self.update_mock.return_value = (
+            0,
+            [
+                {"update": {"_id": "1", "status": 429}},
+                {"delete": {"_id": "2", "status": "N/A"}},
+                {"update": {"_id": "3", "status": 503}},
+                # Fails again when retried
+                {"update": {"_id": "4", "status": 400}},
+            ],
+        )
+
+        with patch("tasks.sync_elasticsearch.LOG"):
+            sync_elasticsearch()
+
+        self.mark_dirty_mock.assert_called_once_with(
+            "tables", [1, 2, 3], redis_conn=self.redis_mock
+        )